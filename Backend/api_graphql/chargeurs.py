@@ -0,0 +1,125 @@
+"""
+Chargeurs groupés des relations GraphQL, propres à chaque requête.
+
+Les resolvers de Query annoncent les datasets qu'ils renvoient
+(enregistrer_datasets). Au premier accès à une relation, le chargeur la lit
+pour tous les parents annoncés en une requête IN, puis sert les suivants
+depuis sa mémoire ; chaque lot chargé annonce à son tour ses objets. Le
+nombre de requêtes d'un document dépend de sa profondeur et non du nombre
+de datasets.
+
+L'exécution de graphene-django est synchrone : les parents sont annoncés
+explicitement au lieu d'être regroupés par la boucle d'événements comme le
+ferait un DataLoader asynchrone.
+"""
+from collections import defaultdict
+
+from recup_donnee.models import Contact, Dataset, DateInfo, Publication
+
+TAILLE_IN = 1000
+
+
+class Chargeur:
+    """Valeurs d'une relation par id de parent, chargées par lots"""
+
+    def __init__(self, charger, defaut=None, annoncer=None):
+        self.charger = charger      # ids -> {id: valeur}
+        self.defaut = defaut        # fabrique de la valeur d'un parent sans enfant
+        self.annoncer = annoncer    # appelé avec chaque lot chargé ({id: valeur})
+        self.valeurs = {}
+        self.en_attente = set()
+
+    def attendre(self, ids):
+        self.en_attente.update(i for i in ids if i not in self.valeurs)
+
+    def amorcer(self, valeurs):
+        """Valeurs déjà connues (objets déjà lus), sans requête"""
+        for cle, valeur in valeurs.items():
+            self.valeurs.setdefault(cle, valeur)
+            self.en_attente.discard(cle)
+
+    def charger_un(self, cle):
+        if cle not in self.valeurs:
+            ids = sorted(self.en_attente | {cle})
+            self.en_attente.clear()
+            for debut in range(0, len(ids), TAILLE_IN):
+                lot = ids[debut:debut + TAILLE_IN]
+                trouves = self.charger(lot)
+                for i in lot:
+                    self.valeurs[i] = trouves[i] if i in trouves else (self.defaut() if self.defaut else None)
+                if self.annoncer:
+                    self.annoncer(trouves)
+        return self.valeurs[cle]
+
+
+def enfants_par_dataset(modele):
+    def charger(ids):
+        groupes = defaultdict(list)
+        for enfant in modele.objects.filter(dataset_id__in=ids).order_by('id'):
+            groupes[enfant.dataset_id].append(enfant)
+        return groupes
+    return charger
+
+
+def dates_par_dataset(ids):
+    return {date.dataset_id: date for date in DateInfo.objects.filter(dataset_id__in=ids)}
+
+
+def datasets_par_id(ids):
+    return Dataset.objects.in_bulk(ids)
+
+
+def chargeurs(info):
+    """Chargeurs de la requête en cours (attribut du contexte, créés au premier appel)
+
+    Les datasets lus par un retour enfant -> dataset attendent leurs
+    relations, et les enfants lus attendent leur dataset.
+    """
+    contexte = info.context
+    existants = getattr(contexte, '_chargeurs_graphql', None) if contexte is not None else None
+    if existants is not None:
+        return existants
+
+    def annoncer_enfants(trouves):
+        ids = set()
+        for valeur in trouves.values():
+            ids.update(e.dataset_id for e in (valeur if isinstance(valeur, list) else [valeur]))
+        tous['dataset'].attendre(ids)
+
+    def annoncer_datasets(trouves):
+        annoncer_datasets_lus(tous, trouves.values())
+
+    tous = {
+        'contacts': Chargeur(enfants_par_dataset(Contact), defaut=list, annoncer=annoncer_enfants),
+        'publications': Chargeur(enfants_par_dataset(Publication), defaut=list, annoncer=annoncer_enfants),
+        'date_info': Chargeur(dates_par_dataset, annoncer=annoncer_enfants),
+        'dataset': Chargeur(datasets_par_id, annoncer=annoncer_datasets),
+    }
+    if contexte is not None:
+        contexte._chargeurs_graphql = tous
+    return tous
+
+
+def annoncer_datasets_lus(tous, datasets):
+    ids = [d.pk for d in datasets]
+    for relation in ('contacts', 'publications', 'date_info'):
+        tous[relation].attendre(ids)
+    # Retour d'un enfant vers un dataset déjà lu : aucune requête
+    tous['dataset'].amorcer({d.pk: d for d in datasets})
+
+
+def enregistrer_datasets(info, datasets):
+    """Annonce des datasets renvoyés par un resolver : leurs relations seront chargées ensemble"""
+    datasets = [d for d in datasets if d is not None]
+    annoncer_datasets_lus(chargeurs(info), datasets)
+    return datasets
+
+
+def charger_relation(info, relation, dataset):
+    """contacts, publications ou date_info du dataset"""
+    return chargeurs(info)[relation].charger_un(dataset.pk)
+
+
+def charger_dataset(info, enfant):
+    """Dataset d'un contact, d'une publication ou d'une date"""
+    return chargeurs(info)['dataset'].charger_un(enfant.dataset_id)
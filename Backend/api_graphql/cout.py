@@ -0,0 +1,167 @@
+"""
+Profondeur et coût d'un document GraphQL, estimés avant exécution.
+
+Les retours enfant -> dataset (ContactType.dataset, PublicationType.dataset)
+permettent des cycles allDatasets -> contacts -> dataset -> publications...
+dont le résultat grossit à chaque niveau. Le coût est calculé sur le
+document seul, sans lire la base : chaque objet lu coûte le poids de son
+champ (1 par défaut), multiplié par le nombre d'éléments des listes
+traversées (first ou ids s'ils sont donnés, sinon la taille supposée de la
+liste). Les scalaires ne coûtent rien sauf poids explicite (totalCount).
+
+Les limites dépendent de l'utilisateur (anonyme, authentifié, staff, ou
+réglage propre à un compte) : le calcul est refait à chaque requête sur le
+document gardé en cache, les variables pouvant changer first et ids.
+"""
+from django.conf import settings
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError, InlineFragmentNode,
+    get_named_type, get_nullable_type, is_leaf_type, is_list_type, value_from_ast_untyped,
+)
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .pagination import taille_page
+
+
+def taille_premiers(first):
+    """Éléments d'une page pour first, comme datasetsConnection"""
+    if not isinstance(first, int):
+        return taille_page(None)
+    return taille_page(first) if first >= 0 else 0
+
+
+def taille_liste(cle, arguments, taille_connexion):
+    options = settings.GRAPHQL_COUT
+    if isinstance(arguments.get('ids'), list):
+        return min(len(set(arguments['ids'])), settings.DATASETS_LOT_MAX)
+    if 'first' in arguments:
+        return taille_premiers(arguments['first'])
+    if taille_connexion is not None:
+        return taille_connexion
+    return options['TAILLES'].get(cle, options['TAILLE_LISTE'])
+
+
+class CoutDepasse(Exception):
+    """Parcours arrêté dès qu'une limite est franchie (valeurs atteintes à cet instant)"""
+
+    def __init__(self, profondeur=None, cout=None):
+        super().__init__(profondeur, cout)
+        self.profondeur, self.cout = profondeur, cout
+
+
+def mesurer(schema, document, operation, variables=None, limites=None):
+    """(profondeur, coût) de l'opération pour ces variables
+
+    Le coût est linéaire dans le nombre d'éléments parents : chaque sélection
+    est mesurée par élément, et chaque fragment nommé n'est parcouru qu'une
+    fois (par taille de connexion). Comme à l'exécution (collect_fields), un
+    fragment répété dans une même sélection ne compte qu'une fois. Avec des
+    limites, le parcours s'arrête (CoutDepasse) dès qu'elles sont franchies.
+
+    Les champs d'introspection (__schema, __typename...) ne comptent pas :
+    GraphiQL reste utilisable quelles que soient les limites.
+    """
+    poids = settings.GRAPHQL_COUT['POIDS']
+    variables = variables or {}
+    limites = limites or {}
+    profondeur_max, cout_max = limites.get('profondeur'), limites.get('cout')
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions if isinstance(definition, FragmentDefinitionNode)
+    }
+    mesures_fragments = {}
+
+    def parcourir(selection_set, type_parent, niveau, facteur, taille_connexion, visites=None):
+        """(profondeur, coût par élément parent) ; facteur : éléments parents depuis la racine"""
+        visites = set() if visites is None else visites
+        profondeur, cout = 0, 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                mesure = champ(selection, type_parent, niveau, facteur, taille_connexion)
+            elif isinstance(selection, InlineFragmentNode):
+                condition = selection.type_condition
+                mesure = parcourir(selection.selection_set,
+                                   schema.get_type(condition.name.value) if condition else type_parent,
+                                   niveau, facteur, taille_connexion, visites)
+            elif isinstance(selection, FragmentSpreadNode) and selection.name.value not in visites:
+                visites.add(selection.name.value)
+                mesure = fragment(selection.name.value, niveau, facteur, taille_connexion)
+            else:
+                continue
+            profondeur, cout = max(profondeur, mesure[0]), cout + mesure[1]
+            if profondeur_max is not None and niveau + profondeur > profondeur_max:
+                raise CoutDepasse(profondeur=niveau + profondeur)
+            if cout_max is not None and facteur * cout > cout_max:
+                raise CoutDepasse(cout=facteur * cout)
+        return profondeur, cout
+
+    def fragment(nom, niveau, facteur, taille_connexion):
+        cle = (nom, taille_connexion)
+        if cle not in mesures_fragments:
+            definition = fragments.get(nom)
+            mesures_fragments[cle] = (0, 0) if definition is None else parcourir(
+                definition.selection_set, schema.get_type(definition.type_condition.name.value),
+                niveau, facteur, taille_connexion,
+            )
+        return mesures_fragments[cle]
+
+    def champ(noeud, type_objet, niveau, facteur, taille_connexion):
+        nom = noeud.name.value
+        definition = getattr(type_objet, 'fields', {}).get(nom)
+        if nom.startswith('__') or definition is None:
+            return 0, 0
+        if profondeur_max is not None and niveau + 1 > profondeur_max:
+            raise CoutDepasse(profondeur=niveau + 1)
+        cle = f"{type_objet.name}.{nom}"
+        type_champ = get_nullable_type(definition.type)
+        if is_leaf_type(get_named_type(type_champ)) or noeud.selection_set is None:
+            return 1, poids.get(cle, 0)
+
+        arguments = {argument.name.value: value_from_ast_untyped(argument.value, variables)
+                     for argument in noeud.arguments}
+        elements = taille_liste(cle, arguments, taille_connexion) if is_list_type(type_champ) else 1
+        # Connexion paginée : first fixe la taille de ses edges
+        page = taille_premiers(arguments.get('first')) if 'first' in definition.args else None
+        profondeur, cout = parcourir(noeud.selection_set, get_named_type(type_champ),
+                                     niveau + 1, facteur * elements, page)
+        return profondeur + 1, elements * (poids.get(cle, 1) + cout)
+
+    return parcourir(operation.selection_set, schema.get_root_type(operation.operation), 0, 1, None)
+
+
+def utilisateur_graphql(request):
+    """Utilisateur de la session ou du jeton (Authorization: Token), None si anonyme"""
+    utilisateur = getattr(request, 'user', None)
+    if utilisateur is not None and utilisateur.is_authenticated:
+        return utilisateur
+    try:
+        authentifie = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return authentifie[0] if authentifie else None
+
+
+def limites_graphql(request):
+    """{'profondeur': ..., 'cout': ...} applicables à l'auteur de la requête"""
+    options = settings.GRAPHQL_COUT
+    utilisateur = utilisateur_graphql(request)
+    if utilisateur is None:
+        return dict(options['LIMITES']['anonyme'])
+    limites = dict(options['LIMITES']['staff' if utilisateur.is_staff else 'utilisateur'])
+    limites.update(options['UTILISATEURS'].get(utilisateur.get_username(), {}))
+    return limites
+
+
+def erreur_cout(depassement, limites):
+    """GraphQLError d'un document arrêté par CoutDepasse"""
+    if depassement.profondeur is not None:
+        return GraphQLError(
+            f"Requête trop profonde : au moins {depassement.profondeur} niveaux "
+            f"pour {limites['profondeur']} au plus",
+            extensions={'code': 'QUERY_TOO_COMPLEX', 'profondeur': depassement.profondeur, 'limites': limites},
+        )
+    return GraphQLError(
+        f"Requête trop coûteuse : coût estimé d'au moins {depassement.cout} pour {limites['cout']} au plus",
+        extensions={'code': 'QUERY_TOO_COMPLEX', 'cout': depassement.cout, 'limites': limites},
+    )
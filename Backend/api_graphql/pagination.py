@@ -0,0 +1,66 @@
+"""
+Pagination par curseur de datasetsConnection.
+
+Même ordre que la pagination de l'API REST (api_rest.pagination) : date de
+publication décroissante puis dataset_id, sur les colonnes de DateInfo (les
+datasets sans DateInfo ne sont pas paginés). Le curseur encode la clé
+(date, id) du dernier dataset : chaque page est une requête bornée
+par l'index, quelle que soit sa position dans le catalogue.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import F
+from django.utils.dateparse import parse_datetime
+from graphql import GraphQLError
+
+from api_rest.pagination import CHAMP_DATE, ORDRE_DECROISSANT, CurseurDatasetsPagination, avec_date
+from recup_donnee.models import CatalogStats
+
+
+def encoder_curseur(date, pk):
+    contenu = json.dumps({'p': date.isoformat(), 'i': pk})
+    return base64.urlsafe_b64encode(contenu.encode('ascii')).decode('ascii')
+
+
+def decoder_curseur(curseur):
+    try:
+        contenu = json.loads(base64.urlsafe_b64decode(curseur.encode('ascii')))
+        date = parse_datetime(contenu['p'])
+        if date is None:
+            raise ValueError(contenu['p'])
+        return date, int(contenu['i'])
+    except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+        raise GraphQLError(CurseurDatasetsPagination.invalid_cursor_message)
+
+
+def taille_page(first):
+    options = getattr(settings, 'DATASETS_PAGINATION', {})
+    if first is None:
+        return options.get('PAGE_SIZE', 50)
+    if first < 0:
+        raise GraphQLError("first doit être positif")
+    return min(first, options.get('MAX_PAGE_SIZE', 500))
+
+
+def page_datasets(queryset, first=None, after=None):
+    """(datasets de la page avec leur curseur, page suivante ?) pour first/after"""
+    taille = taille_page(first)
+    queryset = avec_date(queryset)
+    if after:
+        queryset = queryset.filter(CurseurDatasetsPagination().q_apres(*decoder_curseur(after)))
+    lignes = list(
+        queryset.annotate(cle_publication=F(CHAMP_DATE))
+        .order_by(*ORDRE_DECROISSANT)[:taille + 1]
+    )
+    return [(d, encoder_curseur(d.cle_publication, d.pk)) for d in lignes[:taille]], len(lignes) > taille
+
+
+def compter_datasets(queryset, filtre):
+    """totalCount : agrégat des statistiques sans filtre (s'il est à jour), COUNT sinon"""
+    if not filtre:
+        total = CatalogStats.objects.filter(pk=1, stale=False).values_list('datasets', flat=True).first()
+        if total is not None:
+            return total
+    return queryset.order_by().count()
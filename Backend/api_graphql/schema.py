@@ -1,25 +1,42 @@
 import graphene
+from django.conf import settings
+from graphene import relay
+from graphql import GraphQLError
 from graphene_django import DjangoObjectType
+from api_rest.filtres import filtrer_datasets
+from recup_donnee.catalogue import etat_catalogue, etat_requete
 from recup_donnee.models import Dataset, Contact, Publication, DateInfo, HarvestConfig
 
+from .chargeurs import charger_dataset, charger_relation, enregistrer_datasets
+from .pagination import compter_datasets, page_datasets
+
 
 class ContactType(DjangoObjectType):
     class Meta:
         model = Contact
         fields = ("id", "name", "affiliation", "dataset")
 
+    def resolve_dataset(self, info):
+        return charger_dataset(info, self)
+
 
 class PublicationType(DjangoObjectType):
     class Meta:
         model = Publication
         fields = ("id", "citation", "url", "dataset")
 
+    def resolve_dataset(self, info):
+        return charger_dataset(info, self)
+
 
 class DateInfoType(DjangoObjectType):
     class Meta:
         model = DateInfo
         fields = ("id", "created_at", "updated_at", "published_at", "dataset")
 
+    def resolve_dataset(self, info):
+        return charger_dataset(info, self)
+
 
 class HarvestConfigType(DjangoObjectType):
     class Meta:
@@ -45,26 +62,92 @@ class DatasetType(DjangoObjectType):
             "authors",
         )
 
+    # Relations chargées pour tous les datasets de la requête (chargeurs.py)
     def resolve_contacts(self, info):
-        return self.contacts.all()
+        return charger_relation(info, "contacts", self)
 
     def resolve_publications(self, info):
-        return self.publications.all()
+        return charger_relation(info, "publications", self)
 
     def resolve_date_info(self, info):
-        return getattr(self, "date_info", None)
+        return charger_relation(info, "date_info", self)
+
+
+class DatasetConnection(relay.Connection):
+    """Page de datasets, du plus récemment publié au plus ancien"""
+    total_count = graphene.Int(required=True, description="Nombre de datasets filtrés, toutes pages confondues")
+
+    class Meta:
+        node = DatasetType
+
+    def resolve_total_count(root, info):
+        # Compté seulement si le champ est demandé
+        return compter_datasets(root.queryset, root.filtre)
+
+
+# Mêmes filtres que la liste REST (api_rest.filtres), noms en camelCase
+FILTRES_DATASETS = {
+    "mots_cles": graphene.String(description="Termes séparés par des virgules (mots-clés, nom, description)"),
+    "organisations": graphene.String(description="Auteurs, séparés par des virgules"),
+    "localisations": graphene.String(description="Sujets, séparés par des virgules"),
+    "catalogue": graphene.String(description="Catalogue attribué à l'import"),
+    "thematique": graphene.String(description="Thématique attribuée à l'import"),
+    "producteur": graphene.String(description="Auteur producteur des données"),
+    "date_debut": graphene.Date(description="Publiés à partir de cette date"),
+    "date_fin": graphene.Date(description="Publiés jusqu'à cette date"),
+}
 
 
 class Query(graphene.ObjectType):
     all_datasets = graphene.List(DatasetType)
+    datasets_connection = relay.ConnectionField(
+        DatasetConnection,
+        description="Datasets filtrés et paginés par curseur (first/after)",
+        **FILTRES_DATASETS,
+    )
     dataset_by_id = graphene.Field(DatasetType, id=graphene.Int(required=True))
+    datasets_by_ids = graphene.List(
+        DatasetType,
+        ids=graphene.List(graphene.NonNull(graphene.Int), required=True),
+        description="Datasets dans l'ordre des ids demandés (DATASETS_LOT_MAX au plus)",
+    )
     all_harvests = graphene.List(HarvestConfigType)
 
     def resolve_all_datasets(root, info):
-        return Dataset.objects.all()
+        return enregistrer_datasets(info, Dataset.objects.actifs())
+
+    def resolve_datasets_connection(root, info, first=None, after=None, last=None, before=None, **filtres):
+        if last is not None or before is not None:
+            raise GraphQLError("Pagination vers l'avant seulement : utiliser first/after")
+        filtres = {nom: valeur for nom, valeur in filtres.items() if valeur}
+        contexte = info.context
+        queryset = filtrer_datasets(
+            Dataset.objects.actifs(), filtres,
+            lambda: etat_requete(contexte) if contexte is not None else etat_catalogue(),
+        )
+        page, encore = page_datasets(queryset, first, after)
+        enregistrer_datasets(info, [dataset for dataset, _ in page])
+        edges = [DatasetConnection.Edge(node=dataset, cursor=curseur) for dataset, curseur in page]
+        connexion = DatasetConnection(edges=edges, page_info=relay.PageInfo(
+            has_next_page=encore,
+            has_previous_page=bool(after),
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        ))
+        connexion.queryset, connexion.filtre = queryset, bool(filtres)
+        return connexion
 
     def resolve_dataset_by_id(root, info, id):
-        return Dataset.objects.filter(pk=id).first()
+        dataset = Dataset.objects.actifs().filter(pk=id).first()
+        enregistrer_datasets(info, [dataset])
+        return dataset
+
+    def resolve_datasets_by_ids(root, info, ids):
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > settings.DATASETS_LOT_MAX:
+            raise GraphQLError(f"{settings.DATASETS_LOT_MAX} ids au plus par requête")
+        # Relations chargées à la demande, une requête chacune quel que soit le nombre d'ids
+        return enregistrer_datasets(info, Dataset.objects.actifs().par_ids(ids))
 
     def resolve_all_harvests(root, info):
         return HarvestConfig.objects.all()
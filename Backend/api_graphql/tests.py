@@ -1,3 +1,305 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+import graphql
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api_rest.tests import SANS_CACHE, creer_datasets
+from gestion_donnee.budget_requetes import budget_requetes
+from recup_donnee.models import Dataset
+from .views import documents_analyses, empreinte
+
+DOCUMENT_COMPLET = """{
+    allDatasets {
+        id nameOfDataverse
+        contacts { name affiliation }
+        publications { citation url }
+        dateInfo { publishedAt }
+    }
+}"""
+
+# Aller-retours enfant -> dataset -> enfants
+DOCUMENT_CYCLIQUE = """{
+    allDatasets {
+        id
+        contacts { name dataset { id publications { citation dataset { id dateInfo { publishedAt } } } } }
+    }
+}"""
+
+
+@SANS_CACHE
+class ChargeursTests(TestCase):
+    """Le nombre de requêtes d'un document dépend de sa profondeur, pas du nombre de datasets"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def executer(self, document):
+        reponse = self.client.post('/api/graphql/', {'query': document}, format='json')
+        self.assertNotIn('errors', reponse.json())
+        return reponse.json()['data']
+
+    def test_requetes_independantes_du_nombre_de_datasets(self):
+        for nombre, debut in ((5, 0), (40, 5)):
+            creer_datasets(nombre, debut)
+            # version du catalogue + datasets + contacts + publications + dates
+            with budget_requetes(5):
+                self.executer(DOCUMENT_COMPLET)
+            # + retours vers les datasets déjà lus : aucune requête de plus
+            with budget_requetes(5):
+                self.executer(DOCUMENT_CYCLIQUE)
+
+    def test_memes_donnees_que_l_orm(self):
+        creer_datasets(12)
+        donnees = self.executer(DOCUMENT_COMPLET)['allDatasets']
+        for element in donnees:
+            dataset = Dataset.objects.get(pk=element['id'])
+            self.assertEqual(
+                [c['name'] for c in element['contacts']],
+                list(dataset.contacts.order_by('id').values_list('name', flat=True)),
+            )
+            self.assertEqual(len(element['publications']), dataset.publications.count())
+            self.assertIsNotNone(element['dateInfo'])
+        cycle = self.executer(DOCUMENT_CYCLIQUE)['allDatasets']
+        for element in cycle:
+            for contact in element['contacts']:
+                self.assertEqual(contact['dataset']['id'], element['id'])
+
+    def test_dataset_par_id(self):
+        creer_datasets(3)
+        pk = Dataset.objects.order_by('id').last().pk
+        donnees = self.executer(f"{{ datasetById(id: {pk}) {{ id contacts {{ name }} dateInfo {{ publishedAt }} }} }}")
+        self.assertEqual(len(donnees['datasetById']['contacts']), 2)
+        self.assertIsNone(self.executer("{ datasetById(id: 999999) { id contacts { name } } }")['datasetById'])
+
+
+CONNEXION = """query($first: Int, $after: String, $motsCles: String, $organisations: String,
+                     $thematique: String, $dateDebut: Date, $dateFin: Date) {
+    datasetsConnection(first: $first, after: $after, motsCles: $motsCles, organisations: $organisations,
+                       thematique: $thematique, dateDebut: $dateDebut, dateFin: $dateFin) {
+        totalCount
+        pageInfo { hasNextPage hasPreviousPage endCursor }
+        edges { cursor node { id contacts { name } } }
+    }
+}"""
+
+
+@SANS_CACHE
+class ConnexionTests(TestCase):
+    """datasetsConnection : pagination par curseur et mêmes filtres que l'API REST"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        creer_datasets(30)
+
+    def connexion(self, **variables):
+        reponse = self.client.post('/api/graphql/', {'query': CONNEXION, 'variables': variables}, format='json')
+        return reponse.json()
+
+    def test_pages_dans_l_ordre_de_l_api_rest(self):
+        ids, apres = [], None
+        while True:
+            page = self.connexion(first=7, after=apres)['data']['datasetsConnection']
+            self.assertEqual(page['totalCount'], 30)
+            self.assertEqual(page['pageInfo']['hasPreviousPage'], apres is not None)
+            ids += [int(e['node']['id']) for e in page['edges']]
+            if not page['pageInfo']['hasNextPage']:
+                break
+            apres = page['pageInfo']['endCursor']
+        rest = self.client.get('/api/donnees/datasets/?page_size=30&fields=id').json()['results']
+        self.assertEqual(ids, [d['id'] for d in rest])
+
+    def test_memes_filtres_que_l_api_rest(self):
+        for variables, params in (
+            ({'motsCles': 'ocean'}, 'mots_cles=ocean'),
+            ({'organisations': 'auteur 1,auteur 2'}, 'organisations=auteur 1,auteur 2'),
+            ({'dateDebut': '2013-01-01', 'dateFin': '2016-12-31'}, 'date_debut=2013-01-01&date_fin=2016-12-31'),
+            ({'thematique': 'inconnue'}, 'thematique=inconnue'),
+        ):
+            with self.subTest(params=params):
+                page = self.connexion(first=100, **variables)['data']['datasetsConnection']
+                rest = self.client.get(f"/api/donnees/datasets/?{params}&fields=id").json()
+                self.assertEqual(sorted(int(e['node']['id']) for e in page['edges']), sorted(d['id'] for d in rest))
+                self.assertEqual(page['totalCount'], len(rest))
+
+    def test_requetes(self):
+        # page + contacts + COUNT, quel que soit first
+        for first in (5, 25):
+            with budget_requetes(3):
+                self.connexion(first=first, organisations='auteur 1')
+
+    def test_erreurs(self):
+        self.assertIn('errors', self.connexion(first=5, after='invalide'))
+        reponse = self.client.post('/api/graphql/', {'query': '{ datasetsConnection(last: 3) { totalCount } }'}, format='json')
+        self.assertIn('errors', reponse.json())
+
+
+DOCUMENT_PERSISTE = "query DatasetById($id: Int!) { datasetById(id: $id) { id nameOfDataverse } }"
+
+
+@SANS_CACHE
+class DocumentsPersistesTests(TestCase):
+    """Cache des documents analysés et requêtes persistées automatiques"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        documents_analyses.vider()
+        creer_datasets(2)
+        self.pk = Dataset.objects.order_by('id').first().pk
+
+    def persistee(self, query=None, sha=None, **corps):
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': sha or empreinte(DOCUMENT_PERSISTE)}}
+        donnees = {'extensions': extensions, 'variables': {'id': self.pk}, **corps}
+        if query:
+            donnees['query'] = query
+        return self.client.post('/api/graphql/', donnees, format='json')
+
+    def test_document_analyse_une_seule_fois(self):
+        with mock.patch('api_graphql.views.parse', wraps=graphql.parse) as parse, \
+                mock.patch('api_graphql.views.validate', wraps=graphql.validate) as validate:
+            for _ in range(3):
+                reponse = self.client.post('/api/graphql/', {'query': DOCUMENT_PERSISTE, 'variables': {'id': self.pk}},
+                                           format='json')
+                self.assertEqual(reponse.json()['data']['datasetById']['id'], str(self.pk))
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(validate.call_count, 1)
+
+    def test_erreurs_de_validation_conservees(self):
+        for _ in range(2):
+            reponse = self.client.post('/api/graphql/', {'query': '{ champInconnu }'}, format='json')
+            self.assertEqual(reponse.status_code, 400)
+            self.assertIn('champInconnu', reponse.json()['errors'][0]['message'])
+
+    def test_empreinte_inconnue_puis_enregistree(self):
+        reponse = self.persistee()
+        self.assertEqual(reponse.json()['errors'][0]['message'], 'PersistedQueryNotFound')
+        self.assertEqual(reponse.json()['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+
+        reponse = self.persistee(query=DOCUMENT_PERSISTE)
+        self.assertEqual(reponse.status_code, 200)
+        attendu = reponse.json()
+
+        # L'empreinte seule suffit ensuite, en POST comme en GET
+        self.assertEqual(self.persistee().json(), attendu)
+        reponse = self.client.get('/api/graphql/', {
+            'extensions': json.dumps({'persistedQuery': {'version': 1, 'sha256Hash': empreinte(DOCUMENT_PERSISTE)}}),
+            'variables': json.dumps({'id': self.pk}),
+        }, HTTP_ACCEPT='application/json')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json(), attendu)
+
+    def test_empreinte_differente_du_texte(self):
+        reponse = self.persistee(query=DOCUMENT_PERSISTE, sha='0' * 64)
+        self.assertEqual(reponse.status_code, 400)
+        self.assertIsNone(cache.get(f"graphql:persistee:{'0' * 64}"))
+
+    def test_version_inconnue(self):
+        reponse = self.client.post('/api/graphql/', {
+            'query': DOCUMENT_PERSISTE, 'variables': {'id': self.pk},
+            'extensions': {'persistedQuery': {'version': 2, 'sha256Hash': empreinte(DOCUMENT_PERSISTE)}},
+        }, format='json')
+        self.assertEqual(reponse.status_code, 400)
+
+
+COUT_TEST = {
+    'POIDS': {'DatasetConnection.totalCount': 50},
+    'TAILLES': {'Query.allDatasets': 10, 'DatasetType.contacts': 2, 'DatasetType.publications': 3},
+    'TAILLE_LISTE': 20,
+    'LIMITES': {
+        'anonyme': {'profondeur': 4, 'cout': 200},
+        'utilisateur': {'profondeur': 6, 'cout': 2000},
+        'staff': {'profondeur': None, 'cout': None},
+    },
+    'UTILISATEURS': {'limite': {'cout': 50}},
+}
+
+
+@SANS_CACHE
+@override_settings(GRAPHQL_COUT=COUT_TEST)
+class CoutTests(TestCase):
+    """Profondeur et coût estimés avant exécution, limites selon l'utilisateur"""
+
+    def setUp(self):
+        self.client = APIClient()
+        documents_analyses.vider()
+        creer_datasets(3)
+
+    def executer(self, document, variables=None, utilisateur=None, **champs):
+        if utilisateur is not None:
+            jeton = Token.objects.create(user=User.objects.create_user(utilisateur, **champs))
+            self.client.credentials(HTTP_AUTHORIZATION=f"Token {jeton.key}")
+        return self.client.post('/api/graphql/', {'query': document, 'variables': variables or {}}, format='json')
+
+    def assertAccepte(self, reponse, profondeur, cout):
+        self.assertEqual(reponse.status_code, 200, reponse.content)
+        self.assertNotIn('errors', reponse.json())
+        self.assertEqual(reponse.json()['extensions']['cout'], {'profondeur': profondeur, 'cout': cout})
+
+    def assertRefuse(self, reponse, **attendu):
+        """Refus avant exécution ; le parcours s'arrête à la première limite franchie"""
+        self.assertEqual(reponse.status_code, 400)
+        erreur = reponse.json()['errors'][0]
+        self.assertEqual(erreur['extensions']['code'], 'QUERY_TOO_COMPLEX')
+        for cle, valeur in attendu.items():
+            self.assertEqual(erreur['extensions'][cle], valeur)
+        self.assertNotIn('data', reponse.json())
+        return erreur
+
+    def test_listes_et_poids(self):
+        # allDatasets 10 + contacts 10x2 + publications 10x3 + dateInfo 10
+        self.assertAccepte(self.executer(DOCUMENT_COMPLET), 3, 70)
+        # Fragments dépliés, même coût que les champs écrits en place
+        self.assertAccepte(self.executer(
+            "{ allDatasets { ...C } } fragment C on DatasetType { id contacts { name } }"
+        ), 3, 30)
+        # Taille donnée par les ids
+        ids = list(Dataset.objects.values_list('id', flat=True))
+        self.assertAccepte(self.executer(
+            "query($ids: [Int!]!) { datasetsByIds(ids: $ids) { id contacts { name } } }", {'ids': ids + ids},
+        ), 3, 9)
+
+    def test_connexion_par_first(self):
+        # connexion 1 + totalCount 50 + pageInfo 1 + edges first + node first + contacts first x2
+        for first, cout in ((2, 60), (3, 64)):
+            reponse = self.executer(CONNEXION, {'first': first}, utilisateur=f"lecteur{first}")
+            self.assertAccepte(reponse, 5, cout)
+
+    def test_cycle_refuse_sans_requete(self):
+        # 10 + 20 contacts + 20 datasets + 60 publications + 60 datasets + 60 dates
+        with budget_requetes(0):
+            self.assertRefuse(self.executer(DOCUMENT_CYCLIQUE), profondeur=5)
+        self.assertRefuse(self.executer(DOCUMENT_CYCLIQUE, utilisateur='lecteur'), profondeur=7)
+        self.assertAccepte(self.executer(DOCUMENT_CYCLIQUE, utilisateur='admin', is_staff=True), 7, 230)
+
+    def test_limites_par_utilisateur(self):
+        erreur = self.assertRefuse(self.executer(DOCUMENT_COMPLET, utilisateur='limite'),
+                                   limites={'profondeur': 6, 'cout': 50})
+        self.assertGreater(erreur['extensions']['cout'], 50)
+
+    def test_fragments_imbriques_mesures_une_fois(self):
+        # F0 -> F1 F1 -> ... -> allHarvests : 2^30 dépliages si chaque usage était reparcouru
+        chaine = "{ ...F0 } " + " ".join(f"fragment F{i} on Query {{ ...F{i + 1} ...F{i + 1} }}" for i in range(30))
+        chaine += " fragment F30 on Query { allHarvests { id } }"
+        with budget_requetes(1):
+            self.assertAccepte(self.executer(chaine), 2, 20)
+
+        # Deux fragments distincts par niveau : coût qui double à chaque niveau,
+        # chaque fragment n'étant parcouru qu'une fois
+        branches = "{ ...F0 } " + " ".join(
+            f"fragment F{i} on Query {{ ...A{i} ...B{i} }} "
+            f"fragment A{i} on Query {{ ...F{i + 1} }} fragment B{i} on Query {{ ...F{i + 1} }}"
+            for i in range(30)
+        ) + " fragment F30 on Query { allHarvests { id } }"
+        with budget_requetes(0):
+            self.assertGreater(self.assertRefuse(self.executer(branches))['extensions']['cout'], 200)
+        self.assertAccepte(self.executer(branches, utilisateur='admin', is_staff=True), 2, 20 * 2 ** 30)
+
+    def test_introspection_gratuite(self):
+        self.assertAccepte(self.executer(graphql.get_introspection_query()), 0, 0)
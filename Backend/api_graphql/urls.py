@@ -1,9 +1,14 @@
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
 
+from recup_donnee.catalogue import conditionnel_catalogue
 from .schema import schema
+from .views import GraphQLVue, graphql_async
 
 urlpatterns = [
-    path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
+    # Les requêtes GET reçoivent ETag / Last-Modified (version du catalogue) ;
+    # avec les requêtes persistées, un GET ne porte que l'empreinte du document
+    path("graphql/", csrf_exempt(conditionnel_catalogue(GraphQLVue.as_view(graphiql=True, schema=schema)))),
+    # Même schéma pour le serveur ASGI, à côté des vues de api_rest.urls_async
+    path("async/graphql/", csrf_exempt(conditionnel_catalogue(graphql_async))),
 ]
@@ -1,3 +1,209 @@
-from django.shortcuts import render
+"""
+Point d'entrée GraphQL : GraphQLView avec cache des documents et requêtes
+persistées automatiques.
 
-# Create your views here.
+Les documents analysés et validés sont gardés dans un LRU par processus,
+indexé par l'empreinte sha256 du texte : une requête déjà vue n'est ni
+réanalysée ni revalidée.
+
+Requêtes persistées (protocole « automatic persisted queries » d'Apollo) :
+le client envoie seulement extensions.persistedQuery.sha256Hash ; si
+l'empreinte est inconnue, la réponse contient l'erreur
+PersistedQueryNotFound et le client renvoie le texte avec l'empreinte,
+qui est vérifiée puis enregistrée dans le cache 'default'.
+
+Avant exécution, la profondeur et le coût estimés du document (cout.py)
+sont comparés aux limites de l'utilisateur ; ils sont renvoyés dans
+extensions.cout de la réponse.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast, parse, validate, validate_schema,
+)
+
+from .cout import CoutDepasse, erreur_cout, limites_graphql, mesurer
+from .schema import schema
+
+PREFIXE_PERSISTEES = 'graphql:persistee:'
+
+
+def empreinte(texte):
+    return hashlib.sha256(texte.encode()).hexdigest()
+
+
+class DocumentsAnalyses:
+    """LRU des documents analysés : empreinte -> (document, erreurs de validation)"""
+
+    def __init__(self):
+        self.documents = OrderedDict()
+        self.verrou = threading.Lock()
+
+    def obtenir(self, cle, analyser):
+        with self.verrou:
+            if cle in self.documents:
+                self.documents.move_to_end(cle)
+                return self.documents[cle]
+        resultat = analyser()
+        with self.verrou:
+            self.documents[cle] = resultat
+            while len(self.documents) > settings.GRAPHQL_DOCUMENTS_MAX:
+                self.documents.popitem(last=False)
+        return resultat
+
+    def vider(self):
+        with self.verrou:
+            self.documents.clear()
+
+
+documents_analyses = DocumentsAnalyses()
+
+
+def persistee_non_trouvee():
+    return ExecutionResult(errors=[GraphQLError(
+        "PersistedQueryNotFound", extensions={'code': 'PERSISTED_QUERY_NOT_FOUND'},
+    )])
+
+
+class GraphQLVue(GraphQLView):
+    """GraphQLView sans analyse ni validation répétées, avec requêtes persistées et limites de coût"""
+
+    def empreinte_persistee(self, request, data):
+        """sha256Hash de extensions.persistedQuery (corps ou paramètre GET), None sinon"""
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        persistee = (extensions or {}).get('persistedQuery') if isinstance(extensions, dict) else None
+        if not persistee:
+            return None
+        if persistee.get('version') != 1 or not isinstance(persistee.get('sha256Hash'), str):
+            raise HttpError(HttpResponseBadRequest("Unsupported persisted query version."))
+        return persistee['sha256Hash'].lower()
+
+    def document(self, query):
+        """(document, erreurs) depuis le LRU, analysé et validé au premier passage"""
+        graphql_schema = self.schema.graphql_schema
+
+        def analyser():
+            try:
+                document = parse(query)
+            except Exception as e:
+                return None, [e]
+            erreurs = validate(graphql_schema, document, self.validation_rules,
+                               graphene_settings.MAX_VALIDATION_ERRORS)
+            return document, erreurs
+
+        cle = (id(graphql_schema), tuple(self.validation_rules or ()), empreinte(query))
+        return documents_analyses.obtenir(cle, analyser)
+
+    def json_encode(self, request, d, pretty=False):
+        mesure = getattr(request, 'cout_graphql', None)
+        if mesure is not None and isinstance(d, dict):
+            d = {**d, 'extensions': {'cout': mesure}}
+        return super().json_encode(request, d, pretty)
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        cle = self.empreinte_persistee(request, data)
+        if cle is not None:
+            if not query:
+                query = cache.get(f"{PREFIXE_PERSISTEES}{cle}")
+                if query is None:
+                    return persistee_non_trouvee()
+            elif empreinte(query) != cle:
+                raise HttpError(HttpResponseBadRequest("provided sha does not match query"))
+            else:
+                cache.set(f"{PREFIXE_PERSISTEES}{cle}", query, None)
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        erreurs = validate_schema(self.schema.graphql_schema)
+        if erreurs:
+            return ExecutionResult(data=None, errors=erreurs)
+
+        document, erreurs = self.document(query)
+        if erreurs:
+            return ExecutionResult(data=None, errors=erreurs)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if (
+            request.method.lower() == 'get'
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseNotAllowed(
+                ['POST'], f"Can only perform a {operation_ast.operation.value} operation from a POST request.",
+            ))
+
+        # Documents trop coûteux refusés sans toucher aux données
+        if operation_ast is not None:
+            limites = limites_graphql(request)
+            try:
+                profondeur, cout = mesurer(self.schema.graphql_schema, document, operation_ast, variables, limites)
+            except CoutDepasse as depassement:
+                return ExecutionResult(data=None, errors=[erreur_cout(depassement, limites)])
+            request.cout_graphql = {'profondeur': profondeur, 'cout': cout}
+
+        options = {
+            'root_value': self.get_root_value(request),
+            'context_value': self.get_context(request),
+            'variable_values': variables,
+            'operation_name': operation_name,
+            'middleware': self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            options['execution_context_class'] = self.execution_context_class
+        try:
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (graphene_settings.ATOMIC_MUTATIONS is True
+                     or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True)
+            ):
+                with transaction.atomic():
+                    resultat = execute(self.schema.graphql_schema, document, **options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return resultat
+            return execute(self.schema.graphql_schema, document, **options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+
+async def graphql_async(request):
+    """Requêtes GraphQL pour le serveur ASGI (sans GraphiQL ni lots)
+
+    Même analyse, même validation et même réponse que GraphQLVue. Les
+    resolvers de graphene-django sont synchrones : l'exécution passe dans
+    un thread (sync_to_async) pendant que la boucle sert d'autres requêtes.
+    """
+    vue = GraphQLVue(schema=schema)
+    try:
+        if request.method not in ('GET', 'POST'):
+            raise HttpError(HttpResponseNotAllowed(['GET', 'POST'], "GraphQL only supports GET and POST requests."))
+        donnees = vue.parse_body(request)
+        contenu, status = await sync_to_async(vue.get_response)(request, donnees)
+    except HttpError as e:
+        response = e.response
+        response['Content-Type'] = 'application/json'
+        response.content = vue.json_encode(request, {'errors': [vue.format_error(e)]})
+        return response
+    return HttpResponse(status=status, content=contenu, content_type='application/json')
@@ -0,0 +1,95 @@
+# api_rest/export.py
+"""
+Export du catalogue en flux (NDJSON ou CSV, gzip optionnel).
+
+Les datasets sont lus par lots successifs sur la clé primaire (id > dernier
+id vu) : chaque lot est une requête bornée, sérialisée par
+recup_donnee.serialisation puis envoyée, la mémoire ne dépend donc que de
+la taille d'un lot et les premiers octets partent dès le premier lot.
+"""
+import csv
+import io
+import json
+import zlib
+
+SORTIES = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+
+def lots_lignes(queryset, serialisation, taille_lot):
+    """Produit les lignes sérialisées par lots, dans l'ordre des ids"""
+    queryset = queryset.order_by('id')
+    dernier = None
+    while True:
+        lot = queryset if dernier is None else queryset.filter(id__gt=dernier)
+        lignes, brutes = serialisation.construire(lot[:taille_lot])
+        if not lignes:
+            return
+        yield lignes
+        dernier = brutes[-1]['pk']
+        if len(lignes) < taille_lot:
+            return
+
+
+def flux_ndjson(lots):
+    for lignes in lots:
+        yield ''.join(
+            json.dumps(ligne, ensure_ascii=False, separators=(',', ':')) + '\n' for ligne in lignes
+        ).encode()
+
+
+def aplatir(ligne):
+    """Ligne CSV : objets imbriqués en colonnes pointées, listes en texte"""
+    plate = {}
+    for nom, valeur in ligne.items():
+        if isinstance(valeur, dict):
+            for sous_nom, sous_valeur in valeur.items():
+                plate[f"{nom}.{sous_nom}"] = sous_valeur
+        elif isinstance(valeur, list):
+            plate[nom] = '; '.join(
+                ' | '.join(str(v) for k, v in element.items() if k not in ('id', 'dataset') and v)
+                for element in valeur
+            )
+        else:
+            plate[nom] = valeur
+    return plate
+
+
+def flux_csv(lots, colonnes):
+    tampon = io.StringIO()
+    ecrivain = csv.DictWriter(tampon, fieldnames=colonnes, extrasaction='ignore')
+    ecrivain.writeheader()
+    # L'en-tête part avant la première requête
+    yield tampon.getvalue().encode()
+    for lignes in lots:
+        tampon.seek(0)
+        tampon.truncate()
+        ecrivain.writerows(aplatir(ligne) for ligne in lignes)
+        yield tampon.getvalue().encode()
+
+
+def colonnes_csv(serialisation):
+    """En-tête CSV déduit du serializer (voir SerialisationRapide.plan)"""
+    champs = dict(serialisation.serializer.fields)
+    colonnes = []
+    for _, nom in serialisation.plan:
+        champ = champs[nom]
+        if hasattr(champ, 'fields') and not hasattr(champ, 'child'):
+            colonnes += [f"{nom}.{sous_nom}" for sous_nom in champ.fields]
+        else:
+            colonnes.append(nom)
+    return colonnes
+
+
+def compresser(flux):
+    """Compresse un flux d'octets en gzip au fil de l'eau
+
+    Chaque morceau est vidé (Z_SYNC_FLUSH) pour que le client reçoive
+    chaque lot sans attendre que le tampon de zlib se remplisse.
+    """
+    compresseur = zlib.compressobj(wbits=31)
+    for morceau in flux:
+        yield compresseur.compress(morceau) + compresseur.flush(zlib.Z_SYNC_FLUSH)
+    yield compresseur.flush()
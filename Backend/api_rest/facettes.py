@@ -0,0 +1,89 @@
+# api_rest/facettes.py
+"""
+Décomptes par facette (mots-clés, sujets, auteurs, affiliations, mois de
+publication) d'une sélection de datasets.
+
+Chaque facette est une requête GROUP BY sur les tables de termes, de
+contacts ou de dates, restreinte aux datasets filtrés par une sous-requête
+(id IN (...)) : aucun dataset n'est chargé en Python.
+"""
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+
+from recup_donnee.models import Contact, Dataset, DateInfo
+
+# facette -> relation de termes de Dataset
+TERMES = {
+    'mots_cles': 'keyword_terms',
+    'sujets': 'subject_terms',
+    'auteurs': 'author_terms',
+}
+FACETTES = (*TERMES, 'affiliations', 'mois')
+
+LIMITE_DEFAUT = 10
+LIMITE_MAX = 100
+
+
+def facette_termes(ids, relation, limite):
+    """Termes les plus fréquents ; un dataset compte une fois par terme normalisé"""
+    Lien = getattr(Dataset, relation).through
+    colonne = Dataset._meta.get_field(relation).related_model._meta.model_name
+    lignes = (
+        Lien.objects.filter(dataset_id__in=ids)
+        .values(f"{colonne}_id")
+        .annotate(nom=F(f"{colonne}__name"), nombre=Count('dataset_id'))
+        .order_by('-nombre', 'nom')[:limite]
+    )
+    return lignes, lambda ligne: {'nom': ligne['nom'], 'nombre': ligne['nombre']}
+
+
+def facette_affiliations(ids, limite):
+    """Affiliations des contacts, en nombre de datasets distincts"""
+    lignes = (
+        Contact.objects.filter(dataset_id__in=ids)
+        .exclude(affiliation__isnull=True).exclude(affiliation='')
+        .values('affiliation')
+        .annotate(nombre=Count('dataset_id', distinct=True))
+        .order_by('-nombre', 'affiliation')[:limite]
+    )
+    return lignes, lambda ligne: {'nom': ligne['affiliation'], 'nombre': ligne['nombre']}
+
+
+def facette_mois(ids):
+    """Datasets publiés par mois (AAAA-MM), tous les mois, dans l'ordre chronologique"""
+    lignes = (
+        DateInfo.objects.filter(dataset_id__in=ids)
+        .annotate(mois=TruncMonth('published_at'))
+        .values('mois')
+        .annotate(nombre=Count('id'))
+        .order_by('mois')
+    )
+    return lignes, lambda ligne: {'nom': ligne['mois'].strftime('%Y-%m'), 'nombre': ligne['nombre']}
+
+
+def requetes_facettes(queryset, facettes, limite):
+    """(facette, requête GROUP BY, mise en forme d'une ligne) de chaque facette demandée"""
+    ids = queryset.order_by().values('pk')
+    for facette in facettes:
+        if facette in TERMES:
+            yield facette, *facette_termes(ids, TERMES[facette], limite)
+        elif facette == 'affiliations':
+            yield facette, *facette_affiliations(ids, limite)
+        else:
+            yield facette, *facette_mois(ids)
+
+
+def calculer_facettes(queryset, facettes=FACETTES, limite=LIMITE_DEFAUT):
+    """Total et décomptes des facettes demandées pour les datasets de queryset"""
+    resultat = {'total': queryset.order_by().count()}
+    for facette, lignes, forme in requetes_facettes(queryset, facettes, limite):
+        resultat[facette] = [forme(ligne) for ligne in lignes]
+    return resultat
+
+
+async def acalculer_facettes(queryset, facettes=FACETTES, limite=LIMITE_DEFAUT):
+    """calculer_facettes() par l'ORM asynchrone"""
+    resultat = {'total': await queryset.order_by().acount()}
+    for facette, lignes, forme in requetes_facettes(queryset, facettes, limite):
+        resultat[facette] = [forme(ligne) async for ligne in lignes]
+    return resultat
@@ -0,0 +1,127 @@
+# api_rest/filtres.py
+"""
+Filtres de la liste des datasets, partagés par DatasetViewSet (paramètres
+GET) et la connexion GraphQL datasetsConnection (arguments du champ).
+
+Chaque filtre est une condition SQL : termes normalisés par sous-requête
+sur les tables de liaison, tags de classification, dates de publication.
+"""
+from datetime import date, datetime
+
+from django.db.models import Q
+
+from recup_donnee.classification import CHAMPS_CLASSES, CLASSIFICATIONS, classification_a_jour
+from recup_donnee.models import Dataset, Tag
+from recup_donnee.termes import normaliser_terme
+
+
+def q_terme(relation, terme):
+    """Datasets reliés à un terme dont la forme normalisée commence par `terme`
+
+    La comparaison porte sur la table des termes, bien plus petite que celle
+    des datasets, puis passe par la table de liaison indexée au lieu d'un
+    icontains sur le texte de chaque dataset. Un préfixe (LIKE 'x%') reste
+    servi par l'index unique de normalized (doublé sous PostgreSQL par
+    l'index _like en varchar_pattern_ops que Django crée pour ce champ),
+    ce que ne permet pas une sous-chaîne.
+    """
+    Lien = getattr(Dataset, relation).through
+    colonne = Dataset._meta.get_field(relation).related_model._meta.model_name
+    ids = Lien.objects.filter(**{f"{colonne}__normalized__startswith": normaliser_terme(terme)}).values('dataset_id')
+    return Q(pk__in=ids)
+
+def q_classification(kind, valeur, etat):
+    """Datasets classés dans un catalogue ou une thématique
+
+    Égalité sur la table des tags (recup_donnee.classification). Pour une
+    valeur inconnue des tables, ou tant que le catalogue n'a pas été
+    reclassé après leur modification, recherche par sous-chaînes.
+    """
+    table = CLASSIFICATIONS[kind]
+    if valeur in table and classification_a_jour(etat):
+        ids = Dataset.tags.through.objects.filter(tag__kind=kind, tag__slug=valeur).values('dataset_id')
+        return Q(pk__in=ids)
+    q = Q()
+    for terme in table.get(valeur, [valeur]):
+        for champ in CHAMPS_CLASSES:
+            q |= Q(**{f"{champ}__icontains": terme})
+    return q
+
+
+def lire_date(valeur):
+    """Date AAAA-MM-JJ (texte des paramètres GET) ou date déjà convertie (GraphQL)"""
+    if isinstance(valeur, date):
+        return valeur
+    return datetime.strptime(valeur, '%Y-%m-%d').date()
+
+
+def filtrer_datasets(qs, params, etat):
+    """Applique à qs les filtres présents dans params (mapping nom -> valeur)
+
+    etat : fonction retournant la version du catalogue, appelée seulement
+    pour un filtre catalogue ou thématique.
+    """
+    # 1. MOTS-CLÉS (keywords)
+    mots_cles = params.get('mots_cles') or params.get('keywords')
+    if mots_cles:
+        terms = [t.strip() for t in mots_cles.split(',') if t.strip()]
+        q = Q()
+        for t in terms:
+            q |= q_terme('keyword_terms', t) | Q(name_of_dataverse__icontains=t) | Q(description__icontains=t)
+        qs = qs.filter(q)
+
+    # 2. ORGANISATIONS (authors)
+    organisations = params.get('organisations')
+    if organisations:
+        terms = [t.strip() for t in organisations.split(',') if t.strip()]
+        q = Q()
+        for t in terms:
+            q |= q_terme('author_terms', t)
+        qs = qs.filter(q)
+
+    # 3. LOCALISATIONS (subjects)
+    localisations = params.get('localisations')
+    if localisations:
+        terms = [t.strip() for t in localisations.split(',') if t.strip()]
+        q = Q()
+        for t in terms:
+            q |= q_terme('subject_terms', t)
+        qs = qs.filter(q)
+
+    # 4. CATALOGUE et 5. THÉMATIQUE (tags attribués à l'import)
+    for kind in (Tag.CATALOGUE, Tag.THEMATIQUE):
+        valeur = params.get(kind)
+        if valeur:
+            qs = qs.filter(q_classification(kind, valeur, etat()))
+
+    # 6. PRODUCTEUR (authors - producteur de données)
+    producteur = params.get('producteur')
+    if producteur:
+        qs = qs.filter(q_terme('author_terms', producteur))
+
+    # 7. DATE DÉBUT (filtre sur date_info__published_at)
+    date_debut = params.get('date_debut')
+    if date_debut:
+        try:
+            # Convertir la date string en objet date
+            date_debut_obj = lire_date(date_debut)
+            # Filtrer les datasets dont la date de publication >= date_debut
+            qs = qs.filter(date_info__published_at__gte=date_debut_obj)
+        except (ValueError, TypeError):
+            pass  # Ignorer si le format de date est invalide
+
+    # 8. DATE FIN (filtre sur date_info__published_at)
+    date_fin = params.get('date_fin')
+    if date_fin:
+        try:
+            # Convertir la date string en objet date
+            date_fin_obj = lire_date(date_fin)
+            # Filtrer les datasets dont la date de publication <= date_fin
+            qs = qs.filter(date_info__published_at__lte=date_fin_obj)
+        except (ValueError, TypeError):
+            pass  # Ignorer si le format de date est invalide
+
+    # Pas de distinct() : les filtres sur les termes passent par des
+    # sous-requêtes (q_terme) et date_info est un OneToOne, aucune
+    # jointure ne peut dupliquer un dataset.
+    return qs
@@ -0,0 +1,255 @@
+# api_rest/instantanes.py
+"""
+Instantanés du catalogue complet, précalculés après chaque moisson.
+
+Chaque version du catalogue (recup_donnee.catalogue) donne un dossier
+v<version>/ contenant datasets.json.gz, datasets.ndjson.gz et
+datasets.csv.gz, et un manifest.json à la racine décrit la dernière
+version (empreintes sha256, tailles). Les fichiers sont servis tels quels
+par la vue InstantaneVue, sans ORM ni serializer.
+
+Les instantanés sont construits à la fin d'une moisson (harvest_termine)
+ou par la commande construire_instantanes, jamais pendant une requête : une
+modification dans l'admin (catalogue_edite) dépose seulement un marqueur et
+le planificateur (moissonner) reconstruit au tour suivant. La vue sert le
+dernier manifeste tel quel. INSTANTANES_DIR doit être un disque partagé
+entre le worker de moisson et le serveur web ; un fichier verrou y empêche
+deux constructions simultanées.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils import timezone
+
+from recup_donnee.catalogue import etat_catalogue
+from recup_donnee.models import Dataset
+from recup_donnee.serialisation import SerialisationRapide
+
+from .export import aplatir, colonnes_csv, lots_lignes
+from .serializers import DatasetSerializer
+
+FORMATS = {
+    'json': ('datasets.json.gz', 'application/json'),
+    'ndjson': ('datasets.ndjson.gz', 'application/x-ndjson'),
+    'csv': ('datasets.csv.gz', 'text/csv'),
+}
+MANIFESTE = 'manifest.json'
+VERROU = '.construction'
+# Présent quand une édition hors moisson attend une reconstruction
+PERIME = '.perime'
+# Verrou repris au-delà de cette durée (processus de construction tué)
+DUREE_VERROU = 3600
+# Constructions successives au plus quand le catalogue change pendant l'écriture
+PASSES_MAX = 3
+TAILLE_LOT = 1000
+
+
+def dossier_instantanes():
+    return settings.INSTANTANES_DIR
+
+
+def lire_manifeste():
+    try:
+        with open(os.path.join(dossier_instantanes(), MANIFESTE), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def chemin_fichier(manifeste, sortie):
+    return os.path.join(dossier_instantanes(), manifeste['dossier'], manifeste['fichiers'][sortie]['nom'])
+
+
+def ouvrir_gzip(chemin):
+    # mtime=0 : deux constructions du même contenu donnent le même fichier
+    return gzip.GzipFile(chemin, mode='wb', mtime=0)
+
+
+def ecrire_fichiers(dossier):
+    """Écrit les trois formats en un seul passage sur la base"""
+    serialisation = SerialisationRapide(DatasetSerializer())
+    colonnes = colonnes_csv(serialisation)
+    sorties = {sortie: ouvrir_gzip(os.path.join(dossier, nom)) for sortie, (nom, _) in FORMATS.items()}
+    tampon = io.StringIO()
+    ecrivain = csv.DictWriter(tampon, fieldnames=colonnes, extrasaction='ignore')
+    ecrivain.writeheader()
+    sorties['csv'].write(tampon.getvalue().encode())
+    nombre = 0
+    try:
+        sorties['json'].write(b'[')
+        for lignes in lots_lignes(Dataset.objects.actifs(), serialisation, TAILLE_LOT):
+            # Mêmes octets que la liste de l'API : '[' + éléments séparés par ',' + ']'
+            if nombre:
+                sorties['json'].write(b',')
+            sorties['json'].write(serialisation.rendre(lignes)[1:-1])
+            sorties['ndjson'].write(b''.join(serialisation.rendre(ligne) + b'\n' for ligne in lignes))
+            tampon.seek(0)
+            tampon.truncate()
+            ecrivain.writerows(aplatir(ligne) for ligne in lignes)
+            sorties['csv'].write(tampon.getvalue().encode())
+            nombre += len(lignes)
+        sorties['json'].write(b']')
+    finally:
+        for sortie in sorties.values():
+            sortie.close()
+    return nombre
+
+
+def empreinte(chemin):
+    sha = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for morceau in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(morceau)
+    return sha.hexdigest()
+
+
+def ecrire_manifeste(manifeste):
+    chemin = os.path.join(dossier_instantanes(), MANIFESTE)
+    temporaire = f"{chemin}.tmp"
+    with open(temporaire, 'w', encoding='utf-8') as f:
+        json.dump(manifeste, f, ensure_ascii=False, indent=2)
+    os.replace(temporaire, chemin)
+
+
+@contextmanager
+def verrou_construction():
+    """True si ce processus obtient le verrou de construction, False sinon
+
+    Fichier créé en exclusivité dans INSTANTANES_DIR : valable entre les
+    processus et les machines qui partagent le dossier.
+    """
+    racine = dossier_instantanes()
+    os.makedirs(racine, exist_ok=True)
+    chemin = os.path.join(racine, VERROU)
+    for _ in range(2):
+        try:
+            descripteur = os.open(chemin, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                perime = time.time() - os.path.getmtime(chemin) > DUREE_VERROU
+            except FileNotFoundError:
+                perime = True
+            if not perime:
+                yield False
+                return
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
+    else:
+        yield False
+        return
+    os.close(descripteur)
+    try:
+        yield True
+    finally:
+        os.remove(chemin)
+
+
+def marquer_perime():
+    racine = dossier_instantanes()
+    os.makedirs(racine, exist_ok=True)
+    open(os.path.join(racine, PERIME), 'w').close()
+
+
+def construire_si_perime():
+    """Reconstruction hors requête, seulement si une édition l'a demandée
+
+    Le marqueur est retiré avant la construction : une édition validée
+    pendant celle-ci le redépose et sera prise au tour suivant.
+    """
+    try:
+        os.remove(os.path.join(dossier_instantanes(), PERIME))
+    except FileNotFoundError:
+        return None
+    return construire_instantane()
+
+
+def construire_instantane(forcer=False):
+    """Construit l'instantané de la version courante s'il n'existe pas encore
+
+    Retourne le manifeste de l'instantané courant. Si une construction est
+    déjà en cours ailleurs, retourne le dernier manifeste sans attendre : la
+    construction en cours reprend tant que la version change sous elle.
+    """
+    with verrou_construction() as obtenu:
+        if not obtenu:
+            print("Instantané déjà en construction : dernier manifeste conservé")
+            return lire_manifeste()
+        for _ in range(PASSES_MAX):
+            manifeste = construire_version(forcer)
+            forcer = False
+            if manifeste['version'] == etat_catalogue().version:
+                break
+        return manifeste
+
+
+def construire_version(forcer=False):
+    """Instantané de la version courante du catalogue (appelé sous le verrou)"""
+    version = etat_catalogue().version
+    manifeste = lire_manifeste()
+    if manifeste and manifeste['version'] == version and not forcer:
+        return manifeste
+
+    racine = dossier_instantanes()
+    os.makedirs(racine, exist_ok=True)
+    nom_dossier = f"v{version}"
+    # Écrit dans un dossier temporaire puis le renomme : un instantané
+    # visible est toujours complet, même si deux constructions se croisent.
+    temporaire = tempfile.mkdtemp(prefix=f".{nom_dossier}-", dir=racine)
+    try:
+        nombre = ecrire_fichiers(temporaire)
+        fichiers = {}
+        for sortie, (nom, type_contenu) in FORMATS.items():
+            chemin = os.path.join(temporaire, nom)
+            fichiers[sortie] = {
+                'nom': nom,
+                'type': type_contenu,
+                'sha256': empreinte(chemin),
+                'taille': os.path.getsize(chemin),
+            }
+        destination = os.path.join(racine, nom_dossier)
+        if forcer and os.path.isdir(destination):
+            shutil.rmtree(destination)
+        try:
+            os.replace(temporaire, destination)
+        except OSError:
+            # Même version construite en parallèle : contenu identique (mtime=0)
+            shutil.rmtree(temporaire, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(temporaire, ignore_errors=True)
+        raise
+
+    manifeste = {
+        'version': version,
+        'dossier': nom_dossier,
+        'cree_le': timezone.now().isoformat(),
+        'datasets': nombre,
+        'fichiers': fichiers,
+    }
+    ecrire_manifeste(manifeste)
+    supprimer_anciens(nom_dossier)
+    print(f"Instantané v{version} : {nombre} datasets ({', '.join(FORMATS)})")
+    return manifeste
+
+
+def supprimer_anciens(courant):
+    """Garde les INSTANTANES_CONSERVES dernières versions (téléchargements en cours)"""
+    racine = dossier_instantanes()
+    versions = sorted(
+        (nom for nom in os.listdir(racine) if nom.startswith('v') and nom[1:].isdigit()),
+        key=lambda nom: int(nom[1:]),
+    )
+    for nom in versions[:-settings.INSTANTANES_CONSERVES]:
+        if nom != courant:
+            shutil.rmtree(os.path.join(racine, nom), ignore_errors=True)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api_rest.instantanes import construire_instantane
+
+
+class Command(BaseCommand):
+    help = "Construit les instantanés du catalogue (JSON, NDJSON, CSV compressés) pour la version courante"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forcer', action='store_true', help="Reconstruit même si la version existe déjà")
+
+    def handle(self, *args, **options):
+        manifeste = construire_instantane(forcer=options['forcer'])
+        if manifeste is None:
+            raise CommandError("Construction déjà en cours dans un autre processus")
+        for sortie, fichier in manifeste['fichiers'].items():
+            self.stdout.write(f"{sortie:>6} : {fichier['nom']} {fichier['taille']} octets sha256={fichier['sha256']}")
@@ -0,0 +1,172 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from recup_donnee.models import Dataset
+
+UTILISATEUR = 'mesure-concurrence'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare sous charge concurrente la lecture synchrone (/api/donnees/, N workers WSGI) "
+        "et la lecture async (/api/async/, un processus ASGI). --delai ajoute une attente à "
+        "chaque requête SQL pour simuler des recherches lentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chemin', default='datasets/?page_size=20',
+                            help="Chemin relatif commun aux deux API (défaut : datasets/?page_size=20)")
+        parser.add_argument('--requetes', type=int, default=200, help="Requêtes envoyées par mode")
+        parser.add_argument('--concurrence', type=int, default=100, help="Requêtes async en vol au plus")
+        parser.add_argument('--workers', type=int, default=4, help="Workers synchrones simulés")
+        parser.add_argument('--delai', type=float, default=0.05, help="Secondes ajoutées à chaque requête SQL")
+        parser.add_argument('--avec-cache', action='store_true',
+                            help="Garde le cache des réponses (par défaut chaque requête lit la base)")
+
+    def handle(self, *args, **options):
+        if not Dataset.objects.actifs().exists():
+            raise CommandError("Aucun dataset : lancer une moisson ou fixtures_moissonnage au préalable")
+        hote = next((h for h in settings.ALLOWED_HOSTS if h not in ('*',) and not h.startswith('.')), 'localhost')
+        chemin, _, requete = options['chemin'].partition('?')
+
+        utilisateur, _ = User.objects.get_or_create(username=UTILISATEUR)
+        jeton, _ = Token.objects.get_or_create(user=utilisateur)
+        caches = dict(settings.CACHES)
+        if not options['avec_cache']:
+            caches['datasets'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+        delai = options['delai']
+
+        def lenteur(execute, sql, params, many, context):
+            time.sleep(delai)
+            return execute(sql, params, many, context)
+
+        def ralentir(sender, connection, **kwargs):
+            connection.execute_wrappers.append(lenteur)
+
+        # Une requête hors mesure : agrégats et version du catalogue créés d'avance
+        url = f"/api/donnees/{chemin}?{requete}" if requete else f"/api/donnees/{chemin}"
+        Client(HTTP_HOST=hote, HTTP_AUTHORIZATION=f"Token {jeton.key}").get(url)
+
+        # Chaque thread ouvre sa propre connexion : l'attente est ajoutée à toutes
+        connection.close()
+        if delai:
+            connection_created.connect(ralentir)
+        try:
+            with override_settings(CACHES=caches):
+                resultats = {
+                    'sync': self.mesurer_sync(hote, f"/api/donnees/{chemin}", requete, jeton.key, options),
+                    'async': asyncio.run(self.mesurer_async(hote, f"/api/async/{chemin}", requete, jeton.key, options)),
+                }
+        finally:
+            connection_created.disconnect(ralentir)
+            jeton.delete()
+            utilisateur.delete()
+
+        for mode, (duree, latences, statuts, threads) in resultats.items():
+            latences.sort()
+            self.stdout.write(
+                f"{mode:>5} : {duree:.2f}s, {len(latences) / duree:.0f} req/s, "
+                f"latence médiane {statistics.median(latences) * 1000:.0f} ms, "
+                f"p95 {latences[int(len(latences) * 0.95) - 1] * 1000:.0f} ms, "
+                f"statuts {dict(statuts)}, threads au plus {threads}"
+            )
+        if any(set(statuts) != {200} for _, _, statuts, _ in resultats.values()):
+            raise CommandError("Des requêtes n'ont pas répondu 200")
+        self.stdout.write(self.style.SUCCESS(
+            f"Async x{resultats['sync'][0] / resultats['async'][0]:.1f} sur {options['requetes']} requêtes "
+            f"({options['workers']} workers sync, {options['concurrence']} requêtes async en vol)"
+        ))
+
+    def mesurer_sync(self, hote, chemin, requete, cle, options):
+        """Requêtes servies par `workers` threads WSGI, comme autant de workers gunicorn sync"""
+        locaux = threading.local()
+        url = f"{chemin}?{requete}" if requete else chemin
+
+        def appeler(_):
+            if not hasattr(locaux, 'client'):
+                locaux.client = Client(HTTP_HOST=hote, HTTP_AUTHORIZATION=f"Token {cle}")
+            debut = time.perf_counter()
+            response = locaux.client.get(url)
+            return time.perf_counter() - debut, response.status_code, threading.active_count()
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executeur:
+            mesures = list(executeur.map(appeler, range(options['requetes'])))
+        duree = time.perf_counter() - debut
+        statuts = {}
+        for _, statut, _ in mesures:
+            statuts[statut] = statuts.get(statut, 0) + 1
+        return duree, [latence for latence, _, _ in mesures], statuts, max(threads for _, _, threads in mesures)
+
+    async def mesurer_async(self, hote, chemin, requete, cle, options):
+        """Requêtes envoyées directement à l'application ASGI, comme le ferait uvicorn"""
+        application = get_asgi_application()
+        limite = asyncio.Semaphore(options['concurrence'])
+        statuts, latences = {}, []
+        threads = [threading.active_count()]
+
+        async def appeler():
+            async with limite:
+                debut = time.perf_counter()
+                statut = await requete_asgi(application, hote, chemin, requete, cle)
+                latences.append(time.perf_counter() - debut)
+                statuts[statut] = statuts.get(statut, 0) + 1
+                threads.append(threading.active_count())
+
+        debut = time.perf_counter()
+        await asyncio.gather(*(appeler() for _ in range(options['requetes'])))
+        return time.perf_counter() - debut, latences, statuts, max(threads)
+
+
+async def requete_asgi(application, hote, chemin, requete, cle):
+    """GET sur l'application ASGI en mémoire, retourne le statut"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': chemin,
+        'raw_path': urlsplit(chemin).path.encode(),
+        'query_string': requete.encode(),
+        'root_path': '',
+        'headers': [(b'host', hote.encode()), (b'authorization', f"Token {cle}".encode())],
+        'client': ('127.0.0.1', 0),
+        'server': (hote, 80),
+    }
+    corps = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    termine = asyncio.Event()
+    statut = None
+
+    async def recevoir():
+        if corps:
+            return corps.pop()
+        # Le client ne se déconnecte qu'une fois la réponse envoyée
+        await termine.wait()
+        return {'type': 'http.disconnect'}
+
+    async def envoyer(message):
+        nonlocal statut
+        if message['type'] == 'http.response.start':
+            statut = message['status']
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            termine.set()
+
+    await application(scope, recevoir, envoyer)
+    termine.set()
+    return statut
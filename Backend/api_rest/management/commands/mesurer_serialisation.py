@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api_rest.serializers import DatasetSerializer
+from recup_donnee.models import Dataset
+from recup_donnee.serialisation import SerialisationRapide
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la sérialisation DRF et la sérialisation rapide de la liste des datasets "
+        "(durée, débit, réponses identiques). Charger 10k+ datasets au préalable, par "
+        "exemple avec fixtures_moissonnage gonfler puis rejouer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repetitions', type=int, default=3)
+        parser.add_argument('--limite', type=int, help="Nombre de datasets sérialisés (défaut : tous)")
+
+    def handle(self, *args, **options):
+        queryset = Dataset.objects.actifs().order_by('id')
+        if options['limite']:
+            queryset = queryset[:options['limite']]
+        nombre = queryset.count()
+        if not nombre:
+            raise CommandError("Aucun dataset à sérialiser")
+
+        def drf():
+            donnees = DatasetSerializer(queryset.avec_relations(), many=True).data
+            return JSONRenderer().render(donnees)
+
+        def rapide():
+            serialisation = SerialisationRapide(DatasetSerializer())
+            lignes, _ = serialisation.construire(queryset)
+            return serialisation.rendre(lignes)
+
+        resultats = {}
+        for nom, fonction in (('drf', drf), ('rapide', rapide)):
+            durees = []
+            for _ in range(options['repetitions']):
+                debut = time.perf_counter()
+                contenu = fonction()
+                durees.append(time.perf_counter() - debut)
+            resultats[nom] = (min(durees), contenu)
+            self.stdout.write(
+                f"{nom:>7} : {min(durees):.3f}s ({nombre / min(durees):.0f} datasets/s, {len(contenu)} octets)"
+            )
+
+        if resultats['drf'][1] != resultats['rapide'][1]:
+            raise CommandError("Les réponses diffèrent entre DRF et la sérialisation rapide")
+        self.stdout.write(self.style.SUCCESS(
+            f"Réponses identiques, accélération x{resultats['drf'][0] / resultats['rapide'][0]:.1f} "
+            f"sur {nombre} datasets"
+        ))
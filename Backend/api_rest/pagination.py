@@ -0,0 +1,170 @@
+# api_rest/pagination.py
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CHAMP_DATE = 'date_info__published_at'
+# dataset_id de DateInfo (et non dataset.id) : tri et bornes sur la seule table jointe
+CHAMP_ID = 'date_info__dataset'
+ORDRE_DECROISSANT = (f"-{CHAMP_DATE}", f"-{CHAMP_ID}")
+ORDRE_CROISSANT = (CHAMP_DATE, CHAMP_ID)
+# Paramètres qui imposent leur propre ordre (pertinence, OrderingFilter)
+PARAMETRES_ORDRE = ('recherche', 'ordering')
+
+
+def avec_date(queryset):
+    """Datasets paginables : jointure interne sur DateInfo, clé (published_at, dataset_id) non nulle"""
+    return queryset.filter(date_info__isnull=False)
+
+
+class CurseurDatasetsPagination(BasePagination):
+    """
+    Pagination par curseur (keyset) sur (date de publication, id), du plus récent au plus ancien.
+
+    Optionnelle : elle ne s'active que si la requête contient `cursor` ou
+    `page_size`, sinon la liste complète est renvoyée comme avant.
+    Chaque page coûte une requête bornée par l'index (published_at, dataset)
+    de DateInfo, quelle que soit sa position dans le catalogue : tri et
+    bornes portent sur les deux colonnes de cet index. Les datasets sans
+    DateInfo (l'importateur en crée toujours une) ne sont pas paginés.
+
+    L'ordre de la page est imposé : recherche (tri par pertinence) et
+    ordering sont refusés avec cursor/page_size plutôt qu'ignorés.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Curseur invalide'
+
+    def __init__(self):
+        options = getattr(settings, 'DATASETS_PAGINATION', {})
+        self.page_size = options.get('PAGE_SIZE', 50)
+        self.max_page_size = options.get('MAX_PAGE_SIZE', 500)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.paginer(queryset, request)
+        if page is None:
+            return None
+        lignes = list(page)
+        return self.terminer(lignes, [(ligne.cle_publication, ligne.pk) for ligne in lignes])
+
+    def paginer(self, queryset, request):
+        """Queryset de la page demandée (un élément de plus pour savoir s'il y a une suite)
+
+        Retourne None si la pagination n'est pas demandée. Les lignes lues
+        sont ensuite passées à terminer() avec leurs clés (date, id).
+        """
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        incompatibles = [p for p in PARAMETRES_ORDRE if params.get(p)]
+        if incompatibles:
+            raise ValidationError({
+                p: ["Incompatible avec la pagination (cursor, page_size) : résultats triés par date"]
+                for p in incompatibles
+            })
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.taille = self.get_page_size(request)
+        self.curseur = self.decoder_curseur(params.get(self.cursor_query_param))
+
+        qs = avec_date(queryset)
+        if self.curseur is None:
+            qs = qs.order_by(*ORDRE_DECROISSANT)
+        else:
+            date, pk, vers_avant = self.curseur
+            if vers_avant:
+                qs = qs.filter(self.q_apres(date, pk)).order_by(*ORDRE_DECROISSANT)
+            else:
+                qs = qs.filter(self.q_avant(date, pk)).order_by(*ORDRE_CROISSANT)
+        return qs.annotate(cle_publication=F(CHAMP_DATE))[:self.taille + 1]
+
+    def terminer(self, lignes, cles):
+        """Retire la ligne en trop, remet la page dans l'ordre et calcule les liens"""
+        encore = len(lignes) > self.taille
+        lignes, cles = lignes[:self.taille], cles[:self.taille]
+        vers_avant = self.curseur is None or self.curseur[2]
+        if not vers_avant:
+            lignes.reverse()
+            cles.reverse()
+
+        self.cles = cles
+        if self.curseur is None:
+            self.a_suivant, self.a_precedent = encore, False
+        elif vers_avant:
+            self.a_suivant, self.a_precedent = encore, True
+        else:
+            self.a_suivant, self.a_precedent = True, encore
+        return lignes
+
+    def get_page_size(self, request):
+        try:
+            taille = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(taille, self.max_page_size))
+
+    def q_apres(self, date, pk):
+        """Lignes situées après (date, pk) dans l'ordre décroissant"""
+        return Q(**{f"{CHAMP_DATE}__lt": date}) | Q(**{CHAMP_DATE: date, f"{CHAMP_ID}__lt": pk})
+
+    def q_avant(self, date, pk):
+        """Lignes situées avant (date, pk) dans l'ordre décroissant"""
+        return Q(**{f"{CHAMP_DATE}__gt": date}) | Q(**{CHAMP_DATE: date, f"{CHAMP_ID}__gt": pk})
+
+    def encoder_curseur(self, cle, vers_avant):
+        date, pk = cle
+        contenu = json.dumps({'p': date.isoformat(), 'i': pk, 'a': vers_avant})
+        curseur = base64.urlsafe_b64encode(contenu.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, curseur)
+
+    def decoder_curseur(self, curseur):
+        if not curseur:
+            return None
+        try:
+            contenu = json.loads(base64.urlsafe_b64decode(curseur.encode('ascii')))
+            date = parse_datetime(contenu['p'])
+            if date is None:
+                raise ValueError(contenu['p'])
+            return date, int(contenu['i']), bool(contenu['a'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.a_suivant or not self.cles:
+            return None
+        return self.encoder_curseur(self.cles[-1], vers_avant=True)
+
+    def get_previous_link(self):
+        if not self.a_precedent:
+            return None
+        if not self.cles:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encoder_curseur(self.cles[0], vers_avant=False)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,135 @@
+# api_rest/recherche.py
+"""
+Recherche plein texte sur les datasets, selon la base utilisée :
+  - PostgreSQL : colonne tsvector pondérée (search_vector) + index GIN
+  - MySQL      : index FULLTEXT (le nom compte triple dans le rang)
+  - SQLite     : table virtuelle FTS5 (tests et développement)
+Les index sont créés par la migration recup_donnee 0005.
+"""
+import html
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, CharField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from recup_donnee.models import Dataset
+
+TABLE = Dataset._meta.db_table
+TABLE_FTS = f"{TABLE}_fts"
+CHAMPS = ['name_of_dataverse', 'keywords', 'subjects', 'authors', 'description']
+COLONNES = ', '.join(CHAMPS)
+
+DEBUT_SURLIGNAGE = '<mark>'
+FIN_SURLIGNAGE = '</mark>'
+# Bornes des termes trouvés posées par la base (ts_headline, snippet) sur le
+# texte brut : l'extrait est échappé puis elles deviennent <mark> (surligner)
+DEBUT_SENTINELLE = '\x02'
+FIN_SENTINELLE = '\x03'
+MOTS_EXTRAIT = 24
+
+
+def termes_recherche(texte):
+    return re.findall(r'\w+', texte or '')
+
+
+def rechercher(qs, texte, extrait=False):
+    """Filtre qs sur `texte`, annote `rang` (et `extrait`) et trie par pertinence"""
+    termes = termes_recherche(texte)
+    if not termes:
+        return qs.none()
+
+    fonction = {
+        'postgresql': rechercher_postgresql,
+        'mysql': rechercher_mysql,
+        'sqlite': rechercher_sqlite,
+    }.get(connection.vendor, rechercher_generique)
+    return fonction(qs, texte, termes, extrait).order_by('-rang', 'id')
+
+
+def rechercher_postgresql(qs, texte, termes, extrait):
+    requete = "websearch_to_tsquery('simple', %s)"
+    qs = qs.filter(RawSQL(f"{TABLE}.search_vector @@ {requete}", (texte,), output_field=BooleanField()))
+    qs = qs.annotate(rang=RawSQL(f"ts_rank_cd({TABLE}.search_vector, {requete})", (texte,), output_field=FloatField()))
+    if extrait:
+        options = f"StartSel={DEBUT_SENTINELLE}, StopSel={FIN_SENTINELLE}, MaxWords={MOTS_EXTRAIT}, MinWords=8"
+        qs = qs.annotate(extrait=RawSQL(
+            f"ts_headline('simple', coalesce({TABLE}.description, ''), {requete}, %s)",
+            (texte, options), output_field=CharField(),
+        ))
+    return qs
+
+
+def rechercher_mysql(qs, texte, termes, extrait):
+    correspondance = f"MATCH ({COLONNES}) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+    qs = qs.filter(RawSQL(correspondance, (texte,), output_field=BooleanField()))
+    qs = qs.annotate(rang=RawSQL(
+        f"MATCH (name_of_dataverse) AGAINST (%s IN NATURAL LANGUAGE MODE) * 3 + {correspondance}",
+        (texte, texte), output_field=FloatField(),
+    ))
+    # L'extrait est calculé par le serializer (construire_extrait)
+    return qs
+
+
+def rechercher_sqlite(qs, texte, termes, extrait):
+    # Chaque terme est cité pour neutraliser la syntaxe FTS5 ; préfixe accepté
+    requete = ' '.join(f'"{terme}"*' for terme in termes)
+    qs = qs.filter(pk__in=RawSQL(f"SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s", (requete,)))
+    # bm25 est négatif (plus petit = plus pertinent) ; poids par colonne
+    qs = qs.annotate(rang=RawSQL(
+        f"SELECT -bm25({TABLE_FTS}, 10.0, 4.0, 4.0, 2.0, 1.0) FROM {TABLE_FTS} "
+        f"WHERE {TABLE_FTS} MATCH %s AND rowid = {TABLE}.id",
+        (requete,), output_field=FloatField(),
+    ))
+    if extrait:
+        qs = qs.annotate(extrait=RawSQL(
+            f"SELECT snippet({TABLE_FTS}, 4, %s, %s, '…', {MOTS_EXTRAIT}) FROM {TABLE_FTS} "
+            f"WHERE {TABLE_FTS} MATCH %s AND rowid = {TABLE}.id",
+            (DEBUT_SENTINELLE, FIN_SENTINELLE, requete), output_field=CharField(),
+        ))
+    return qs
+
+
+def rechercher_generique(qs, texte, termes, extrait):
+    """Repli sans index plein texte : tous les termes doivent apparaître"""
+    for terme in termes:
+        q = Q()
+        for champ in CHAMPS:
+            q |= Q(**{f"{champ}__icontains": terme})
+        qs = qs.filter(q)
+    return qs.annotate(rang=Value(0.0, output_field=FloatField()))
+
+
+def surligner(extrait):
+    """Extrait HTML : texte échappé, termes trouvés (entre sentinelles) dans <mark>
+
+    Même sortie quelle que soit la base : la description n'est jamais
+    renvoyée telle quelle dans du HTML.
+    """
+    if extrait is None:
+        return None
+    return (
+        html.escape(extrait)
+        .replace(DEBUT_SENTINELLE, DEBUT_SURLIGNAGE)
+        .replace(FIN_SENTINELLE, FIN_SURLIGNAGE)
+    )
+
+
+def construire_extrait(texte, termes, mots=MOTS_EXTRAIT):
+    """Extrait de la description pour les bases sans fonction de surlignage
+
+    Fenêtre de `mots` mots autour de la première occurrence, termes entre
+    sentinelles comme avec ts_headline et snippet (à passer à surligner).
+    """
+    if not texte:
+        return ''
+    texte = texte.replace(DEBUT_SENTINELLE, '').replace(FIN_SENTINELLE, '')
+    mots_texte = texte.split()
+    motif = re.compile('|'.join(re.escape(terme) for terme in termes), re.IGNORECASE)
+    position = next((i for i, mot in enumerate(mots_texte) if motif.search(mot)), 0)
+    debut = max(0, position - mots // 3)
+    fenetre = ' '.join(mots_texte[debut:debut + mots])
+    fenetre = motif.sub(lambda m: f"{DEBUT_SENTINELLE}{m.group(0)}{FIN_SENTINELLE}", fenetre)
+    prefixe = '… ' if debut > 0 else ''
+    suffixe = ' …' if debut + mots < len(mots_texte) else ''
+    return f"{prefixe}{fenetre}{suffixe}"
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from recup_donnee.models import Dataset, Contact, Publication, DateInfo
+from .recherche import construire_extrait, surligner
 
 class ContactSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,11 +17,44 @@ class DateInfoSerializer(serializers.ModelSerializer):
         model = DateInfo
         fields = '__all__'
 
-class DatasetSerializer(serializers.ModelSerializer):
+class ChampsDynamiquesMixin:
+    """Ne garde que les champs listés dans context['champs'] (paramètres fields/expand)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        champs = self.context.get('champs')
+        if champs is not None:
+            for nom in set(self.fields) - set(champs):
+                self.fields.pop(nom)
+
+
+class DatasetSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     contacts = ContactSerializer(many=True, read_only=True)
     publications = PublicationSerializer(many=True, read_only=True)
     date_info = DateInfoSerializer(read_only=True)
 
     class Meta:
         model = Dataset
-        fields = '__all__'
+        # Liste explicite : les champs de suivi de moisson restent internes
+        fields = [
+            'id', 'contacts', 'publications', 'date_info',
+            'name_of_dataverse', 'identifier_of_dataverse', 'url',
+            'description', 'keywords', 'subjects', 'authors',
+        ]
+
+
+class DatasetRechercheSerializer(DatasetSerializer):
+    """Dataset renvoyé par la recherche plein texte : ajoute le rang et l'extrait surligné"""
+    rang = serializers.FloatField(read_only=True)
+    extrait = serializers.SerializerMethodField()
+
+    class Meta(DatasetSerializer.Meta):
+        fields = DatasetSerializer.Meta.fields + ['rang', 'extrait']
+
+    def get_extrait(self, obj):
+        if hasattr(obj, 'extrait'):
+            return surligner(obj.extrait)
+        termes = self.context.get('termes_extrait')
+        if termes:
+            return surligner(construire_extrait(obj.description, termes))
+        return None
@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.dispatch import receiver
+
+from recup_donnee.signals import catalogue_edite, harvest_termine, tour_planificateur
+
+from .instantanes import construire_instantane, construire_si_perime, marquer_perime
+
+
+@receiver(harvest_termine, dispatch_uid='instantane_apres_moisson')
+def instantane_apres_moisson(sender, source, **kwargs):
+    """Reconstruit les instantanés une fois les écritures de la moisson validées"""
+    def construire():
+        try:
+            construire_instantane()
+        except Exception as e:
+            # Un instantané raté ne doit pas faire échouer la moisson
+            print(f"Instantané non construit après la moisson {source} : {e}")
+    transaction.on_commit(construire)
+
+
+@receiver(catalogue_edite, dispatch_uid='instantane_apres_edition')
+def instantane_apres_edition(sender, **kwargs):
+    """Édition dans l'admin : reconstruction laissée au planificateur, pas à la requête"""
+    transaction.on_commit(marquer_perime)
+
+
+@receiver(tour_planificateur, dispatch_uid='instantane_si_perime')
+def instantane_si_perime(sender, **kwargs):
+    try:
+        if construire_si_perime() is not None:
+            print("Instantané reconstruit après une édition")
+    except Exception as e:
+        print(f"Instantané non construit : {e}")
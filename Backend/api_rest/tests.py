@@ -1,3 +1,893 @@
-from django.test import TestCase
+import csv
+from collections import Counter
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from gestion_donnee.budget_requetes import budget_requetes
+from recup_donnee.cache_reponses import cache_datasets, normaliser_parametres, statistiques_cache
+from recup_donnee.classification import THEMATIQUES, reclasser_catalogue
+from recup_donnee.models import Contact, Dataset, DateInfo, HarvestConfig, Publication, Tag
+
+
+def creer_datasets(nombre, debut=0):
+    for i in range(debut, debut + nombre):
+        dataset = Dataset.objects.create(
+            name_of_dataverse=f"Jeu {i} fleuve Saint-Laurent",
+            identifier_of_dataverse='ogsl',
+            global_id=f"doi:10.5683/SP3/T{i:05d}",
+            url=f"https://doi.org/10.5683/SP3/T{i:05d}",
+            description="Données océanographiques",
+            keywords="Océan, Écologie",
+            subjects="Earth and Environmental Sciences",
+            authors=f"Auteur {i % 3}",
+        )
+        date = datetime(2010 + i % 10, 1 + i % 12, 1, tzinfo=timezone.utc)
+        DateInfo.objects.create(dataset=dataset, created_at=date, updated_at=date, published_at=date)
+        for j in range(i % 3):
+            Contact.objects.create(dataset=dataset, name=f"C{j}", affiliation=f"Univ {j}")
+        for j in range(i % 2):
+            Publication.objects.create(dataset=dataset, citation=f"Cit {j}", url="https://doi.org/x")
+
+
+# Dans un TestCase, la version du catalogue n'est jamais incrémentée (pas de
+# commit) : le cache des réponses est désactivé pour ne pas resservir une liste
+SANS_CACHE = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'datasets': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+})
+
+
+@SANS_CACHE
+class BudgetRequetesTests(TestCase):
+    """Le nombre de requêtes des listes de datasets ne dépend pas du nombre de datasets"""
+
+    # version du catalogue + requête principale (jointure date_info) + contacts + publications
+    BUDGET_LISTE = 4
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+
+    def verifier_budget(self, url, budget):
+        creer_datasets(5)
+        with budget_requetes(budget) as petit:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        creer_datasets(40, debut=5)
+        with budget_requetes(budget) as grand:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(petit.captured_queries), len(grand.captured_queries))
+
+    def test_liste_api_rest(self):
+        self.verifier_budget('/api/donnees/datasets/', self.BUDGET_LISTE)
+
+    def test_liste_api_rest_filtree(self):
+        self.verifier_budget(
+            '/api/donnees/datasets/?organisations=auteur&date_debut=2011-01-01&search=fleuve',
+            self.BUDGET_LISTE,
+        )
+
+    def test_liste_api_rest_paginee(self):
+        self.verifier_budget('/api/donnees/datasets/?page_size=20', self.BUDGET_LISTE)
+
+    def test_liste_recup_donnee(self):
+        self.verifier_budget('/api/datasets/', self.BUDGET_LISTE)
+
+    def test_detail(self):
+        creer_datasets(1)
+        url = f"/api/donnees/datasets/{Dataset.objects.get().pk}/"
+        with budget_requetes(self.BUDGET_LISTE):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@SANS_CACHE
+class SerialisationRapideTests(TestCase):
+    """La sérialisation rapide rend exactement les mêmes octets que DRF"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        creer_datasets(30)
+        special = Dataset.objects.create(
+            name_of_dataverse='Fleuve "Saint-Laurent" \u2028 séparateur \u2029 \x01 contrôle 🌊',
+            url='https://doi.org/special', description=None, keywords=None,
+        )
+        Contact.objects.create(dataset=special, name='Ève', affiliation=None)
+        date = datetime(2020, 5, 6, 1, 2, 3, 123456, tzinfo=timezone.utc)
+        DateInfo.objects.create(dataset=special, created_at=date, updated_at=date, published_at=date)
+        Dataset.objects.create(name_of_dataverse='Sans date', url='https://doi.org/sans-date')
+
+    def comparer(self, url):
+        with override_settings(DATASETS_SERIALISATION_RAPIDE=False):
+            attendu = self.client.get(url)
+        obtenu = self.client.get(url)
+        self.assertFalse(hasattr(obtenu, 'data'), "la réponse rapide ne passe pas par le serializer")
+        self.assertEqual(attendu.status_code, 200)
+        self.assertEqual(obtenu.status_code, 200)
+        self.assertEqual(obtenu['Content-Type'], attendu['Content-Type'])
+        self.assertEqual(obtenu.content, attendu.content)
+        return obtenu
+
+    def test_liste_api_rest(self):
+        self.comparer('/api/donnees/datasets/')
+
+    def test_liste_api_rest_filtree(self):
+        self.comparer('/api/donnees/datasets/?search=fleuve&ordering=-name_of_dataverse')
+
+    def test_liste_api_rest_paginee(self):
+        reponse = self.comparer('/api/donnees/datasets/?page_size=7')
+        while reponse.json()['next']:
+            reponse = self.comparer(reponse.json()['next'])
+
+    def test_recherche(self):
+        self.comparer('/api/donnees/datasets/?recherche=fleuve&extrait=1')
+
+    def test_liste_recup_donnee(self):
+        self.comparer('/api/datasets/')
+
+    def test_champs_et_relations(self):
+        reponse = self.comparer('/api/donnees/datasets/?fields=name_of_dataverse,authors&expand=date_info')
+        self.assertEqual(list(reponse.json()[0]), ['id', 'date_info', 'name_of_dataverse', 'authors'])
+        self.comparer('/api/donnees/datasets/?expand=contacts&page_size=5')
+
+    def test_champs_limitent_les_requetes(self):
+        with budget_requetes(2):
+            self.client.get('/api/donnees/datasets/?fields=name_of_dataverse')
+        with override_settings(DATASETS_SERIALISATION_RAPIDE=False), budget_requetes(2):
+            self.client.get('/api/donnees/datasets/?fields=name_of_dataverse')
+
+    def test_champ_inconnu(self):
+        reponse = self.client.get('/api/donnees/datasets/?fields=inconnu&expand=authors')
+        self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(set(reponse.json()), {'fields', 'expand'})
+
+    def test_export_ndjson_par_lots(self):
+        with mock.patch('api_rest.views.DatasetViewSet.taille_lot_export', 7):
+            reponse = self.client.get('/api/donnees/datasets/export/')
+            lignes = [json.loads(ligne) for ligne in b''.join(reponse.streaming_content).splitlines()]
+        self.assertEqual(lignes, sorted(self.client.get('/api/donnees/datasets/').json(), key=lambda d: d['id']))
+
+    def test_export_csv_gzip(self):
+        reponse = self.client.get('/api/donnees/datasets/export/?sortie=csv&gzip=1&fields=name_of_dataverse')
+        self.assertEqual(reponse['Content-Type'], 'application/gzip')
+        lignes = list(csv.reader(io.StringIO(gzip.decompress(b''.join(reponse.streaming_content)).decode())))
+        self.assertEqual(lignes[0], ['id', 'name_of_dataverse'])
+        self.assertEqual(len(lignes), Dataset.objects.count() + 1)
+
+    def test_export_refuse_un_ordre(self):
+        for parametres in ('recherche=fleuve', 'ordering=-name_of_dataverse', 'sortie=csv&ordering=id'):
+            with self.subTest(parametres=parametres):
+                reponse = self.client.get(f"/api/donnees/datasets/export/?{parametres}")
+                self.assertEqual(reponse.status_code, 400)
+                self.assertIn('ordering' if 'ordering' in parametres else 'recherche', reponse.json())
+
+    def test_sans_orjson(self):
+        with mock.patch('recup_donnee.serialisation.orjson', None):
+            self.comparer('/api/donnees/datasets/')
+
+    def test_requetes(self):
+        creer_datasets(20, debut=30)
+        with budget_requetes(BudgetRequetesTests.BUDGET_LISTE):
+            self.client.get('/api/donnees/datasets/')
+
+
+@SANS_CACHE
+class PaginationTests(TestCase):
+    """Pagination par curseur sur (published_at, dataset_id) de DateInfo"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        creer_datasets(12)
+        # Dates égales : l'ordre est départagé par dataset_id
+        DateInfo.objects.filter(dataset__in=Dataset.objects.order_by('id')[:8]).update(
+            published_at=datetime(2015, 3, 1, tzinfo=timezone.utc))
+        Dataset.objects.create(name_of_dataverse='Sans date', url='https://doi.org/sans-date')
+
+    def ids(self, url):
+        reponse = self.client.get(url)
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()
+
+    def test_parcours_complet_dans_les_deux_sens(self):
+        attendu = list(DateInfo.objects.order_by('-published_at', '-dataset').values_list('dataset', flat=True))
+        pages = [self.ids('/api/donnees/datasets/?page_size=3&fields=id')]
+        while pages[-1]['next']:
+            pages.append(self.ids(pages[-1]['next']))
+        self.assertEqual([d['id'] for page in pages for d in page['results']], attendu)
+
+        for page, precedente in zip(pages[1:], pages):
+            self.assertEqual(self.ids(page['previous'])['results'], precedente['results'])
+
+    def test_tri_sur_les_colonnes_de_date_info(self):
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get('/api/donnees/datasets/?page_size=3&fields=id')
+        sql = next(q['sql'] for q in requetes.captured_queries if 'ORDER BY' in q['sql'])
+        self.assertIn('INNER JOIN "recup_donnee_dateinfo"', sql)
+        self.assertIn('ORDER BY "recup_donnee_dateinfo"."published_at" DESC, "recup_donnee_dateinfo"."dataset_id" DESC', sql)
+
+    def test_ordre_impose_refuse(self):
+        for parametres in ('recherche=fleuve&page_size=5', 'ordering=name_of_dataverse&page_size=5',
+                           'recherche=fleuve&cursor=x'):
+            with self.subTest(parametres=parametres):
+                reponse = self.client.get(f"/api/donnees/datasets/?{parametres}")
+                self.assertEqual(reponse.status_code, 400)
+                self.assertIn(parametres.split('=')[0], reponse.json())
+        self.assertEqual(self.client.get('/api/donnees/datasets/?recherche=fleuve').status_code, 200)
+
+
+@SANS_CACHE
+class ExtraitsTests(TestCase):
+    """Les extraits de recherche sont échappés sur toutes les bases, seuls les <mark> restent"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        Dataset.objects.create(
+            name_of_dataverse='Jeu piégé', url='https://doi.org/piege',
+            description='<script>alert(1)</script> Relevés du fleuve & marées <b>brutes</b>',
+        )
+
+    def extrait(self):
+        reponse = self.client.get('/api/donnees/datasets/?recherche=fleuve&extrait=1')
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()[0]['extrait']
+
+    def verifier(self, extrait):
+        self.assertNotIn('<script>', extrait)
+        self.assertNotIn('<b>', extrait)
+        self.assertIn('&lt;script&gt;', extrait)
+        self.assertIn('&amp;', extrait)
+        self.assertIn('<mark>fleuve</mark>', extrait)
+
+    def test_surlignage_par_la_base(self):
+        self.verifier(self.extrait())
+
+    def test_surlignage_en_python(self):
+        with mock.patch('api_rest.recherche.connection') as factice:
+            factice.vendor = 'autre'
+            self.verifier(self.extrait())
+
+
+@SANS_CACHE
+class TermesTests(TestCase):
+    """Termes reliés depuis les listes de la source, filtrés par préfixe normalisé"""
+
+    def setUp(self):
+        from recup_donnee.services.MesServices import ImportateurDatasets
+        self.importateur = ImportateurDatasets()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+
+    def moissonner(self, auteurs):
+        return self.importateur.synchroniser_pages([[{
+            'global_id': 'doi:10.5683/SP3/D1', 'url': 'https://doi.org/d1', 'name_of_dataverse': 'Jeu',
+            'authors': auteurs, 'keywords': ['Océanographie'],
+        }]], 'source')
+
+    def auteurs(self):
+        return sorted(Dataset.objects.get().author_terms.values_list('name', flat=True))
+
+    def test_virgule_dans_un_terme(self):
+        self.moissonner(['Doe', 'John'])
+        self.assertEqual(self.auteurs(), ['Doe', 'John'])
+        # Même texte joint ("Doe, John") : l'empreinte couvre les termes
+        self.assertEqual(self.moissonner(['Doe, John'])['mis_a_jour'], 1)
+        self.assertEqual(self.auteurs(), ['Doe, John'])
+
+    def test_filtre_par_prefixe(self):
+        self.moissonner(['Doe, John'])
+        for parametres, nombre in (
+            ({'organisations': 'doe'}, 1),
+            ({'producteur': 'DOE, JOHN'}, 1),
+            ({'organisations': 'john'}, 0),
+            ({'mots_cles': 'oceano'}, 1),
+        ):
+            with self.subTest(parametres=parametres):
+                self.assertEqual(len(self.client.get('/api/donnees/datasets/', parametres).json()), nombre)
+
+
+@SANS_CACHE
+class ClassificationTests(TestCase):
+    """Filtres catalogue / thématique par égalité sur les tags calculés à l'import"""
+
+    TEXTES = [
+        {'subjects': 'Earth and Environmental Sciences', 'keywords': 'Arctic, Sea ice'},
+        {'subjects': 'Chemistry', 'keywords': 'Great Lakes', 'description': 'Analyses chimiques'},
+        {'subjects': 'Biologie', 'keywords': 'Biodiversité', 'description': 'Estuaire du Saint-Laurent'},
+        {'subjects': 'Physique', 'keywords': 'Météo', 'description': 'Côte ATLANTIQUE'},
+        {'subjects': 'Autre', 'keywords': 'Aucun', 'description': None},
+    ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        creer_datasets(10)
+        for i, textes in enumerate(self.TEXTES):
+            Dataset.objects.create(name_of_dataverse=f"Texte {i}", url=f"https://doi.org/t{i}", **textes)
+        reclasser_catalogue()
+
+    def ids(self, parametres):
+        return sorted(d['id'] for d in self.client.get('/api/donnees/datasets/', parametres).json())
+
+    def ids_sans_tags(self, parametres):
+        with mock.patch('api_rest.filtres.classification_a_jour', return_value=False):
+            return self.ids(parametres)
+
+    def test_memes_resultats_que_la_recherche_par_sous_chaines(self):
+        from recup_donnee.classification import CATALOGUES
+        for kind, table in (('catalogue', CATALOGUES), ('thematique', THEMATIQUES)):
+            for slug in table:
+                self.assertEqual(self.ids({kind: slug}), self.ids_sans_tags({kind: slug}), slug)
+        self.assertEqual(self.ids({'catalogue': 'arctique', 'thematique': 'environnement'}),
+                         self.ids_sans_tags({'catalogue': 'arctique', 'thematique': 'environnement'}))
+
+    def test_valeur_inconnue(self):
+        self.assertEqual(len(self.ids({'thematique': 'physique'})), 1)
+
+    def test_tables_modifiees(self):
+        with mock.patch.dict(THEMATIQUES, {'climat': ['sea ice']}):
+            # Avant reclassement : recherche par sous-chaînes avec la nouvelle table
+            self.assertEqual(len(self.ids({'thematique': 'climat'})), 1)
+            reclasser_catalogue()
+            self.assertEqual(len(self.ids({'thematique': 'climat'})), 1)
+            self.assertEqual(Dataset.objects.filter(tags__slug='climat').get().name_of_dataverse, 'Texte 0')
+
+    def test_classement_a_l_import(self):
+        from recup_donnee.services.MesServices import ImportateurDatasets
+        ImportateurDatasets().importer_items_en_masse([{
+            'global_id': 'doi:10.5683/SP3/IMPORT', 'url': 'https://doi.org/import',
+            'name_of_dataverse': 'Import', 'subjects': ['Ocean and climate'],
+        }])
+        tags = Tag.objects.filter(datasets__global_id='doi:10.5683/SP3/IMPORT')
+        self.assertEqual({t.slug for t in tags}, {'climat', 'oceanographie'})
+
+    def test_requetes(self):
+        with budget_requetes(BudgetRequetesTests.BUDGET_LISTE):
+            self.client.get('/api/donnees/datasets/?catalogue=arctique&thematique=climat')
+
+
+@SANS_CACHE
+class FacettesTests(TestCase):
+    """Décomptes calculés en SQL, identiques à un décompte sur la liste complète"""
+
+    def setUp(self):
+        from recup_donnee.services.MesServices import ImportateurDatasets
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        ImportateurDatasets().importer_items_en_masse([{
+            'global_id': f"doi:10.5683/SP3/F{i}", 'url': f"https://doi.org/f{i}",
+            'name_of_dataverse': f"Jeu {i} fleuve", 'keywords': ['Océan', f"mot{i % 4}"],
+            'subjects': ['Earth and Environmental Sciences'], 'authors': [f"Auteur {i % 3}"],
+            'contacts': [{'name': 'C', 'affiliation': f"Univ {i % 2}"}, {'name': 'D', 'affiliation': f"Univ {i % 2}"}],
+            'published_at': f"20{10 + i % 3}-0{1 + i % 2}-15T00:00:00Z",
+        } for i in range(20)])
+
+    def decompter(self, datasets):
+        mots = Counter(m.strip() for d in datasets for m in d['keywords'].split(','))
+        mois = Counter(d['date_info']['published_at'][:7] for d in datasets)
+        affiliations = Counter(a for d in datasets for a in {c['affiliation'] for c in d['contacts']})
+        return mots, mois, affiliations
+
+    def test_memes_decomptes_que_la_liste(self):
+        for parametres in ({}, {'organisations': 'Auteur 1'}, {'recherche': 'fleuve'}, {'date_debut': '2011-01-01'}):
+            facettes = self.client.get('/api/donnees/datasets/facettes/', {**parametres, 'limite': 100}).json()
+            datasets = self.client.get('/api/donnees/datasets/', parametres).json()
+            mots, mois, affiliations = self.decompter(datasets)
+            self.assertEqual(facettes['total'], len(datasets))
+            self.assertEqual({v['nom']: v['nombre'] for v in facettes['mots_cles']}, mots)
+            self.assertEqual({v['nom']: v['nombre'] for v in facettes['mois']}, mois)
+            self.assertEqual({v['nom']: v['nombre'] for v in facettes['affiliations']}, affiliations)
+            self.assertEqual([v['nom'] for v in facettes['mois']], sorted(mois))
+
+    def test_limite_et_selection(self):
+        facettes = self.client.get('/api/donnees/datasets/facettes/?facettes=mots_cles,auteurs&limite=2').json()
+        self.assertEqual(set(facettes), {'total', 'mots_cles', 'auteurs'})
+        self.assertEqual(facettes['mots_cles'][0], {'nom': 'Océan', 'nombre': 20})
+        self.assertEqual(len(facettes['auteurs']), 2)
+        reponse = self.client.get('/api/donnees/datasets/facettes/?facettes=inconnue&limite=0')
+        self.assertEqual(set(reponse.json()), {'facettes', 'limite'})
+
+    def test_requetes(self):
+        # version du catalogue + total + une requête par facette
+        with budget_requetes(7):
+            self.client.get('/api/donnees/datasets/facettes/?thematique=oceanographie')
+
+
+@SANS_CACHE
+class LotTests(TestCase):
+    """Plusieurs datasets par id en une requête, dans l'ordre demandé"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        creer_datasets(30)
+        self.ids = list(Dataset.objects.order_by('-id').values_list('id', flat=True)[:25:2])
+
+    def test_ordre_et_contenu(self):
+        demandes = [*self.ids, 999999, self.ids[0]]
+        url = f"/api/donnees/datasets/lot/?ids={','.join(map(str, demandes))}"
+        reponse = self.client.get(url)
+        self.assertEqual([d['id'] for d in reponse.json()], self.ids)
+        self.assertEqual(reponse.json()[0], self.client.get(f"/api/donnees/datasets/{self.ids[0]}/").json())
+        with override_settings(DATASETS_SERIALISATION_RAPIDE=False):
+            self.assertEqual(self.client.get(url).content, reponse.content)
+        reponse = self.client.get(f"{url}&fields=name_of_dataverse")
+        self.assertEqual(list(reponse.json()[0]), ['id', 'name_of_dataverse'])
+
+    def test_requetes(self):
+        with budget_requetes(BudgetRequetesTests.BUDGET_LISTE):
+            self.client.get(f"/api/donnees/datasets/lot/?ids={','.join(map(str, self.ids))}")
+
+    def test_limite(self):
+        with override_settings(DATASETS_LOT_MAX=3):
+            self.assertEqual(self.client.get('/api/donnees/datasets/lot/?ids=1,2,3,4').status_code, 400)
+            self.assertEqual(self.client.get('/api/donnees/datasets/lot/?ids=1,2,2,3').status_code, 200)
+        self.assertEqual(self.client.get('/api/donnees/datasets/lot/?ids=1,x').status_code, 400)
+        self.assertEqual(self.client.get('/api/donnees/datasets/lot/').status_code, 400)
+
+    def test_graphql(self):
+        requete = """query($ids: [Int!]!) {
+            datasetsByIds(ids: $ids) { id nameOfDataverse contacts { name } publications { citation } dateInfo { publishedAt } }
+        }"""
+        with budget_requetes(4):
+            reponse = self.client.post('/api/graphql/', {'query': requete, 'variables': {'ids': self.ids}}, format='json')
+        datasets = reponse.json()['data']['datasetsByIds']
+        self.assertEqual([int(d['id']) for d in datasets], self.ids)
+        with override_settings(DATASETS_LOT_MAX=3):
+            reponse = self.client.post('/api/graphql/', {'query': requete, 'variables': {'ids': self.ids}}, format='json')
+        self.assertIn('3 ids au plus', reponse.json()['errors'][0]['message'])
+
+
+# La fin d'une moisson construit les instantanés : jamais dans le dossier réel
+INSTANTANES_TEMPORAIRES = override_settings(INSTANTANES_DIR=os.path.join(tempfile.gettempdir(), 'instantanes-tests'))
+
+
+@SANS_CACHE
+class LectureAsyncTests(TestCase):
+    """Les vues async (/api/async/) répondent comme les vues synchrones"""
+
+    def setUp(self):
+        utilisateur = User.objects.create_user('lecteur')
+        self.client = APIClient()
+        self.client.force_authenticate(utilisateur)
+        self.entetes = {'Authorization': f"Token {Token.objects.create(user=utilisateur).key}"}
+        creer_datasets(30)
+
+    def get_async(self, url, **kwargs):
+        return async_to_sync(self.async_client.get)(url, **kwargs)
+
+    def test_memes_reponses(self):
+        pk = Dataset.objects.order_by('id').values_list('id', flat=True)[3]
+        for chemin in (
+            'datasets/',
+            'datasets/?page_size=7&mots_cles=ocean',
+            'datasets/?fields=name_of_dataverse&expand=contacts&organisations=auteur 1',
+            'datasets/?recherche=fleuve&extrait=1&page_size=5',
+            'datasets/?search=Jeu 1&ordering=-name_of_dataverse',
+            f'datasets/{pk}/',
+            'datasets/999999/',
+            'datasets/?fields=inconnu',
+            'datasets/facettes/?limite=3&date_debut=2012-01-01',
+            'datasets/facettes/?facettes=inconnue',
+            'statistiques/?limite=2',
+        ):
+            with self.subTest(chemin=chemin):
+                synchrone = self.client.get(f"/api/donnees/{chemin}")
+                reponse = self.get_async(f"/api/async/{chemin}", headers=self.entetes)
+                self.assertEqual(reponse.status_code, synchrone.status_code)
+                self.assertEqual(reponse.content.replace(b'/api/async/', b'/api/donnees/'), synchrone.content)
+
+    def test_pagination(self):
+        reponse = self.get_async('/api/async/datasets/?page_size=20', headers=self.entetes).json()
+        suite = self.get_async(reponse['next'], headers=self.entetes).json()
+        ids = [d['id'] for d in reponse['results'] + suite['results']]
+        self.assertEqual(sorted(ids), sorted(Dataset.objects.values_list('id', flat=True)))
+
+    def test_authentification_et_methodes(self):
+        self.assertEqual(self.get_async('/api/async/datasets/').status_code, 401)
+        reponse = self.get_async('/api/async/datasets/', headers={'Authorization': 'Token inconnu'})
+        self.assertEqual(reponse.status_code, 401)
+        self.assertEqual(reponse['WWW-Authenticate'], 'Token')
+        reponse = async_to_sync(self.async_client.post)('/api/async/datasets/', headers=self.entetes)
+        self.assertEqual(reponse.status_code, 405)
+
+    def test_requete_conditionnelle(self):
+        reponse = self.get_async('/api/async/datasets/', headers=self.entetes)
+        reponse = self.get_async('/api/async/datasets/', headers={**self.entetes, 'If-None-Match': reponse['ETag']})
+        self.assertEqual(reponse.status_code, 304)
+
+    def test_requetes(self):
+        # jeton + même budget que la liste synchrone
+        with budget_requetes(BudgetRequetesTests.BUDGET_LISTE + 1):
+            self.get_async('/api/async/datasets/', headers=self.entetes)
+
+    def test_graphql(self):
+        requete = "{ datasetsByIds(ids: [1, 2, 3]) { id nameOfDataverse contacts { name } dateInfo { publishedAt } } }"
+        synchrone = self.client.post('/api/graphql/', {'query': requete}, format='json')
+        reponse = async_to_sync(self.async_client.post)(
+            '/api/async/graphql/', {'query': requete}, content_type='application/json',
+        )
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.content, synchrone.content)
+        reponse = async_to_sync(self.async_client.get)('/api/async/graphql/', {'query': '{ inconnu }'})
+        self.assertEqual(reponse.status_code, 400)
+
+
+@INSTANTANES_TEMPORAIRES
+class RequetesConditionnellesTests(TransactionTestCase):
+    """ETag / Last-Modified liés à la version du catalogue (incrémentée au commit)"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        creer_datasets(5)
+
+    def test_304_sans_requete_sur_les_datasets(self):
+        for url in ('/api/donnees/datasets/', '/api/datasets/', '/api/donnees/datasets/?fields=url',
+                    f"/api/donnees/datasets/{Dataset.objects.first().pk}/", '/api/graphql/?query={allDatasets{id}}'):
+            reponse = self.client.get(url)
+            self.assertEqual(reponse.status_code, 200, url)
+            self.assertIn('Last-Modified', reponse)
+            self.assertFalse(reponse['ETag'].startswith('W/'))
+            with budget_requetes(1):
+                reponse = self.client.get(url, HTTP_IF_NONE_MATCH=reponse['ETag'])
+            self.assertEqual(reponse.status_code, 304, url)
+
+    def test_etag_par_representation(self):
+        tous = self.client.get('/api/donnees/datasets/')['ETag']
+        noms = self.client.get('/api/donnees/datasets/?fields=name_of_dataverse')['ETag']
+        self.assertNotEqual(tous, noms)
+
+    def test_ecriture_change_etag(self):
+        avant = self.client.get('/api/donnees/datasets/')['ETag']
+        Contact.objects.create(dataset=Dataset.objects.first(), name='Nouveau')
+        reponse = self.client.get('/api/donnees/datasets/', HTTP_IF_NONE_MATCH=avant)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertNotEqual(reponse['ETag'], avant)
+
+    def test_version_une_fois_par_transaction(self):
+        from django.db import transaction
+        from recup_donnee.catalogue import catalogue_modifie, etat_catalogue
+        version = etat_catalogue().version
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    catalogue_modifie()
+                    raise ValueError
+            except ValueError:
+                pass
+            # Callback du savepoint annulé abandonné : planifié à nouveau, une fois
+            catalogue_modifie()
+            catalogue_modifie()
+        self.assertEqual(etat_catalogue().version, version + 1)
+        with transaction.atomic():
+            catalogue_modifie()
+            transaction.set_rollback(True)
+        self.assertEqual(etat_catalogue().version, version + 1)
+        with transaction.atomic():
+            catalogue_modifie()
+        self.assertEqual(etat_catalogue().version, version + 2)
+
+    def test_moisson_en_masse_change_etag(self):
+        from recup_donnee.services.MesServices import ImportateurDatasets
+        avant = self.client.get('/api/donnees/datasets/')['ETag']
+        ImportateurDatasets().synchroniser_pages([[{
+            'global_id': 'doi:10.5683/SP3/NOUVEAU', 'url': 'https://doi.org/nouveau',
+            'name_of_dataverse': 'Nouveau', 'identifier_of_dataverse': 'ogsl',
+        }]], 'source')
+        self.assertNotEqual(self.client.get('/api/donnees/datasets/')['ETag'], avant)
+
+
+class CacheReponsesTests(TransactionTestCase):
+    """Cache des listes : clé normalisée, invalidation par la version du catalogue"""
+
+    def setUp(self):
+        cache_datasets().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        creer_datasets(5)
+
+    def test_hit_sans_requete_sur_les_datasets(self):
+        premiere = self.client.get('/api/donnees/datasets/?organisations=Auteur 1,auteur 2&fields=id,url')
+        hits = statistiques_cache()['hits']
+        with budget_requetes(1):
+            seconde = self.client.get('/api/donnees/datasets/?fields=url,id&organisations=AUTEUR 2, auteur 1')
+        self.assertEqual(statistiques_cache()['hits'], hits + 1)
+        self.assertEqual(seconde.content, premiere.content)
+
+    def test_cle_des_valeurs_lues_par_la_vue(self):
+        def cle(requete):
+            return normaliser_parametres(QueryDict(requete))
+
+        # Équivalences appliquées par le SQL : même entrée
+        for a, b in (
+            ('organisations=Émile,Auteur 1', 'organisations=auteur 1, emile'),
+            ('mots_cles=ocean,glace', 'keywords=glace,ocean,glace'),
+            ('organisations=x&organisations=auteur 1', 'organisations=auteur 1'),
+            ('thematique=&page=2', 'page=2'),
+        ):
+            with self.subTest(a=a, b=b):
+                self.assertEqual(cle(a), cle(b))
+        # Requêtes SQL différentes : entrées distinctes
+        for a, b in (
+            ('mots_cles=Océan', 'mots_cles=ocean'),
+            ('producteur=a,b', 'producteur=b,a'),
+            ('ordering=id&ordering=url', 'ordering=url&ordering=id'),
+            ('fields=', ''),
+            ('producteur= ', ''),
+            ('mots_cles=ocean&keywords=glace', 'keywords=glace'),
+        ):
+            with self.subTest(a=a, b=b):
+                self.assertNotEqual(cle(a), cle(b))
+
+    def test_ecriture_invalide(self):
+        self.client.get('/api/datasets/')
+        Dataset.objects.filter(pk=Dataset.objects.first().pk).delete()
+        self.assertEqual(len(self.client.get('/api/datasets/').json()), 4)
+
+    def test_statistiques_reservees_aux_admins(self):
+        self.assertEqual(self.client.get('/api/donnees/cache/').status_code, 403)
+        self.client.force_authenticate(User.objects.create_superuser('admin'))
+        self.assertIn('hits', self.client.get('/api/donnees/cache/').json())
+
+
+@INSTANTANES_TEMPORAIRES
+class InstantanesTests(TransactionTestCase):
+    """Instantanés gzip construits après une moisson et servis tels quels"""
+
+    def setUp(self):
+        from django.conf import settings
+        shutil.rmtree(settings.INSTANTANES_DIR, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, settings.INSTANTANES_DIR, ignore_errors=True)
+        cache_datasets().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+        creer_datasets(12)
+
+    def moissonner(self, global_id):
+        from recup_donnee.services.MesServices import ImportateurDatasets
+        ImportateurDatasets().synchroniser_pages([[{
+            'global_id': global_id, 'url': f"https://doi.org/{global_id}",
+            'name_of_dataverse': 'Nouveau', 'identifier_of_dataverse': 'ogsl',
+        }]], 'source')
+
+    def telecharger(self, sortie, parametres=None, **entetes):
+        reponse = self.client.get(f"/api/donnees/instantanes/{sortie}/", parametres, **entetes)
+        contenu = gzip.decompress(b''.join(reponse.streaming_content)) if reponse.status_code == 200 else None
+        return reponse, contenu
+
+    def test_memes_octets_que_l_api(self):
+        self.moissonner('doi:10.5683/SP3/A')
+        reponse, contenu = self.telecharger('json')
+        self.assertEqual(reponse['Content-Type'], 'application/gzip')
+        attendu = self.client.get('/api/donnees/datasets/?ordering=id').content
+        self.assertEqual(contenu, attendu)
+        _, ndjson = self.telecharger('ndjson')
+        self.assertEqual([json.loads(ligne) for ligne in ndjson.splitlines()], json.loads(attendu))
+        _, texte = self.telecharger('csv')
+        self.assertEqual(len(list(csv.reader(io.StringIO(texte.decode())))), Dataset.objects.count() + 1)
+
+    def test_servi_sans_requete_sur_les_datasets(self):
+        self.moissonner('doi:10.5683/SP3/A')
+        reponse, _ = self.telecharger('json')
+        with budget_requetes(2):
+            reponse, _ = self.telecharger('json')
+        with budget_requetes(2):
+            self.assertEqual(self.telecharger('json', HTTP_IF_NONE_MATCH=reponse['ETag'])[0].status_code, 304)
+
+    def test_nouvelle_moisson_nouvelle_version(self):
+        self.moissonner('doi:10.5683/SP3/A')
+        avant = self.client.get('/api/donnees/instantanes/').json()
+        self.moissonner('doi:10.5683/SP3/B')
+        apres = self.client.get('/api/donnees/instantanes/').json()
+        self.assertGreater(apres['version'], avant['version'])
+        reponse, contenu = self.telecharger('json', {'version': avant['version']})
+        self.assertIn('immutable', reponse['Cache-Control'])
+        self.assertIn('https://doi.org/doi:10.5683/SP3/A', {d['url'] for d in json.loads(contenu)})
+        _, contenu = self.telecharger('json')
+        self.assertNotIn('https://doi.org/doi:10.5683/SP3/A', {d['url'] for d in json.loads(contenu)})
+
+    def test_lecture_sans_reconstruction(self):
+        self.assertEqual(self.client.get('/api/donnees/instantanes/').status_code, 404)
+        self.moissonner('doi:10.5683/SP3/A')
+        avant = self.client.get('/api/donnees/instantanes/').json()
+        # Écriture hors moisson et hors admin : le dernier instantané reste servi tel quel
+        Dataset.objects.first().save()
+        with mock.patch('api_rest.instantanes.ecrire_fichiers') as ecrire:
+            self.assertEqual(self.client.get('/api/donnees/instantanes/').json(), avant)
+            self.assertEqual(self.telecharger('json')[0].status_code, 200)
+        ecrire.assert_not_called()
+
+    def test_reconstruit_apres_edition_admin(self):
+        self.moissonner('doi:10.5683/SP3/A')
+        avant = self.client.get('/api/donnees/instantanes/').json()
+        dataset = Dataset.objects.get(global_id='doi:10.5683/SP3/A')
+        admin = APIClient()
+        admin.force_login(User.objects.create_superuser('admin'))
+        with mock.patch('api_rest.instantanes.ecrire_fichiers') as ecrire:
+            reponse = admin.post(f"/admin/recup_donnee/dataset/{dataset.pk}/delete/", {'post': 'yes'})
+        self.assertEqual(reponse.status_code, 302)
+        # Rien n'est construit pendant la requête de l'admin : le planificateur s'en charge
+        ecrire.assert_not_called()
+        self.assertEqual(self.client.get('/api/donnees/instantanes/').json(), avant)
+        HarvestConfig.objects.all().delete()
+        call_command('moissonner', '--une-fois', stdout=io.StringIO())
+        apres = self.client.get('/api/donnees/instantanes/').json()
+        self.assertGreater(apres['version'], avant['version'])
+        with mock.patch('api_rest.instantanes.ecrire_fichiers') as ecrire:
+            call_command('moissonner', '--une-fois', stdout=io.StringIO())
+        ecrire.assert_not_called()
+        _, contenu = self.telecharger('json')
+        self.assertNotIn(dataset.url, {d['url'] for d in json.loads(contenu)})
+
+    def test_une_construction_a_la_fois(self):
+        from django.conf import settings
+        from api_rest.instantanes import VERROU, construire_instantane
+        os.makedirs(settings.INSTANTANES_DIR, exist_ok=True)
+        verrou = os.path.join(settings.INSTANTANES_DIR, VERROU)
+        open(verrou, 'w').close()
+        with mock.patch('api_rest.instantanes.ecrire_fichiers') as ecrire:
+            self.assertIsNone(construire_instantane())
+        ecrire.assert_not_called()
+        # Verrou d'un processus disparu : repris
+        os.utime(verrou, (0, 0))
+        self.assertEqual(construire_instantane()['datasets'], 12)
+        self.assertFalse(os.path.exists(verrou))
+
+    def test_sortie_inconnue(self):
+        self.assertEqual(self.client.get('/api/donnees/instantanes/xml/').status_code, 404)
+        self.assertEqual(self.client.get('/api/donnees/instantanes/json/?version=999').status_code, 404)
+
+
+@INSTANTANES_TEMPORAIRES
+class StatistiquesTests(TransactionTestCase):
+    """Agrégats tenus à jour par l'importateur, identiques à une reconstruction complète"""
+
+    def setUp(self):
+        from recup_donnee.services.MesServices import ImportateurDatasets
+        self.importateur = ImportateurDatasets()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lecteur'))
+
+    def item(self, i, version=0):
+        return {
+            'global_id': f"doi:10.5683/SP3/S{i}", 'url': f"https://doi.org/s{i}",
+            'name_of_dataverse': f"Jeu {i}", 'keywords': ['Océan', f"mot{(i + version) % 4}"],
+            'contacts': [{'name': 'C', 'affiliation': f"Univ {(i + version) % 3}"}],
+            'publications': [{'citation': 'Cit'}] * (i % 2),
+            'published_at': f"20{10 + i % 3}-0{1 + (i + version) % 2}-15T00:00:00Z",
+            'createdAt': '2009-05-01T00:00:00Z', 'updatedAt': '2009-06-01T00:00:00Z',
+        }
+
+    def verifier_coherence(self):
+        from recup_donnee.models import CatalogStats
+        from recup_donnee.statistiques import lire_statistiques, reconstruire_statistiques
+        self.assertFalse(CatalogStats.objects.get(pk=1).stale)
+        incremental = lire_statistiques(100)
+        reconstruire_statistiques()
+        complet = lire_statistiques(100)
+        for cle in ('totaux', 'mois', 'affiliations', 'mots_cles'):
+            self.assertEqual(incremental[cle], complet[cle], cle)
+        return complet
+
+    def test_moissons_successives(self):
+        from recup_donnee.statistiques import contributions, lire_statistiques, marquer_perimees
+        lire_statistiques()
+        self.importateur.synchroniser_pages([[self.item(i) for i in range(12)]], 'source')
+        self.assertEqual(self.verifier_coherence()['totaux']['datasets'], 12)
+        # Modifications, retraits et nouveaux datasets
+        self.importateur.synchroniser_pages([[self.item(i, version=1) for i in range(3, 15)]], 'source')
+        statistiques = self.verifier_coherence()
+        self.assertEqual(statistiques['totaux'], {'datasets': 12, 'contacts': 12, 'publications': 6})
+        self.assertEqual(statistiques['mots_cles'][0], {'nom': 'Océan', 'nombre': 12})
+        self.importateur.importer_items_en_masse([self.item(20)])
+        # Import historique : ni suivi ni verrou par ligne, agrégats marqués une fois puis reconstruits
+        with mock.patch.object(self.importateur, 'iterer_items', return_value=[self.item(21), self.item(22)]), \
+                mock.patch('recup_donnee.statistiques.contributions', wraps=contributions) as mesurees, \
+                mock.patch('recup_donnee.statistiques.marquer_perimees', wraps=marquer_perimees) as marquees:
+            self.importateur.importer_donnees()
+        marquees.assert_called_once_with()
+        # Une seule mesure : la reconstruction de fin de moisson
+        self.assertEqual(mesurees.call_count, 1)
+        self.assertEqual(self.verifier_coherence()['totaux']['datasets'], 15)
+
+    def test_lignes_inchangees_rattachees_a_la_source(self):
+        # Import en masse : lignes sans source
+        self.importateur.importer_items_en_masse([self.item(i) for i in range(3)])
+        rapport = self.importateur.synchroniser_pages([[self.item(i) for i in range(3)]], 'source')
+        self.assertEqual(rapport['inchanges'], 3)
+        self.assertEqual(set(Dataset.objects.values_list('source', flat=True)), {'source'})
+        rapport = self.importateur.synchroniser_pages([[self.item(0)]], 'source')
+        self.assertEqual(rapport['retires'], 2)
+        self.assertEqual(self.verifier_coherence()['totaux']['datasets'], 1)
+
+    def test_remplacement_des_enfants_sans_signal_par_ligne(self):
+        from django.db.models.signals import post_delete
+        self.importateur.synchroniser_pages([[self.item(i) for i in range(12)]], 'source')
+        # Doublon d'un dataset existant : supprimé par la moisson suivante
+        doublon = Dataset.objects.create(global_id='doi:10.5683/SP3/S0', url='https://doi.org/s0', source='source')
+        Contact.objects.create(dataset=doublon, name='Doublon')
+        from recup_donnee.statistiques import reconstruire_statistiques
+        reconstruire_statistiques()
+        supprimes = []
+
+        def compter(sender, **kwargs):
+            supprimes.append(sender)
+        post_delete.connect(compter)
+        self.addCleanup(post_delete.disconnect, compter)
+        avant = self.client.get('/api/donnees/datasets/')['ETag']
+        self.importateur.synchroniser_pages([[self.item(i, version=1) for i in range(12)]], 'source')
+        self.assertEqual(supprimes, [])
+        self.assertFalse(Dataset.objects.filter(pk=doublon.pk).exists())
+        self.assertFalse(Contact.objects.filter(name='Doublon').exists())
+        self.assertEqual(Contact.objects.count(), 12)
+        self.assertNotEqual(self.client.get('/api/donnees/datasets/')['ETag'], avant)
+        self.verifier_coherence()
+
+    def test_ecriture_hors_importateur(self):
+        from recup_donnee.models import CatalogStats
+        self.importateur.synchroniser_pages([[self.item(i) for i in range(3)]], 'source')
+        self.client.get('/api/donnees/statistiques/')
+        Contact.objects.create(dataset=Dataset.objects.first(), name='Nouveau', affiliation='Univ X')
+        self.assertTrue(CatalogStats.objects.get(pk=1).stale)
+        # La lecture sert les derniers agrégats sans les recalculer
+        with budget_requetes(6) as requetes:
+            statistiques = self.client.get('/api/donnees/statistiques/').json()
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in requetes.captured_queries))
+        self.assertEqual(statistiques['totaux']['contacts'], 3)
+        self.assertTrue(statistiques['a_reconstruire'])
+        # Reconstruits hors requête (planificateur), une seule fois
+        from recup_donnee.statistiques import reconstruire_si_perimees
+        self.assertIsNotNone(reconstruire_si_perimees())
+        self.assertIsNone(reconstruire_si_perimees())
+        statistiques = self.client.get('/api/donnees/statistiques/').json()
+        self.assertEqual(statistiques['totaux']['contacts'], 4)
+        self.assertIn({'nom': 'Univ X', 'nombre': 1}, statistiques['affiliations'])
+        self.assertFalse(statistiques['a_reconstruire'])
+
+    def test_reconstruit_apres_edition_admin(self):
+        self.importateur.synchroniser_pages([[self.item(i) for i in range(3)]], 'source')
+        self.client.get('/api/donnees/statistiques/')
+        admin = APIClient()
+        admin.force_login(User.objects.create_superuser('admin'))
+        contact = Contact.objects.first()
+        reponse = admin.post(f"/admin/recup_donnee/contact/{contact.pk}/delete/", {'post': 'yes'})
+        self.assertEqual(reponse.status_code, 302)
+        statistiques = self.client.get('/api/donnees/statistiques/').json()
+        self.assertEqual(statistiques['totaux']['contacts'], 2)
+        self.assertFalse(statistiques['a_reconstruire'])
+
+    def test_reconstruction_reverifiee_sous_verrou(self):
+        from recup_donnee.statistiques import reconstruire_statistiques
+        self.importateur.synchroniser_pages([[self.item(i) for i in range(3)]], 'source')
+        reconstruire_statistiques()
+        # Un lecteur qui attendait le verrou ne refait pas le travail :
+        # get_or_create + SELECT ... FOR UPDATE, sans agrégat
+        with budget_requetes(4) as requetes:
+            reconstruire_statistiques(si_perimees=True)
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in requetes.captured_queries))
+
+    def test_lecture_sans_comptage(self):
+        self.importateur.synchroniser_pages([[self.item(i) for i in range(30)]], 'source')
+        self.client.get('/api/donnees/statistiques/')
+        # session + version du catalogue + totaux + mois + affiliations + mots-clés
+        with budget_requetes(6) as requetes:
+            reponse = self.client.get('/api/donnees/statistiques/?limite=2')
+        self.assertEqual(len(reponse.json()['mots_cles']), 2)
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in requetes.captured_queries))
@@ -1,10 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DatasetViewSet
+from .views import DatasetViewSet, InstantaneVue, etat_cache, statistiques
 
 router = DefaultRouter()
 router.register(r'datasets', DatasetViewSet, basename='dataset')
 
 urlpatterns = [
+    path('cache/', etat_cache, name='etat-cache'),
+    path('statistiques/', statistiques, name='statistiques'),
+    path('instantanes/', InstantaneVue.as_view(), name='instantanes'),
+    path('instantanes/<str:sortie>/', InstantaneVue.as_view(), name='instantane'),
     path('', include(router.urls)),
 ]
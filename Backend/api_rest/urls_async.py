@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import vues_async
+
+# Montées sous /api/async/ : à servir par un serveur ASGI (voir README)
+urlpatterns = [
+    path('datasets/', vues_async.liste_datasets, name='async-datasets'),
+    path('datasets/facettes/', vues_async.facettes_datasets, name='async-facettes'),
+    path('datasets/<int:pk>/', vues_async.detail_dataset, name='async-dataset'),
+    path('statistiques/', vues_async.statistiques, name='async-statistiques'),
+]
@@ -1,10 +1,77 @@
 # api_rest/views.py
+import os
+
 from rest_framework import viewsets, filters
-from rest_framework.permissions import IsAuthenticated
-from recup_donnee.models import Dataset
-from .serializers import DatasetSerializer
-from django.db.models import Q
-from datetime import datetime
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from recup_donnee.models import Dataset, DateInfo
+from recup_donnee.statistiques import lire_statistiques
+from recup_donnee.catalogue import conditionnel_catalogue, etat_requete
+from recup_donnee.cache_reponses import cache_datasets, cle_reponse, reponse_en_cache, statistiques_cache
+from recup_donnee.serialisation import SerialisationRapide, serialisation_rapide_active
+from .serializers import DatasetSerializer, DatasetRechercheSerializer
+from .instantanes import FORMATS, chemin_fichier, lire_manifeste
+from .filtres import filtrer_datasets
+from .facettes import FACETTES, LIMITE_DEFAUT, LIMITE_MAX, calculer_facettes
+from .export import SORTIES, colonnes_csv, compresser, flux_csv, flux_ndjson, lots_lignes
+from .recherche import rechercher, termes_recherche
+from .pagination import PARAMETRES_ORDRE, CurseurDatasetsPagination
+from django.conf import settings
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from django.utils.decorators import method_decorator
+
+
+RELATIONS = ('contacts', 'publications', 'date_info')
+
+
+def liste_parametre(valeur):
+    return [v.strip() for v in (valeur or '').split(',') if v.strip()]
+
+
+def parametres_facettes(params):
+    """(facettes, limite) de l'action facettes/, ValidationError si invalides"""
+    facettes = liste_parametre(params.get('facettes')) or list(FACETTES)
+    erreurs = {}
+    inconnues = [f for f in facettes if f not in FACETTES]
+    if inconnues:
+        erreurs['facettes'] = [f"Facette inconnue : {f}" for f in inconnues]
+    try:
+        limite = int(params.get('limite', LIMITE_DEFAUT))
+        if not 1 <= limite <= LIMITE_MAX:
+            raise ValueError
+    except ValueError:
+        erreurs['limite'] = [f"Entier entre 1 et {LIMITE_MAX}"]
+    if erreurs:
+        raise ValidationError(erreurs)
+    return facettes, limite
+
+
+def limite_statistiques(params):
+    try:
+        limite = int(params.get('limite', LIMITE_DEFAUT))
+        if not 1 <= limite <= LIMITE_MAX:
+            raise ValueError
+    except ValueError:
+        raise ValidationError({'limite': [f"Entier entre 1 et {LIMITE_MAX}"]})
+    return limite
+
+
+def restreindre(qs, champs, colonnes_en_plus=()):
+    """Ne lit que les colonnes et les relations des champs demandés"""
+    concrets = {f.name for f in Dataset._meta.concrete_fields}
+    colonnes = [c for c in champs if c in concrets]
+    if 'date_info' in champs:
+        colonnes += [f"date_info__{f.name}" for f in DateInfo._meta.concrete_fields]
+    relations = [r for r in RELATIONS if r in champs]
+    return qs.avec_relations(relations=relations).only('id', *colonnes, *colonnes_en_plus)
+
 
 class DatasetViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -12,18 +79,43 @@ class DatasetViewSet(viewsets.ReadOnlyModelViewSet):
     
     Paramètres GET acceptés :
       - search          -> recherche globale (DRF SearchFilter)
-      - mots_cles       -> recherche dans keywords
-      - organisations   -> recherche dans authors
-      - localisations   -> recherche dans subjects
-      - catalogue       -> recherche dans subjects (catalogue spécifique)
-      - thematique      -> recherche dans subjects (thématique)
-      - producteur      -> recherche dans authors (producteur)
+      - mots_cles       -> recherche dans keywords (termes normalisés), nom et description
+      - organisations   -> recherche dans authors (termes normalisés)
+      - localisations   -> recherche dans subjects (termes normalisés)
+      - catalogue       -> catalogue attribué à l'import (recup_donnee.classification)
+      - thematique      -> thématique attribuée à l'import (recup_donnee.classification)
+      - producteur      -> recherche dans authors (termes normalisés)
       - date_debut      -> filtre date >= date_debut
       - date_fin        -> filtre date <= date_fin
+      - recherche       -> recherche plein texte classée par pertinence (ajoute "rang")
+      - extrait         -> avec recherche, ajoute un extrait de la description (HTML échappé, termes dans <mark>)
+      - cursor          -> page suivante/précédente (liens next/previous de la réponse)
+      - page_size       -> active la pagination par curseur, taille de page (voir DATASETS_PAGINATION)
+      - sortie, gzip    -> format et compression de l'action export/ (ndjson ou csv)
+      - facettes, limite -> décomptes de l'action facettes/ (mots-clés, sujets, auteurs...)
+      - ids             -> datasets demandés à l'action lot/, dans l'ordre donné
+      - fields          -> champs renvoyés, séparés par des virgules (id toujours inclus)
+      - expand          -> relations renvoyées (contacts, publications, date_info)
+
+    Avec fields ou expand, seules les colonnes et relations demandées sont
+    lues en base : expand seul garde tous les champs simples et n'ajoute
+    que les relations listées.
+
+    Les réponses portent un ETag et un Last-Modified tirés de la version du
+    catalogue : If-None-Match / If-Modified-Since donnent un 304 sans
+    requête sur les datasets.
+
+    Sans cursor ni page_size, la liste complète est renvoyée. Avec, les
+    résultats sont triés par date de publication décroissante puis id :
+    recherche et ordering, qui imposent leur propre ordre, sont alors
+    refusés (400).
     """
-    queryset = Dataset.objects.all()
+    queryset = Dataset.objects.actifs()
     serializer_class = DatasetSerializer
     permission_classes = [IsAuthenticated]  
+    pagination_class = CurseurDatasetsPagination
+    # Datasets lus par requête lors d'un export en flux
+    taille_lot_export = 1000
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
 
     # Champs pour la recherche globale (search)
@@ -31,96 +123,250 @@ class DatasetViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['name_of_dataverse', 'identifier_of_dataverse']
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        # Relations chargées en 3 requêtes au plus quel que soit le nombre de datasets
+        champs = self.champs_demandes()
+        if champs is None:
+            qs = super().get_queryset().avec_relations()
+        else:
+            # L'extrait calculé en Python lit la description
+            qs = restreindre(super().get_queryset(), champs,
+                             ['description'] if self.extrait_demande() else [])
+        params = self.request.query_params
+        # Filtres 1 à 8, partagés avec la connexion GraphQL (filtres.py)
+        qs = filtrer_datasets(qs, params, lambda: etat_requete(self.request))
+
+        # RECHERCHE PLEIN TEXTE (index propre à la base, voir recherche.py)
+        recherche = params.get('recherche')
+        if recherche:
+            return rechercher(qs, recherche, extrait=self.extrait_demande())
+        return qs
+
+    @method_decorator(conditionnel_catalogue)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @method_decorator(conditionnel_catalogue)
+    def list(self, request, *args, **kwargs):
+        """Liste en JSON par la sérialisation rapide, mise en cache (même réponse que le serializer)"""
+        if not serialisation_rapide_active(request):
+            return super().list(request, *args, **kwargs)
+        return reponse_en_cache(request, self.lister_rapide)
+
+    def lister_rapide(self):
+        """Liste sérialisée depuis .values(), paginée si demandé"""
+        request = self.request
+        queryset = self.filter_queryset(self.get_queryset())
+        serialisation = SerialisationRapide(self.get_serializer())
+        page = self.paginator.paginer(queryset, request)
+        if page is None:
+            lignes, _ = serialisation.construire(queryset)
+            return serialisation.reponse(lignes)
+
+        lignes, brutes = serialisation.construire(page)
+        lignes = self.paginator.terminer(lignes, [(b['cle_publication'], b['pk']) for b in brutes])
+        return serialisation.reponse(self.paginator.get_paginated_response(lignes).data)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Export en flux de tous les datasets filtrés
+
+        ?sortie=ndjson (défaut) ou csv, ?gzip=1 pour un fichier compressé.
+        Accepte les mêmes filtres que la liste ainsi que fields/expand ;
+        les lignes sortent toujours par id croissant (lots sur la clé
+        primaire), recherche et ordering sont donc refusés.
+        """
+        sortie = request.query_params.get('sortie', 'ndjson')
+        if sortie not in SORTIES:
+            raise ValidationError({'sortie': [f"Valeurs possibles : {', '.join(SORTIES)}"]})
+        incompatibles = [p for p in PARAMETRES_ORDRE if request.query_params.get(p)]
+        if incompatibles:
+            raise ValidationError({
+                p: ["Incompatible avec l'export : lignes triées par id"] for p in incompatibles
+            })
+        type_contenu, extension = SORTIES[sortie]
+
+        serialisation = SerialisationRapide(self.get_serializer())
+        lots = lots_lignes(self.filter_queryset(self.get_queryset()), serialisation, self.taille_lot_export)
+        flux = flux_csv(lots, colonnes_csv(serialisation)) if sortie == 'csv' else flux_ndjson(lots)
+        nom_fichier = f"datasets.{extension}"
+        if request.query_params.get('gzip', '').lower() in ('1', 'true', 'oui'):
+            flux, type_contenu, nom_fichier = compresser(flux), 'application/gzip', f"{nom_fichier}.gz"
+
+        response = StreamingHttpResponse(flux, content_type=type_contenu)
+        response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
+        return response
+
+    @method_decorator(conditionnel_catalogue)
+    @action(detail=False, methods=['get'])
+    def facettes(self, request):
+        """Décomptes par facette des datasets filtrés (voir facettes.py)
+
+        Accepte les mêmes filtres que la liste, ainsi que :
+          - facettes -> facettes calculées, séparées par des virgules (toutes par défaut)
+          - limite   -> nombre de valeurs par facette (défaut 10, max 100) ; les mois sont tous renvoyés
+        """
+        facettes, limite = parametres_facettes(request.query_params)
+        queryset = self.filter_queryset(self.get_queryset())
+        # Clé liée à la version du catalogue, comme les listes
+        donnees = cache_datasets().get_or_set(
+            cle_reponse(request), lambda: calculer_facettes(queryset, facettes, limite)
+        )
+        return Response(donnees)
+
+    @method_decorator(conditionnel_catalogue)
+    @action(detail=False, methods=['get'])
+    def lot(self, request):
+        """Plusieurs datasets en une requête : ?ids=12,3,45 (DATASETS_LOT_MAX au plus)
+
+        Les datasets sont renvoyés dans l'ordre des ids demandés ; les ids
+        inconnus ou retirés sont ignorés. Accepte fields/expand.
+        """
+        ids = self.ids_demandes()
+        queryset = self.get_queryset().filter(pk__in=ids)
+        if serialisation_rapide_active(request):
+            serialisation = SerialisationRapide(self.get_serializer())
+            lignes, brutes = serialisation.construire(queryset)
+            par_id = {brute['pk']: ligne for ligne, brute in zip(lignes, brutes)}
+            return serialisation.reponse([par_id[pk] for pk in ids if pk in par_id])
+        par_id = {dataset.pk: dataset for dataset in queryset}
+        serializer = self.get_serializer([par_id[pk] for pk in ids if pk in par_id], many=True)
+        return Response(serializer.data)
+
+    def ids_demandes(self):
+        """Ids du paramètre ids, sans doublons, dans l'ordre"""
+        valeurs = liste_parametre(self.request.query_params.get('ids'))
+        if not valeurs:
+            raise ValidationError({'ids': ["Liste d'ids séparés par des virgules requise"]})
+        try:
+            ids = list(dict.fromkeys(int(v) for v in valeurs))
+        except ValueError:
+            raise ValidationError({'ids': ["Les ids doivent être des entiers"]})
+        if len(ids) > settings.DATASETS_LOT_MAX:
+            raise ValidationError({'ids': [f"{settings.DATASETS_LOT_MAX} ids au plus par requête"]})
+        return ids
+
+    def champs_demandes(self):
+        """Champs à renvoyer selon fields/expand, None pour la réponse complète"""
+        if hasattr(self, '_champs_demandes'):
+            return self._champs_demandes
         params = self.request.query_params
+        champs = None
+        if 'fields' in params or 'expand' in params:
+            champs_liste = liste_parametre(params.get('fields'))
+            expand = liste_parametre(params.get('expand'))
+            disponibles = DatasetSerializer.Meta.fields
+            erreurs = {}
+            inconnus = [c for c in champs_liste if c not in disponibles]
+            if inconnus:
+                erreurs['fields'] = [f"Champ inconnu : {c}" for c in inconnus]
+            inconnues = [r for r in expand if r not in RELATIONS]
+            if inconnues:
+                erreurs['expand'] = [f"Relation inconnue : {r}" for r in inconnues]
+            if erreurs:
+                raise ValidationError(erreurs)
+
+            if champs_liste:
+                champs = {'id', *champs_liste, *expand}
+            else:
+                champs = {c for c in disponibles if c not in RELATIONS} | set(expand)
+            if params.get('recherche'):
+                champs |= {'rang', 'extrait'}
+        self._champs_demandes = champs
+        return champs
+
+    def extrait_demande(self):
+        return self.request.query_params.get('extrait', '').lower() in ('1', 'true', 'oui')
+
+    def get_serializer_class(self):
+        if self.request.query_params.get('recherche'):
+            return DatasetRechercheSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['champs'] = self.champs_demandes()
+        if self.request.query_params.get('recherche') and self.extrait_demande():
+            context['termes_extrait'] = termes_recherche(self.request.query_params['recherche'])
+        return context
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def etat_cache(request):
+    """Compteurs hits/misses du cache des listes (processus courant) pour le dimensionner"""
+    return Response(statistiques_cache())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditionnel_catalogue
+def statistiques(request):
+    """Statistiques du catalogue lues dans les agrégats (recup_donnee.statistiques)
+
+    ?limite= : nombre d'affiliations et de mots-clés renvoyés (défaut 10, max 100).
+    """
+    return Response(lire_statistiques(limite_statistiques(request.query_params)))
+
+
+class SansNegociation(BaseContentNegotiation):
+    """Les fichiers d'instantanés sont servis quel que soit l'en-tête Accept"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class InstantaneVue(APIView):
+    """
+    Instantanés précalculés du catalogue complet (voir instantanes.py).
+
+      - instantanes/          -> manifeste (version, empreintes, tailles)
+      - instantanes/<sortie>/ -> fichier gzip json, ndjson ou csv de la dernière version
+      - ?version=N            -> fichier d'une version conservée, immuable
+    """
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = SansNegociation
+
+    def get(self, request, sortie=None):
+        # Dernier instantané construit, jamais reconstruit ici (voir instantanes.py)
+        manifeste = lire_manifeste()
+        if manifeste is None:
+            raise Http404("Aucun instantané construit : lancer construire_instantanes")
+        if sortie is None:
+            return Response(manifeste)
+        if sortie not in FORMATS:
+            raise Http404
+
+        version = request.query_params.get('version')
+        immuable = version is not None
+        if immuable and version != str(manifeste['version']):
+            manifeste = {**manifeste, 'dossier': f"v{version}"}
+            chemin = chemin_fichier(manifeste, sortie)
+            if not version.isdigit() or not os.path.exists(chemin):
+                raise Http404
+            etag = quote_etag(f"v{version}-{sortie}")
+            derniere_modif = None
+        else:
+            chemin = chemin_fichier(manifeste, sortie)
+            etag = quote_etag(manifeste['fichiers'][sortie]['sha256'])
+            derniere_modif = parse_datetime(manifeste['cree_le']).timestamp()
 
-        # 1. MOTS-CLÉS (keywords)
-        mots_cles = params.get('mots_cles') or params.get('keywords')
-        if mots_cles:
-            terms = [t.strip() for t in mots_cles.split(',') if t.strip()]
-            q = Q()
-            for t in terms:
-                q |= Q(keywords__icontains=t) | Q(name_of_dataverse__icontains=t) | Q(description__icontains=t)
-            qs = qs.filter(q)
-
-        # 2. ORGANISATIONS (authors)
-        organisations = params.get('organisations')
-        if organisations:
-            terms = [t.strip() for t in organisations.split(',') if t.strip()]
-            q = Q()
-            for t in terms:
-                q |= Q(authors__icontains=t)
-            qs = qs.filter(q)
-
-        # 3. LOCALISATIONS (subjects)
-        localisations = params.get('localisations')
-        if localisations:
-            terms = [t.strip() for t in localisations.split(',') if t.strip()]
-            q = Q()
-            for t in terms:
-                q |= Q(subjects__icontains=t)
-            qs = qs.filter(q)
-
-        # 4. CATALOGUE (subjects - filtre par catalogue)
-        catalogue = params.get('catalogue')
-        if catalogue:
-            # Mapper les valeurs frontend aux termes dans la base
-            catalogue_mapping = {
-                'fleuve-saint-laurent': ['saint-laurent', 'saint laurent', 'st-laurent', 'st laurent', 'fleuve'],
-                'ocean-atlantique': ['atlantique', 'atlantic'],
-                'grands-lacs': ['grands lacs', 'great lakes', 'lacs'],
-                'arctique': ['arctique', 'arctic', 'nord'],
-            }
-            
-            search_terms = catalogue_mapping.get(catalogue, [catalogue])
-            q = Q()
-            for term in search_terms:
-                q |= Q(subjects__icontains=term) | Q(keywords__icontains=term) | Q(description__icontains=term)
-            qs = qs.filter(q)
-
-        # 5. THÉMATIQUE (subjects - filtre par thématique)
-        thematique = params.get('thematique')
-        if thematique:
-            # Mapper les valeurs frontend aux termes dans la base
-            thematique_mapping = {
-                'environnement': ['environnement', 'environment', 'écologie', 'ecology'],
-                'biologie': ['biologie', 'biology', 'biodiversité', 'biodiversity'],
-                'climat': ['climat', 'climate', 'météo', 'weather'],
-                'oceanographie': ['océanographie', 'oceanography', 'océan', 'ocean'],
-                'chimie': ['chimie', 'chemistry', 'chimique', 'chemical'],
-            }
-            
-            search_terms = thematique_mapping.get(thematique, [thematique])
-            q = Q()
-            for term in search_terms:
-                q |= Q(subjects__icontains=term) | Q(keywords__icontains=term) | Q(description__icontains=term)
-            qs = qs.filter(q)
-
-        # 6. PRODUCTEUR (authors - producteur de données)
-        producteur = params.get('producteur')
-        if producteur:
-            qs = qs.filter(Q(authors__icontains=producteur))
-
-        # 7. DATE DÉBUT (filtre sur date_info__published_at)
-        date_debut = params.get('date_debut')
-        if date_debut:
-            try:
-                # Convertir la date string en objet date
-                date_debut_obj = datetime.strptime(date_debut, '%Y-%m-%d').date()
-                # Filtrer les datasets dont la date de publication >= date_debut
-                qs = qs.filter(date_info__published_at__gte=date_debut_obj)
-            except (ValueError, TypeError):
-                pass  # Ignorer si le format de date est invalide
-
-        # 8. DATE FIN (filtre sur date_info__published_at)
-        date_fin = params.get('date_fin')
-        if date_fin:
-            try:
-                # Convertir la date string en objet date
-                date_fin_obj = datetime.strptime(date_fin, '%Y-%m-%d').date()
-                # Filtrer les datasets dont la date de publication <= date_fin
-                qs = qs.filter(date_info__published_at__lte=date_fin_obj)
-            except (ValueError, TypeError):
-                pass  # Ignorer si le format de date est invalide
-
-        return qs.distinct()
\ No newline at end of file
+        response = get_conditional_response(request, etag=etag, last_modified=derniere_modif)
+        if response is None:
+            # Servie par le processus WSGI (Procfile : web) : FileResponse passe par
+            # wsgi.file_wrapper, envoyé par sendfile sous gunicorn. Sous ASGI, le
+            # fichier serait lu en entier en mémoire (pas de route /api/async/)
+            response = FileResponse(
+                open(chemin, 'rb'), as_attachment=True, content_type='application/gzip',
+                filename=f"datasets-v{version or manifeste['version']}.{sortie}.gz",
+            )
+            response['ETag'] = etag
+            if derniere_modif:
+                response['Last-Modified'] = http_date(derniere_modif)
+        if immuable:
+            patch_cache_control(response, private=True, max_age=31536000, immutable=True)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
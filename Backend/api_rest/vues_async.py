@@ -0,0 +1,130 @@
+# api_rest/vues_async.py
+"""
+Vues async des lectures de datasets (liste, détail, facettes, statistiques).
+
+Mêmes paramètres et mêmes réponses que les endpoints de views.py : les
+filtres, les champs (fields/expand), le tri et la pagination sont construits
+par DatasetViewSet, seules les requêtes SQL passent par l'ORM asynchrone
+(async for, acount, afirst). Servies par un serveur ASGI
+(gestion_donnee.asgi), elles n'occupent pas un worker pendant l'attente de
+la base : un processus garde des centaines de requêtes en vol.
+
+Authentification par jeton (Authorization: Token <clé>), comme l'API DRF.
+"""
+from functools import wraps
+
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from recup_donnee.cache_reponses import areponse_en_cache, cache_datasets, cle_reponse
+from recup_donnee.catalogue import conditionnel_catalogue
+from recup_donnee.models import Dataset
+from recup_donnee.serialisation import SerialisationRapide
+from recup_donnee.statistiques import alire_statistiques
+
+from .facettes import acalculer_facettes
+from .views import DatasetViewSet, limite_statistiques, parametres_facettes
+
+
+def reponse_json(donnees, status=200):
+    """JSON identique à une Response DRF"""
+    return HttpResponse(JSONRenderer().render(donnees), content_type='application/json', status=status)
+
+
+async def authentifier(request):
+    """TokenAuthentication par l'ORM asynchrone"""
+    entete = request.headers.get('Authorization', '').split()
+    if not entete or entete[0].lower() != 'token':
+        raise NotAuthenticated()
+    if len(entete) != 2:
+        raise AuthenticationFailed("En-tête Authorization invalide.")
+    jeton = await Token.objects.select_related('user').filter(key=entete[1]).afirst()
+    if jeton is None or not jeton.user.is_active:
+        raise AuthenticationFailed("Jeton invalide.")
+    return jeton.user
+
+
+def vue_async(vue):
+    """GET/HEAD authentifiés, erreurs DRF rendues comme le ferait APIView"""
+    @require_safe
+    @wraps(vue)
+    async def envelopper(request, *args, **kwargs):
+        try:
+            request.user = await authentifier(request)
+            return await vue(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = reponse_json(detail, status=exc.status_code)
+            if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                response['WWW-Authenticate'] = 'Token'
+            return response
+    return envelopper
+
+
+def viewset(request, action):
+    """DatasetViewSet initialisé sur la requête, sans dispatch : construit requêtes et serializers
+
+    La version du catalogue est déjà chargée (conditionnel_catalogue) :
+    les filtres qui la lisent ne font pas de requête synchrone.
+    """
+    vue = DatasetViewSet(action=action, args=(), kwargs={}, format_kwarg=None)
+    vue.request = Request(request)
+    return vue
+
+
+@vue_async
+@conditionnel_catalogue
+async def liste_datasets(request):
+    """Liste filtrée, éventuellement paginée (mêmes paramètres que /api/donnees/datasets/)"""
+    vue = viewset(request, 'list')
+
+    async def lister():
+        queryset = vue.filter_queryset(vue.get_queryset())
+        serialisation = SerialisationRapide(vue.get_serializer())
+        page = vue.paginator.paginer(queryset, vue.request)
+        if page is None:
+            lignes, _ = await serialisation.aconstruire(queryset)
+            return serialisation.reponse(lignes)
+
+        lignes, brutes = await serialisation.aconstruire(page)
+        lignes = vue.paginator.terminer(lignes, [(b['cle_publication'], b['pk']) for b in brutes])
+        return serialisation.reponse(vue.paginator.get_paginated_response(lignes).data)
+
+    return await areponse_en_cache(request, lister)
+
+
+@vue_async
+@conditionnel_catalogue
+async def detail_dataset(request, pk):
+    vue = viewset(request, 'retrieve')
+    serialisation = SerialisationRapide(vue.get_serializer())
+    lignes, _ = await serialisation.aconstruire(vue.filter_queryset(vue.get_queryset()).filter(pk=pk))
+    if not lignes:
+        # Message de get_object_or_404, comme DatasetViewSet.retrieve
+        raise NotFound(f"No {Dataset._meta.object_name} matches the given query.")
+    return serialisation.reponse(lignes[0])
+
+
+@vue_async
+@conditionnel_catalogue
+async def facettes_datasets(request):
+    """Décomptes par facette (mêmes paramètres que l'action facettes/)"""
+    vue = viewset(request, 'facettes')
+    facettes, limite = parametres_facettes(vue.request.query_params)
+    cache = cache_datasets()
+    cle = cle_reponse(request)
+    donnees = await cache.aget(cle)
+    if donnees is None:
+        donnees = await acalculer_facettes(vue.filter_queryset(vue.get_queryset()), facettes, limite)
+        await cache.aset(cle, donnees)
+    return reponse_json(donnees)
+
+
+@vue_async
+@conditionnel_catalogue
+async def statistiques(request):
+    return reponse_json(await alire_statistiques(limite_statistiques(request.GET)))
@@ -8,6 +8,7 @@ from django.conf import settings
 
 API_BASE_URL = "http://127.0.0.1:8000/api/donnees/datasets/"  
 GRAPHQL_URL = "http://127.0.0.1:8000/api/graphql/"
+CHAMPS_FILTRES = 'id,name_of_dataverse,description,identifier_of_dataverse,url,authors,subjects'
 
 def home(request):
     if request.method == 'POST':
@@ -79,7 +80,8 @@ def filtres_donnees(request):
         organisations = request.POST.get('organisations', '')
         authors = request.POST.get('authors', '')
 
-        params = {}
+        # Seuls les champs affichés sont demandés à l'API (authors et subjects inclus)
+        params = {'fields': CHAMPS_FILTRES}
         if mots_cles:
             params['mots_cles'] = mots_cles
         if organisations:
@@ -99,43 +101,6 @@ def filtres_donnees(request):
             messages.error(request, f"Erreur de connexion REST : {e}")
             resultats = []
 
-        if resultats:
-            try:
-                query = """
-                {
-                  allDatasets {
-                    id
-                    nameOfDataverse
-                    authors
-                    subjects
-                    url
-                  }
-                }
-                """
-
-                gql_headers = {
-                    'Authorization': f'Token {token}',
-                    'Content-Type': 'application/json'
-                }
-
-                gql_resp = requests.post(GRAPHQL_URL, json={'query': query}, headers=gql_headers, timeout=15)
-
-                if gql_resp.status_code == 200:
-                    gql_data = gql_resp.json().get('data', {}).get('allDatasets', [])
-                    gql_index = {d['id']: d for d in gql_data}
-
-                    for r in resultats:
-                        gql_item = gql_index.get(r.get('id'))
-                        if gql_item:
-                            r.update({
-                                'authors': gql_item.get('authors'),
-                                'subjects': gql_item.get('subjects')
-                            })
-                else:
-                    messages.warning(request, "Impossible de contacter GraphQL, affichage REST uniquement.")
-            except Exception as e:
-                messages.warning(request, f"Erreur GraphQL : {e}")
-
     return render(request, 'frontend/filtres.html', {
         'resultats': resultats,
         'username': username,
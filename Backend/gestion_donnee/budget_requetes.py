@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class BudgetRequetesDepasse(AssertionError):
+    """Un bloc a exécuté plus de requêtes SQL que son budget"""
+
+
+@contextmanager
+def budget_requetes(maximum, using=DEFAULT_DB_ALIAS):
+    """Échoue si le bloc exécute plus de `maximum` requêtes SQL
+
+    Contrairement à assertNumQueries, le budget est un plafond : un
+    endpoint peut descendre en dessous sans casser le test.
+
+        with budget_requetes(3):
+            client.get('/api/donnees/datasets/')
+    """
+    with CaptureQueriesContext(connections[using]) as contexte:
+        yield contexte
+    executees = len(contexte.captured_queries)
+    if executees > maximum:
+        detail = '\n'.join(
+            f"{i}. {requete['sql']}" for i, requete in enumerate(contexte.captured_queries, start=1)
+        )
+        raise BudgetRequetesDepasse(
+            f"{executees} requêtes exécutées pour un budget de {maximum} :\n{detail}"
+        )
@@ -33,10 +33,19 @@ if os.environ.get("RENDER"):  # En production sur Render
     DATABASES = {
         "default": dj_database_url.parse(
             os.environ.get("DATABASE_URL"),
-            conn_max_age=600,
+            # Sous ASGI chaque requête a son thread : une connexion persistante
+            # par thread s'accumulerait. Les connexions sont réutilisées par le
+            # pool de psycopg 3 (incompatible avec CONN_MAX_AGE), pour les vues
+            # sync comme async (voir README, lecture async)
+            conn_max_age=0,
             ssl_require=True
         )
     }
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.environ.get("DB_POOL_MIN", 2)),
+        "max_size": int(os.environ.get("DB_POOL_MAX", 10)),
+        "timeout": int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+    }
 else:  # En local, tu gardes MySQL
     DATABASES = {
         "default": {
@@ -173,9 +182,69 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
 }
+# Sources récoltées en parallèle par le moissonneur (une par source active, au plus)
+MOISSONNAGE_WORKERS_MAX = int(os.environ.get("MOISSONNAGE_WORKERS_MAX", 16))
+# Pagination par curseur de /api/donnees/datasets/ (activée par ?page_size= ou ?cursor=)
+DATASETS_PAGINATION = {
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 500,
+}
+# Nombre maximal d'ids par requête groupée (datasets/lot/ et datasetsByIds)
+DATASETS_LOT_MAX = int(os.environ.get("DATASETS_LOT_MAX", 100))
+# Cache des réponses de listes de datasets (recup_donnee.cache_reponses).
+# LocMemCache évince les entrées les moins récemment utilisées au-delà de
+# MAX_ENTRIES ; tout autre backend Django (fichiers, Redis...) convient.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "datasets": {
+        "BACKEND": os.environ.get("DATASETS_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("DATASETS_CACHE_LOCATION", "datasets"),
+        "TIMEOUT": int(os.environ.get("DATASETS_CACHE_TIMEOUT", 300)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("DATASETS_CACHE_MAX_ENTRIES", 100)),
+        },
+    },
+}
+# Les réponses plus lourdes ne sont pas mises en cache (octets)
+DATASETS_CACHE_TAILLE_MAX = int(os.environ.get("DATASETS_CACHE_TAILLE_MAX", 8 * 1024 * 1024))
+
+# Instantanés du catalogue reconstruits après chaque moisson (api_rest.instantanes).
+# Doit pointer vers un disque partagé entre le worker et le serveur web.
+INSTANTANES_DIR = os.environ.get("INSTANTANES_DIR", os.path.join(BASE_DIR, "instantanes"))
+INSTANTANES_CONSERVES = 3
+
+# Listes de datasets sérialisées depuis .values() (recup_donnee.serialisation)
+DATASETS_SERIALISATION_RAPIDE = True
 GRAPHENE = {
     "SCHEMA": "api_graphql.schema.schema"
 }
+# Documents GraphQL analysés et validés gardés en mémoire par processus (api_graphql.views)
+GRAPHQL_DOCUMENTS_MAX = int(os.environ.get("GRAPHQL_DOCUMENTS_MAX", 256))
+# Coût d'un document GraphQL estimé avant exécution (api_graphql.cout).
+# Champs désignés par 'Type.champ' ; limite à None : pas de limite.
+GRAPHQL_COUT = {
+    # Poids par élément : 1 par objet lu et 0 par scalaire si absent
+    'POIDS': {
+        'DatasetConnection.totalCount': 50,
+    },
+    # Taille supposée des listes sans argument first ni ids
+    'TAILLES': {
+        'Query.allDatasets': int(os.environ.get("GRAPHQL_TAILLE_CATALOGUE", 1000)),
+        'Query.allHarvests': 20,
+        'DatasetType.contacts': 5,
+        'DatasetType.publications': 5,
+    },
+    'TAILLE_LISTE': 20,
+    'LIMITES': {
+        'anonyme': {'profondeur': 8, 'cout': 100_000},
+        'utilisateur': {'profondeur': 12, 'cout': 500_000},
+        'staff': {'profondeur': None, 'cout': None},
+    },
+    # Limites propres à un compte (et donc à son jeton), par nom d'utilisateur
+    'UTILISATEURS': {},
+}
 
 
 JAZZMIN_SETTINGS = {
@@ -25,6 +25,7 @@ urlpatterns = [
     path('api/users/', include('users.urls')),
     path('api/datasets/', include('recup_donnee.urls')),
     path('api/donnees/', include('api_rest.urls')),
+    path('api/async/', include('api_rest.urls_async')),
 
     path('', include('frontend.urls')),
 
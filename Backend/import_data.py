@@ -9,7 +9,7 @@ from recup_donnee.services.MesServices import ImportateurDatasets
 
 try:
     importateur = ImportateurDatasets()
-    resultats = importateur.importer_donnees("fleuve-saint-laurent")
+    resultats = importateur.moissonner_incremental("fleuve-saint-laurent")
     print("✅ Données importées avec succès :", resultats)
 except Exception as e:
     print("⚠️ Erreur pendant l'importation :", e)
@@ -2,11 +2,33 @@
 from django.contrib import admin
 from django.urls import path
 from django.shortcuts import render
-from .models import Dataset, Contact, Publication, DateInfo, HarvestConfig
+from .models import Dataset, Contact, Publication, DateInfo, HarvestConfig, HarvestRun, Keyword, Subject, Author, Tag
+from .cache_reponses import statistiques_cache
+from .signals import catalogue_edite
+from .statistiques import lire_statistiques
+
+
+class CatalogueAdmin(admin.ModelAdmin):
+    """Signale chaque modification du catalogue (instantanés à reconstruire)"""
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        catalogue_edite.send(sender=self.model)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        catalogue_edite.send(sender=self.model)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        catalogue_edite.send(sender=self.model)
+
 
 @admin.register(Dataset)  # Unique enregistrement ici
-class DatasetAdmin(admin.ModelAdmin):
-    list_display = ('name_of_dataverse', 'identifier_of_dataverse')
+class DatasetAdmin(CatalogueAdmin):
+    list_display = ('name_of_dataverse', 'identifier_of_dataverse', 'global_id', 'removed_at')
+    list_filter = ('source', 'tags')
+    autocomplete_fields = ('keyword_terms', 'subject_terms', 'author_terms', 'tags')
 
     def get_urls(self):
         urls = super().get_urls()
@@ -16,18 +38,43 @@ class DatasetAdmin(admin.ModelAdmin):
         return custom_urls + urls
 
     def stats_view(self, request):
-        total_datasets = Dataset.objects.count()
-        total_contacts = Contact.objects.count()
-        total_publications = Publication.objects.count()
+        statistiques = lire_statistiques()
+        totaux = statistiques['totaux']
         context = dict(
             self.admin_site.each_context(request),
-            total_datasets=total_datasets,
-            total_contacts=total_contacts,
-            total_publications=total_publications,
+            total_datasets=totaux['datasets'],
+            total_contacts=totaux['contacts'],
+            total_publications=totaux['publications'],
+            statistiques=statistiques,
+            cache=statistiques_cache(),
         )
         return render(request, "admin/stats.html", context)
 
 # On enregistre tous les autres modèles 
-admin.site.register(Contact)
-admin.site.register(Publication)
-admin.site.register(DateInfo)
+admin.site.register(Contact, CatalogueAdmin)
+admin.site.register(Publication, CatalogueAdmin)
+admin.site.register(DateInfo, CatalogueAdmin)
+
+
+@admin.register(HarvestConfig)
+class HarvestConfigAdmin(admin.ModelAdmin):
+    list_display = ('source_url', 'frequency', 'active', 'last_run_at', 'locked_by')
+
+
+@admin.register(HarvestRun)
+class HarvestRunAdmin(admin.ModelAdmin):
+    list_display = ('config', 'status', 'started_at', 'duration', 'inserted', 'updated', 'unchanged', 'removed')
+    list_filter = ('status', 'config')
+
+
+@admin.register(Keyword, Subject, Author)
+class TermeAdmin(admin.ModelAdmin):
+    list_display = ('name', 'normalized')
+    search_fields = ('name', 'normalized')
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'slug')
+    list_filter = ('kind',)
+    search_fields = ('slug',)
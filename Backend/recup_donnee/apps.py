@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApiAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recup_donnee'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,134 @@
+"""
+Cache des réponses JSON des listes de datasets.
+
+La clé combine la version du catalogue (catalogue.py), l'hôte, le chemin et
+les paramètres normalisés : toute écriture sur le catalogue rend les
+entrées précédentes inatteignables, y compris dans les autres processus,
+et elles finissent évincées (LRU / TIMEOUT du cache 'datasets').
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .catalogue import aetat_requete, etat_requete
+from .termes import normaliser_terme
+
+ALIAS = 'datasets'
+
+# Filtres en OU comparés par q_terme sur la forme normalisée des termes
+PARAMETRES_TERMES = {'organisations', 'localisations'}
+# Filtres de api_rest.filtres sans effet quand ils sont vides
+PARAMETRES_FILTRES = {'catalogue', 'thematique', 'date_debut', 'date_fin'}
+# Listes lues comme des ensembles (champs_demandes), significatives même vides
+PARAMETRES_ENSEMBLES = {'fields', 'expand'}
+
+compteurs = {'hits': 0, 'misses': 0, 'ignores': 0}
+verrou = threading.Lock()
+
+
+def compter(nom):
+    with verrou:
+        compteurs[nom] += 1
+
+
+def cache_datasets():
+    return caches[ALIAS]
+
+
+def termes(valeur):
+    return [t.strip() for t in valeur.split(',') if t.strip()]
+
+
+def normaliser_parametres(params):
+    """Paramètres ramenés aux valeurs que la vue lit réellement
+
+    Comme la vue, seule la dernière valeur d'un paramètre compte
+    (QueryDict.get). Seules les équivalences que le SQL applique lui-même
+    sont faites : ordre et doublons des filtres en OU, forme normalisée pour
+    les termes comparés par q_terme. mots_cles garde la casse et les accents
+    (icontains sur le nom et la description) ; producteur est un seul terme.
+    """
+    normalises = {}
+    mots_cles = params.get('mots_cles') or params.get('keywords')
+    if mots_cles:
+        normalises['mots_cles'] = sorted(set(termes(mots_cles)))
+    for nom in params:
+        valeur = params.get(nom)
+        if nom in ('mots_cles', 'keywords'):
+            continue
+        if nom in PARAMETRES_TERMES or nom in PARAMETRES_FILTRES or nom == 'producteur':
+            if not valeur:
+                continue
+            if nom in PARAMETRES_TERMES:
+                valeur = sorted({normaliser_terme(t) for t in termes(valeur)})
+            elif nom == 'producteur':
+                valeur = normaliser_terme(valeur)
+        elif nom in PARAMETRES_ENSEMBLES:
+            valeur = sorted(set(termes(valeur)))
+        normalises[nom] = valeur
+    return sorted(normalises.items())
+
+
+def cle_reponse(request):
+    """Clé de cache d'une requête de liste (version du catalogue incluse)"""
+    parametres = normaliser_parametres(request.GET)
+    representation = f"{request.get_host()}|{request.path}|{parametres!r}"
+    empreinte = hashlib.sha256(representation.encode()).hexdigest()
+    return f"reponse:{etat_requete(request).version}:{empreinte}"
+
+
+def reponse_en_cache(request, produire):
+    """Sert la réponse depuis le cache, sinon l'obtient de produire() et la stocke"""
+    cache = cache_datasets()
+    cle = cle_reponse(request)
+    en_cache = cache.get(cle)
+    if en_cache is not None:
+        compter('hits')
+        contenu, type_contenu = en_cache
+        return HttpResponse(contenu, content_type=type_contenu)
+
+    compter('misses')
+    response = produire()
+    if response.status_code == 200 and not response.streaming:
+        if len(response.content) <= settings.DATASETS_CACHE_TAILLE_MAX:
+            cache.set(cle, (response.content, response['Content-Type']))
+        else:
+            compter('ignores')
+    return response
+
+
+async def areponse_en_cache(request, produire):
+    """reponse_en_cache() pour les vues async : produire est une coroutine"""
+    await aetat_requete(request)
+    cache = cache_datasets()
+    cle = cle_reponse(request)
+    en_cache = await cache.aget(cle)
+    if en_cache is not None:
+        compter('hits')
+        contenu, type_contenu = en_cache
+        return HttpResponse(contenu, content_type=type_contenu)
+
+    compter('misses')
+    response = await produire()
+    if response.status_code == 200 and not response.streaming:
+        if len(response.content) <= settings.DATASETS_CACHE_TAILLE_MAX:
+            await cache.aset(cle, (response.content, response['Content-Type']))
+        else:
+            compter('ignores')
+    return response
+
+
+def statistiques_cache():
+    with verrou:
+        stats = dict(compteurs)
+    total = stats['hits'] + stats['misses']
+    stats['taux_hits'] = round(stats['hits'] / total, 3) if total else None
+    cache = cache_datasets()
+    # Nombre d'entrées connu pour LocMemCache seulement
+    stats['entrees'] = len(cache._cache) if hasattr(cache, '_cache') else None
+    stats['entrees_max'] = getattr(cache, '_max_entries', None)
+    stats['timeout'] = cache.default_timeout
+    return stats
@@ -0,0 +1,124 @@
+"""
+Version du catalogue : un compteur incrémenté à chaque écriture sur
+Dataset, Contact, Publication, DateInfo (et les configurations de
+moissonnage exposées par GraphQL). Les endpoints de lecture en tirent
+ETag et Last-Modified, et répondent 304 sans interroger les datasets.
+"""
+import hashlib
+import weakref
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import CatalogVersion
+
+
+def etat_catalogue():
+    """Ligne de version courante (créée au premier appel)"""
+    etat, _ = CatalogVersion.objects.get_or_create(pk=1)
+    return etat
+
+
+def incrementer_version():
+    maintenant = timezone.now()
+    if not CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=maintenant):
+        etat_catalogue()
+        CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=maintenant)
+
+
+def une_fois_apres_commit(fonction):
+    """Exécute fonction après le commit, une seule fois par transaction
+
+    La connexion garde une référence faible vers le callback en attente :
+    exécuté au commit ou abandonné par un rollback (de la transaction ou du
+    savepoint qui l'a enregistré), il disparaît et la marque avec lui.
+    """
+    connexion = transaction.get_connection()
+    if not connexion.in_atomic_block:
+        fonction()
+        return
+    en_attente = getattr(connexion, '_callbacks_uniques', None)
+    if en_attente is None:
+        en_attente = connexion._callbacks_uniques = weakref.WeakValueDictionary()
+    if en_attente.get(fonction) is not None:
+        return
+
+    def executer():
+        fonction()
+    en_attente[fonction] = executer
+    transaction.on_commit(executer)
+
+
+def catalogue_modifie(**kwargs):
+    """Incrémente la version, une seule fois par transaction, après le commit
+
+    Utilisable comme receiver de signal ou appelée directement par les
+    écritures en masse (bulk_create, update, suppressions SQL) qui
+    n'émettent pas de signaux.
+    """
+    une_fois_apres_commit(incrementer_version)
+
+
+def etat_requete(request):
+    """Version lue une seule fois par requête"""
+    if not hasattr(request, '_etat_catalogue'):
+        request._etat_catalogue = etat_catalogue()
+    return request._etat_catalogue
+
+
+async def aetat_requete(request):
+    """etat_requete() par l'ORM asynchrone, pour les vues async"""
+    if not hasattr(request, '_etat_catalogue'):
+        request._etat_catalogue, _ = await CatalogVersion.objects.aget_or_create(pk=1)
+    return request._etat_catalogue
+
+
+def etag_catalogue(request, *args, **kwargs):
+    """ETag fort : version du catalogue + représentation demandée (URL, Accept)"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    representation = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    empreinte = hashlib.sha1(representation.encode()).hexdigest()[:12]
+    return f"{etat_requete(request).version}-{empreinte}"
+
+
+def derniere_modification(request, *args, **kwargs):
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return etat_requete(request).updated_at
+
+
+def conditionnel_catalogue(vue):
+    """Décorateur de vue : ETag / Last-Modified et 304 sur If-None-Match / If-Modified-Since
+
+    no-cache oblige le navigateur à revalider à chaque fois au lieu de
+    garder la réponse par heuristique après une moisson.
+
+    Accepte aussi les vues async : la version est alors lue par l'ORM
+    asynchrone avant d'évaluer les conditions.
+    """
+    vue_conditionnelle = condition(etag_func=etag_catalogue, last_modified_func=derniere_modification)(vue)
+
+    if iscoroutinefunction(vue):
+        @wraps(vue)
+        async def envelopper_async(request, *args, **kwargs):
+            await aetat_requete(request)
+            response = await vue_conditionnelle(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return envelopper_async
+
+    @wraps(vue)
+    def envelopper(request, *args, **kwargs):
+        response = vue_conditionnelle(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return envelopper
@@ -0,0 +1,143 @@
+"""
+Classement des datasets par catalogue et par thématique.
+
+Chaque valeur de filtre du frontend (catalogue=arctique,
+thematique=climat...) correspond à une liste de termes cherchés dans les
+sujets, mots-clés et description. Le classement est calculé une fois à
+l'import et stocké dans Dataset.tags : les filtres de l'API deviennent une
+égalité sur la table des tags au lieu de dizaines de icontains.
+
+Après une modification de ces tables, `manage.py reclasser_datasets`
+reclasse tout le catalogue ; tant que ce n'est pas fait, la signature
+enregistrée diffère et l'API revient à la recherche par sous-chaînes.
+"""
+import hashlib
+import json
+
+from django.db import transaction
+
+from .catalogue import catalogue_modifie, etat_catalogue
+from .models import CatalogVersion, Dataset, Tag
+
+CATALOGUES = {
+    'fleuve-saint-laurent': ['saint-laurent', 'saint laurent', 'st-laurent', 'st laurent', 'fleuve'],
+    'ocean-atlantique': ['atlantique', 'atlantic'],
+    'grands-lacs': ['grands lacs', 'great lakes', 'lacs'],
+    'arctique': ['arctique', 'arctic', 'nord'],
+}
+
+THEMATIQUES = {
+    'environnement': ['environnement', 'environment', 'écologie', 'ecology'],
+    'biologie': ['biologie', 'biology', 'biodiversité', 'biodiversity'],
+    'climat': ['climat', 'climate', 'météo', 'weather'],
+    'oceanographie': ['océanographie', 'oceanography', 'océan', 'ocean'],
+    'chimie': ['chimie', 'chemistry', 'chimique', 'chemical'],
+}
+
+CLASSIFICATIONS = {
+    Tag.CATALOGUE: CATALOGUES,
+    Tag.THEMATIQUE: THEMATIQUES,
+}
+
+# Colonnes de Dataset dans lesquelles les termes sont cherchés
+CHAMPS_CLASSES = ('subjects', 'keywords', 'description')
+
+TAILLE_LOT = 1000
+
+
+def signature_classification():
+    """Empreinte des tables de classement, enregistrée après un reclassement complet"""
+    contenu = json.dumps([CLASSIFICATIONS, CHAMPS_CLASSES], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+def classification_a_jour(etat=None):
+    """Vrai si les tags en base correspondent aux tables de classement actuelles"""
+    etat = etat or etat_catalogue()
+    return etat.classification == signature_classification()
+
+
+def classer(champs):
+    """Tags (kind, slug) d'un dataset à partir de ses colonnes textuelles
+
+    Même règle que l'ancien filtre icontains : un terme présent dans l'un
+    des champs, sans tenir compte de la casse.
+    """
+    textes = [(champs.get(nom) or '').lower() for nom in CHAMPS_CLASSES]
+    return [
+        (kind, slug)
+        for kind, table in CLASSIFICATIONS.items()
+        for slug, termes in table.items()
+        if any(terme.lower() in texte for terme in termes for texte in textes)
+    ]
+
+
+def tags_connus():
+    """Identifiants des tags des tables de classement, créés au besoin"""
+    ids = {(kind, slug): pk for pk, kind, slug in Tag.objects.values_list('id', 'kind', 'slug')}
+    manquants = [
+        Tag(kind=kind, slug=slug)
+        for kind, table in CLASSIFICATIONS.items()
+        for slug in table
+        if (kind, slug) not in ids
+    ]
+    if manquants:
+        # ignore_conflicts : un autre processus peut créer le même tag
+        Tag.objects.bulk_create(manquants, ignore_conflicts=True)
+        ids = {(kind, slug): pk for pk, kind, slug in Tag.objects.values_list('id', 'kind', 'slug')}
+    return ids
+
+
+def lier_tags(classements, ids=None):
+    """Relie des datasets à leurs tags ; classements : [(dataset_id, [(kind, slug)])]"""
+    if not any(tags for _, tags in classements):
+        return 0
+    ids = ids or tags_connus()
+    Lien = Dataset.tags.through
+    liens = [
+        Lien(dataset_id=dataset_id, tag_id=ids[tag])
+        for dataset_id, tags in classements
+        for tag in tags
+    ]
+    Lien.objects.bulk_create(liens, ignore_conflicts=True)
+    return len(liens)
+
+
+def reclasser_catalogue(taille_lot=TAILLE_LOT):
+    """Recalcule les tags de tous les datasets (retirés compris) en une transaction
+
+    Retourne le nombre de liens créés.
+    """
+    signature = signature_classification()
+    with transaction.atomic():
+        Dataset.tags.through.objects.all().delete()
+        # Les valeurs retirées des tables disparaissent avec leurs liens
+        Tag.objects.exclude(pk__in=[
+            pk for tag, pk in tags_connus().items() if tag[1] in CLASSIFICATIONS[tag[0]]
+        ]).delete()
+        ids = tags_connus()
+
+        liens = 0
+        lignes = Dataset.objects.order_by('id').values('id', *CHAMPS_CLASSES)
+        dernier = 0
+        while True:
+            lot = list(lignes.filter(id__gt=dernier)[:taille_lot])
+            if not lot:
+                break
+            liens += lier_tags([(ligne['id'], classer(ligne)) for ligne in lot], ids)
+            dernier = lot[-1]['id']
+
+        etat_catalogue()
+        CatalogVersion.objects.filter(pk=1).update(classification=signature)
+        # bulk_create et delete du through n'émettent pas m2m_changed
+        catalogue_modifie()
+    return liens
+
+
+def reclasser_si_necessaire():
+    """Reclasse le catalogue si les tables de classement ont changé depuis le dernier passage"""
+    if classification_a_jour():
+        return None
+    liens = reclasser_catalogue()
+    print(f"Catalogue reclassé : {liens} tags attribués")
+    return liens
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recup_donnee.services.MesServices import ImportateurDatasets, ErreurMoissonnage
+from recup_donnee.services.enregistrement import SessionEnregistreuse, SessionRejeu, gonfler_enregistrement
+
+
+class Command(BaseCommand):
+    help = (
+        "Enregistre les pages de l'API de recherche (JSONL gzip), les rejoue sans réseau "
+        "dans l'importateur, ou gonfle un enregistrement à une taille donnée"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['enregistrer', 'rejouer', 'gonfler'])
+        parser.add_argument('fichier', help="Enregistrement .jsonl.gz (source pour gonfler)")
+        parser.add_argument('destination', nargs='?', help="Fichier produit par gonfler")
+        parser.add_argument('--recherche', default='fleuve-saint-laurent')
+        parser.add_argument('--taille', type=int, help="Nombre d'items à produire (gonfler)")
+        parser.add_argument('--per-page', type=int, default=1000)
+        parser.add_argument('--mode', choices=['incremental', 'masse'], default='incremental',
+                            help="Chemin d'import utilisé par rejouer (défaut : incremental)")
+        parser.add_argument('--taille-lot', type=int, default=200)
+
+    def handle(self, *args, **options):
+        getattr(self, options['action'])(options)
+
+    def enregistrer(self, options):
+        with SessionEnregistreuse(options['fichier']) as session:
+            importateur = ImportateurDatasets(per_page=options['per_page'], session=session)
+            pages = 0
+            try:
+                for _ in importateur.parcourir_pages(options['recherche']):
+                    pages += 1
+            except ErreurMoissonnage as e:
+                raise CommandError(str(e))
+        self.stdout.write(f"{pages} pages enregistrées dans {options['fichier']}")
+
+    def rejouer(self, options):
+        importateur = ImportateurDatasets(
+            taille_lot=options['taille_lot'],
+            per_page=options['per_page'],
+            session=SessionRejeu(options['fichier']),
+        )
+        if options['mode'] == 'masse':
+            importateur.importer_donnees_en_masse(options['recherche'])
+        else:
+            importateur.moissonner_incremental(options['recherche'])
+
+    def gonfler(self, options):
+        if not options['destination'] or not options['taille']:
+            raise CommandError("gonfler demande une destination et --taille")
+        ecrits = gonfler_enregistrement(
+            options['fichier'], options['destination'], options['taille'], per_page=options['per_page']
+        )
+        self.stdout.write(f"{ecrits} items écrits dans {options['destination']}")
@@ -0,0 +1,71 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recup_donnee.classification import reclasser_si_necessaire
+from recup_donnee.services.moissonnage import MoissonneurConcurrent
+from recup_donnee.services.planification import Planificateur
+from recup_donnee.signals import tour_planificateur
+from recup_donnee.statistiques import reconstruire_si_perimees
+
+
+class Command(BaseCommand):
+    help = "Planificateur de moissonnage : exécute les HarvestConfig actives selon leur fréquence"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Exécute les moissons échues puis s'arrête")
+        parser.add_argument('--forcer', action='store_true',
+                            help="Moissonne toutes les sources actives, échues ou non")
+        parser.add_argument('--intervalle', type=int, default=60,
+                            help="Secondes entre deux vérifications des sources échues (défaut : 60)")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Nombre maximal de sources récoltées en parallèle "
+                                 "(défaut : toutes, au plus MOISSONNAGE_WORKERS_MAX)")
+        parser.add_argument('--duree-verrou', type=int, default=30,
+                            help="Durée du bail de verrou en minutes (défaut : 30)")
+        parser.add_argument('--delai-reprise', type=int, default=15,
+                            help="Minutes avant de relancer une moisson échouée ou interrompue (défaut : 15)")
+
+    def handle(self, *args, **options):
+        planificateur = Planificateur(
+            duree_verrou=timedelta(minutes=options['duree_verrou']),
+            moissonneur=MoissonneurConcurrent(max_workers=options['workers']),
+            delai_reprise=timedelta(minutes=options['delai_reprise']),
+        )
+        self.arret = False
+        signal.signal(signal.SIGTERM, self.demander_arret)
+        signal.signal(signal.SIGINT, self.demander_arret)
+
+        self.stdout.write(f"Planificateur démarré ({planificateur.proprietaire})")
+        # Tables de classement modifiées depuis le dernier déploiement
+        reclasser_si_necessaire()
+        forcer = options['forcer']
+        while not self.arret:
+            close_old_connections()
+            for execution in planificateur.executer_dues(forcer=forcer):
+                self.stdout.write(
+                    f"{execution.config.source_url} : {execution.get_status_display()} en {execution.duration:.1f}s "
+                    f"(+{execution.inserted} ~{execution.updated} ={execution.unchanged} -{execution.removed})"
+                )
+            # Écritures hors importateur (admin, API) depuis le tour précédent
+            if reconstruire_si_perimees() is not None:
+                self.stdout.write("Statistiques reconstruites")
+            # Instantanés demandés par une édition dans l'admin (api_rest.signals)
+            tour_planificateur.send(sender=self.__class__)
+            forcer = False
+            if options['une_fois']:
+                break
+            self.attendre(options['intervalle'])
+        self.stdout.write("Planificateur arrêté")
+
+    def demander_arret(self, signum, frame):
+        self.arret = True
+
+    def attendre(self, secondes):
+        fin = time.monotonic() + secondes
+        while not self.arret and time.monotonic() < fin:
+            time.sleep(1)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recup_donnee.classification import classification_a_jour, reclasser_catalogue
+
+
+class Command(BaseCommand):
+    help = "Recalcule les catalogues et thématiques de tous les datasets après une modification de recup_donnee.classification"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forcer', action='store_true',
+                            help="Reclasse même si les tables de classement n'ont pas changé")
+        parser.add_argument('--taille-lot', type=int, default=1000,
+                            help="Datasets lus par requête (défaut : 1000)")
+
+    def handle(self, *args, **options):
+        if classification_a_jour() and not options['forcer']:
+            self.stdout.write("Classification à jour, rien à faire (--forcer pour reclasser)")
+            return
+        liens = reclasser_catalogue(taille_lot=options['taille_lot'])
+        self.stdout.write(f"Catalogue reclassé : {liens} tags attribués")
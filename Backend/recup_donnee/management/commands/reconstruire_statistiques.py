@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recup_donnee.statistiques import reconstruire_statistiques
+
+
+class Command(BaseCommand):
+    help = "Recalcule les tables de statistiques (totaux, histogrammes mensuels, affiliations, mots-clés)"
+
+    def handle(self, *args, **options):
+        etat = reconstruire_statistiques()
+        self.stdout.write(
+            f"Statistiques reconstruites : {etat.datasets} datasets, "
+            f"{etat.contacts} contacts, {etat.publications} publications"
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recup_donnee', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Empreinte du contenu'),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='global_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255, verbose_name='Identifiant global (DOI)'),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='removed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Date de retrait'),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='source',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=500, verbose_name='Source de moissonnage'),
+        ),
+    ]
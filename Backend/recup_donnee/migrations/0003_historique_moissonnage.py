@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def creer_source_par_defaut(apps, schema_editor):
+    """Reprend la moisson qui était lancée au démarrage par render_build.sh"""
+    HarvestConfig = apps.get_model('recup_donnee', 'HarvestConfig')
+    if not HarvestConfig.objects.exists():
+        HarvestConfig.objects.create(
+            source_url='https://borealisdata.ca/api/search',
+            frequency='quotidienne',
+            filters='q=fleuve-saint-laurent',
+            active=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recup_donnee', '0002_moisson_incrementale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='harvestconfig',
+            name='last_run_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Dernière exécution'),
+        ),
+        migrations.AddField(
+            model_name='harvestconfig',
+            name='locked_by',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Verrouillé par'),
+        ),
+        migrations.AddField(
+            model_name='harvestconfig',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Verrouillé jusqu'à"),
+        ),
+        migrations.CreateModel(
+            name='HarvestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker', models.CharField(max_length=255, verbose_name='Processus')),
+                ('status', models.CharField(choices=[('en_cours', 'En cours'), ('succes', 'Succès'), ('interrompu', 'Interrompu'), ('echec', 'Échec')], default='en_cours', max_length=20, verbose_name='Statut')),
+                ('started_at', models.DateTimeField(verbose_name='Début')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('duration', models.FloatField(blank=True, null=True, verbose_name='Durée (s)')),
+                ('inserted', models.PositiveIntegerField(default=0, verbose_name='Insérés')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='Mis à jour')),
+                ('unchanged', models.PositiveIntegerField(default=0, verbose_name='Inchangés')),
+                ('removed', models.PositiveIntegerField(default=0, verbose_name='Retirés')),
+                ('errors', models.PositiveIntegerField(default=0, verbose_name='Erreurs')),
+                ('message', models.TextField(blank=True, default='', verbose_name='Message')),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='recup_donnee.harvestconfig')),
+            ],
+            options={
+                'verbose_name': 'Exécution de moissonnage',
+                'verbose_name_plural': 'Exécutions de moissonnage',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.RunPython(creer_source_par_defaut, migrations.RunPython.noop),
+    ]
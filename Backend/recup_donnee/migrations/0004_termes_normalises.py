@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:51
+
+from django.db import migrations, models
+
+# Pas de remplissage ici : les champs texte joignent les termes par des
+# virgules, qui peuvent figurer dans un terme ("Doe, John"). Les termes ne
+# sont reliés que depuis les listes de la source (preparer_item) : les
+# datasets existants le sont à la moisson suivante, leur empreinte couvrant
+# désormais les termes (MesServices.calculer_empreinte).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recup_donnee', '0003_historique_moissonnage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Libellé')),
+                ('normalized', models.CharField(max_length=255, unique=True, verbose_name='Forme normalisée')),
+            ],
+            options={
+                'verbose_name': 'Auteur',
+                'verbose_name_plural': 'Auteurs',
+                'ordering': ['normalized'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Keyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Libellé')),
+                ('normalized', models.CharField(max_length=255, unique=True, verbose_name='Forme normalisée')),
+            ],
+            options={
+                'verbose_name': 'Mot-clé',
+                'verbose_name_plural': 'Mots-clés',
+                'ordering': ['normalized'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Subject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Libellé')),
+                ('normalized', models.CharField(max_length=255, unique=True, verbose_name='Forme normalisée')),
+            ],
+            options={
+                'verbose_name': 'Sujet',
+                'verbose_name_plural': 'Sujets',
+                'ordering': ['normalized'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='author_terms',
+            field=models.ManyToManyField(blank=True, related_name='datasets', to='recup_donnee.author', verbose_name='Auteurs (termes)'),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='keyword_terms',
+            field=models.ManyToManyField(blank=True, related_name='datasets', to='recup_donnee.keyword', verbose_name='Mots-clés (termes)'),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='subject_terms',
+            field=models.ManyToManyField(blank=True, related_name='datasets', to='recup_donnee.subject', verbose_name='Sujets (termes)'),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Index plein texte propres à chaque base de données.
+# Les colonnes indexées sont celles de api_rest.recherche.
+
+from django.db import migrations
+
+POSTGRESQL = [
+    (
+        """
+        ALTER TABLE recup_donnee_dataset ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name_of_dataverse, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(keywords, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(subjects, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(authors, '')), 'C') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+        ) STORED
+        """,
+        "ALTER TABLE recup_donnee_dataset DROP COLUMN search_vector",
+    ),
+    (
+        "CREATE INDEX recup_donnee_dataset_search_gin ON recup_donnee_dataset USING GIN (search_vector)",
+        "DROP INDEX IF EXISTS recup_donnee_dataset_search_gin",
+    ),
+]
+
+MYSQL = [
+    (
+        "ALTER TABLE recup_donnee_dataset ADD FULLTEXT INDEX recup_donnee_dataset_ft "
+        "(name_of_dataverse, keywords, subjects, authors, description)",
+        "ALTER TABLE recup_donnee_dataset DROP INDEX recup_donnee_dataset_ft",
+    ),
+    (
+        "ALTER TABLE recup_donnee_dataset ADD FULLTEXT INDEX recup_donnee_dataset_ft_nom (name_of_dataverse)",
+        "ALTER TABLE recup_donnee_dataset DROP INDEX recup_donnee_dataset_ft_nom",
+    ),
+]
+
+SQLITE = [
+    (
+        """
+        CREATE VIRTUAL TABLE recup_donnee_dataset_fts USING fts5(
+            name_of_dataverse, keywords, subjects, authors, description,
+            content='recup_donnee_dataset', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        "DROP TABLE IF EXISTS recup_donnee_dataset_fts",
+    ),
+    (
+        """
+        CREATE TRIGGER recup_donnee_dataset_fts_ai AFTER INSERT ON recup_donnee_dataset BEGIN
+            INSERT INTO recup_donnee_dataset_fts(rowid, name_of_dataverse, keywords, subjects, authors, description)
+            VALUES (new.id, new.name_of_dataverse, new.keywords, new.subjects, new.authors, new.description);
+        END
+        """,
+        "DROP TRIGGER IF EXISTS recup_donnee_dataset_fts_ai",
+    ),
+    (
+        """
+        CREATE TRIGGER recup_donnee_dataset_fts_ad AFTER DELETE ON recup_donnee_dataset BEGIN
+            INSERT INTO recup_donnee_dataset_fts(recup_donnee_dataset_fts, rowid, name_of_dataverse, keywords, subjects, authors, description)
+            VALUES ('delete', old.id, old.name_of_dataverse, old.keywords, old.subjects, old.authors, old.description);
+        END
+        """,
+        "DROP TRIGGER IF EXISTS recup_donnee_dataset_fts_ad",
+    ),
+    (
+        """
+        CREATE TRIGGER recup_donnee_dataset_fts_au AFTER UPDATE ON recup_donnee_dataset BEGIN
+            INSERT INTO recup_donnee_dataset_fts(recup_donnee_dataset_fts, rowid, name_of_dataverse, keywords, subjects, authors, description)
+            VALUES ('delete', old.id, old.name_of_dataverse, old.keywords, old.subjects, old.authors, old.description);
+            INSERT INTO recup_donnee_dataset_fts(rowid, name_of_dataverse, keywords, subjects, authors, description)
+            VALUES (new.id, new.name_of_dataverse, new.keywords, new.subjects, new.authors, new.description);
+        END
+        """,
+        "DROP TRIGGER IF EXISTS recup_donnee_dataset_fts_au",
+    ),
+    (
+        "INSERT INTO recup_donnee_dataset_fts(recup_donnee_dataset_fts) VALUES ('rebuild')",
+        None,
+    ),
+]
+
+INSTRUCTIONS = {
+    'postgresql': POSTGRESQL,
+    'mysql': MYSQL,
+    'sqlite': SQLITE,
+}
+
+
+def creer_index(apps, schema_editor):
+    for sql, _ in INSTRUCTIONS.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def supprimer_index(apps, schema_editor):
+    for _, sql in reversed(INSTRUCTIONS.get(schema_editor.connection.vendor, [])):
+        if sql:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recup_donnee', '0004_termes_normalises'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recup_donnee', '0005_recherche_plein_texte'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dateinfo',
+            index=models.Index(fields=['published_at', 'dataset'], name='dateinfo_publication_idx'),
+        ),
+    ]
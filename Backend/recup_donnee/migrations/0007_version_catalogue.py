@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def creer_version(apps, schema_editor):
+    apps.get_model('recup_donnee', 'CatalogVersion').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recup_donnee', '0006_index_pagination'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Version')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Dernière modification')),
+            ],
+            options={
+                'verbose_name': 'Version du catalogue',
+                'verbose_name_plural': 'Version du catalogue',
+            },
+        ),
+        migrations.RunPython(creer_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recup_donnee', '0007_version_catalogue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogversion',
+            name='classification',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Signature de la classification'),
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('catalogue', 'Catalogue'), ('thematique', 'Thématique')], max_length=20, verbose_name='Type')),
+                ('slug', models.SlugField(max_length=100, verbose_name='Valeur')),
+            ],
+            options={
+                'verbose_name': 'Tag',
+                'verbose_name_plural': 'Tags',
+                'ordering': ['kind', 'slug'],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'slug'), name='tag_unique')],
+            },
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='datasets', to='recup_donnee.tag', verbose_name='Catalogues et thématiques'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recup_donnee', '0008_tags_classification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AffiliationStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=500, unique=True, verbose_name='Affiliation')),
+                ('count', models.IntegerField(db_index=True, default=0, verbose_name='Nombre')),
+            ],
+            options={
+                'verbose_name': "Statistique d'affiliation",
+                'verbose_name_plural': "Statistiques d'affiliation",
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datasets', models.IntegerField(default=0, verbose_name='Datasets')),
+                ('contacts', models.IntegerField(default=0, verbose_name='Contacts')),
+                ('publications', models.IntegerField(default=0, verbose_name='Publications')),
+                ('stale', models.BooleanField(default=True, verbose_name='À reconstruire')),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernière reconstruction')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Statistiques du catalogue',
+                'verbose_name_plural': 'Statistiques du catalogue',
+            },
+        ),
+        migrations.CreateModel(
+            name='KeywordStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(db_index=True, default=0, verbose_name='Nombre')),
+                ('keyword', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stat', to='recup_donnee.keyword')),
+            ],
+            options={
+                'verbose_name': 'Statistique de mot-clé',
+                'verbose_name_plural': 'Statistiques de mot-clé',
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('published', 'Publication'), ('created', 'Création'), ('updated', 'Modification')], max_length=20, verbose_name='Type')),
+                ('month', models.DateField(verbose_name='Mois')),
+                ('count', models.IntegerField(default=0, verbose_name='Nombre')),
+            ],
+            options={
+                'verbose_name': 'Statistique mensuelle',
+                'verbose_name_plural': 'Statistiques mensuelles',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'month'), name='monthlystat_unique')],
+            },
+        ),
+    ]
@@ -1,13 +1,112 @@
 from django.db import models
+from django.utils import timezone
+
+
+class Terme(models.Model):
+    """Terme partagé entre datasets, indexé sur sa forme normalisée (casse et accents)"""
+    name = models.CharField("Libellé", max_length=255)
+    normalized = models.CharField("Forme normalisée", max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        abstract = True
+        ordering = ['normalized']
+
+
+class Keyword(Terme):
+    class Meta(Terme.Meta):
+        verbose_name = "Mot-clé"
+        verbose_name_plural = "Mots-clés"
+
+
+class Subject(Terme):
+    class Meta(Terme.Meta):
+        verbose_name = "Sujet"
+        verbose_name_plural = "Sujets"
+
+
+class Author(Terme):
+    class Meta(Terme.Meta):
+        verbose_name = "Auteur"
+        verbose_name_plural = "Auteurs"
+
+
+class Tag(models.Model):
+    """Catalogue ou thématique attribué à l'import (voir classification.py)"""
+    CATALOGUE = 'catalogue'
+    THEMATIQUE = 'thematique'
+    TYPES = [
+        (CATALOGUE, 'Catalogue'),
+        (THEMATIQUE, 'Thématique'),
+    ]
+
+    kind = models.CharField("Type", max_length=20, choices=TYPES)
+    slug = models.SlugField("Valeur", max_length=100)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} : {self.slug}"
+
+    class Meta:
+        verbose_name = "Tag"
+        verbose_name_plural = "Tags"
+        ordering = ['kind', 'slug']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'slug'], name='tag_unique'),
+        ]
+
+
+class DatasetQuerySet(models.QuerySet):
+    def actifs(self):
+        """Exclut les datasets retirés de la source lors d'une moisson"""
+        return self.filter(removed_at__isnull=True)
+
+    def avec_relations(self, contacts=None, publications=None, relations=None):
+        """Charge date_info par jointure et contacts/publications en une requête chacun
+
+        contacts et publications : querysets optionnels pour limiter les
+        colonnes lues (ils doivent garder la clé dataset). Les enfants sont
+        triés par id, l'ordre de la sérialisation rapide de l'API.
+        relations : noms des relations à charger (toutes par défaut).
+        """
+        if relations is None:
+            relations = ('date_info', 'contacts', 'publications')
+        if contacts is None:
+            contacts = Contact.objects.all()
+        if publications is None:
+            publications = Publication.objects.all()
+        qs = self.select_related('date_info') if 'date_info' in relations else self
+        if 'contacts' in relations:
+            qs = qs.prefetch_related(models.Prefetch('contacts', queryset=contacts.order_by('id')))
+        if 'publications' in relations:
+            qs = qs.prefetch_related(models.Prefetch('publications', queryset=publications.order_by('id')))
+        return qs
+
+    def par_ids(self, ids):
+        """Datasets des ids donnés, dans l'ordre des ids ; les ids absents sont ignorés"""
+        par_id = {dataset.pk: dataset for dataset in self.filter(pk__in=ids)}
+        return [par_id[pk] for pk in ids if pk in par_id]
+
 
 class Dataset(models.Model):
     name_of_dataverse = models.CharField("Nom", max_length=500)
     identifier_of_dataverse = models.CharField("Identifiant Dataverse", max_length=255, default="UNKNOWN")
+    global_id = models.CharField("Identifiant global (DOI)", max_length=255, blank=True, default="", db_index=True)
     url = models.URLField("URL")
     description = models.TextField("Description", blank=True, null=True)
     keywords = models.TextField("Mots-clés", blank=True, null=True)
     subjects = models.TextField("Sujets", blank=True, null=True)
     authors = models.TextField("Auteurs", blank=True, null=True)
+    content_hash = models.CharField("Empreinte du contenu", max_length=64, blank=True, default="")
+    source = models.CharField("Source de moissonnage", max_length=500, blank=True, default="", db_index=True)
+    removed_at = models.DateTimeField("Date de retrait", blank=True, null=True)
+    keyword_terms = models.ManyToManyField(Keyword, related_name='datasets', blank=True, verbose_name="Mots-clés (termes)")
+    subject_terms = models.ManyToManyField(Subject, related_name='datasets', blank=True, verbose_name="Sujets (termes)")
+    author_terms = models.ManyToManyField(Author, related_name='datasets', blank=True, verbose_name="Auteurs (termes)")
+    tags = models.ManyToManyField(Tag, related_name='datasets', blank=True, verbose_name="Catalogues et thématiques")
+
+    objects = DatasetQuerySet.as_manager()
 
     def __str__(self):
         return self.name_of_dataverse  
@@ -44,15 +143,125 @@ class DateInfo(models.Model):
     class Meta:
         verbose_name = "Date"
         verbose_name_plural = "Dates"
+        indexes = [
+            # Clé de la pagination par curseur de l'API (api_rest.pagination)
+            models.Index(fields=['published_at', 'dataset'], name='dateinfo_publication_idx'),
+        ]
 class HarvestConfig(models.Model):
     source_url = models.URLField("Source de moissonnage")
     frequency = models.CharField("Fréquence", max_length=100, help_text="Ex: quotidienne, hebdomadaire")
     filters = models.TextField("Filtres appliqués", blank=True, null=True)
     active = models.BooleanField("Actif", default=True)
+    last_run_at = models.DateTimeField("Dernière exécution", blank=True, null=True)
+    locked_by = models.CharField("Verrouillé par", max_length=255, blank=True, default="")
+    locked_until = models.DateTimeField("Verrouillé jusqu'à", blank=True, null=True)
 
     def __str__(self):
         return f"{self.source_url} ({'Actif' if self.active else 'Inactif'})"
 
     class Meta:
         verbose_name = "Moissonnage"
-        verbose_name_plural = "Moissonnages"
\ No newline at end of file
+        verbose_name_plural = "Moissonnages"
+
+
+class HarvestRun(models.Model):
+    STATUTS = [
+        ('en_cours', 'En cours'),
+        ('succes', 'Succès'),
+        ('interrompu', 'Interrompu'),
+        ('echec', 'Échec'),
+    ]
+
+    config = models.ForeignKey(HarvestConfig, on_delete=models.CASCADE, related_name='runs')
+    worker = models.CharField("Processus", max_length=255)
+    status = models.CharField("Statut", max_length=20, choices=STATUTS, default='en_cours')
+    started_at = models.DateTimeField("Début")
+    finished_at = models.DateTimeField("Fin", blank=True, null=True)
+    duration = models.FloatField("Durée (s)", blank=True, null=True)
+    inserted = models.PositiveIntegerField("Insérés", default=0)
+    updated = models.PositiveIntegerField("Mis à jour", default=0)
+    unchanged = models.PositiveIntegerField("Inchangés", default=0)
+    removed = models.PositiveIntegerField("Retirés", default=0)
+    errors = models.PositiveIntegerField("Erreurs", default=0)
+    message = models.TextField("Message", blank=True, default="")
+
+    def __str__(self):
+        return f"{self.config.source_url} - {self.started_at:%Y-%m-%d %H:%M} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Exécution de moissonnage"
+        verbose_name_plural = "Exécutions de moissonnage"
+        ordering = ['-started_at']
+
+class CatalogVersion(models.Model):
+    """Ligne unique incrémentée à chaque écriture sur le catalogue (voir catalogue.py)"""
+    version = models.PositiveBigIntegerField("Version", default=1)
+    updated_at = models.DateTimeField("Dernière modification", default=timezone.now)
+    classification = models.CharField("Signature de la classification", max_length=64, blank=True, default="")
+
+    def __str__(self):
+        return f"Catalogue v{self.version}"
+
+    class Meta:
+        verbose_name = "Version du catalogue"
+        verbose_name_plural = "Version du catalogue"
+
+
+class CatalogStats(models.Model):
+    """Totaux précalculés du catalogue, ligne unique (voir statistiques.py)"""
+    datasets = models.IntegerField("Datasets", default=0)
+    contacts = models.IntegerField("Contacts", default=0)
+    publications = models.IntegerField("Publications", default=0)
+    stale = models.BooleanField("À reconstruire", default=True)
+    rebuilt_at = models.DateTimeField("Dernière reconstruction", blank=True, null=True)
+    updated_at = models.DateTimeField("Dernière mise à jour", default=timezone.now)
+
+    def __str__(self):
+        return f"Statistiques ({self.datasets} datasets)"
+
+    class Meta:
+        verbose_name = "Statistiques du catalogue"
+        verbose_name_plural = "Statistiques du catalogue"
+
+
+class MonthlyStat(models.Model):
+    """Nombre de datasets actifs par mois de publication, création ou modification"""
+    PUBLISHED = 'published'
+    CREATED = 'created'
+    UPDATED = 'updated'
+    TYPES = [
+        (PUBLISHED, 'Publication'),
+        (CREATED, 'Création'),
+        (UPDATED, 'Modification'),
+    ]
+
+    kind = models.CharField("Type", max_length=20, choices=TYPES)
+    month = models.DateField("Mois")
+    count = models.IntegerField("Nombre", default=0)
+
+    class Meta:
+        verbose_name = "Statistique mensuelle"
+        verbose_name_plural = "Statistiques mensuelles"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'month'], name='monthlystat_unique'),
+        ]
+
+
+class AffiliationStat(models.Model):
+    """Nombre de datasets actifs ayant au moins un contact de cette affiliation"""
+    name = models.CharField("Affiliation", max_length=500, unique=True)
+    count = models.IntegerField("Nombre", default=0, db_index=True)
+
+    class Meta:
+        verbose_name = "Statistique d'affiliation"
+        verbose_name_plural = "Statistiques d'affiliation"
+
+
+class KeywordStat(models.Model):
+    """Nombre de datasets actifs reliés à ce mot-clé"""
+    keyword = models.OneToOneField(Keyword, on_delete=models.CASCADE, related_name='stat')
+    count = models.IntegerField("Nombre", default=0, db_index=True)
+
+    class Meta:
+        verbose_name = "Statistique de mot-clé"
+        verbose_name_plural = "Statistiques de mot-clé"
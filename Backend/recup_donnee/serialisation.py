@@ -0,0 +1,217 @@
+"""
+Sérialisation rapide des listes de datasets.
+
+Au lieu d'instancier les modèles et de passer chaque champ par le
+ModelSerializer, les lignes sont lues avec .values(), les enfants
+(contacts, publications) en une requête groupée par dataset, puis le JSON
+est rendu d'un bloc. La forme (noms, ordre et format des champs) est
+déduite du serializer DRF lui-même : la réponse est identique octet pour
+octet à celle de JSONRenderer.
+
+orjson (requirements.txt) rend le JSON, sauf pour les serializers contenant
+des flottants (rang de recherche) dont il formate les exposants autrement ;
+sans lui, json de la bibliothèque standard donne les mêmes octets.
+"""
+import json
+from collections import defaultdict
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import RelatedField
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Nombre maximal d'ids par requête IN sur les tables enfants
+TAILLE_IN = 1000
+
+
+def identite(valeur):
+    return valeur
+
+
+def convertisseur(champ):
+    """Conversion d'une valeur brute de .values() vers sa représentation DRF"""
+    if isinstance(champ, (serializers.CharField, serializers.IntegerField, RelatedField)):
+        # DRF appliquerait str()/int() à une valeur qui l'est déjà, ou la clé
+        return identite
+    if isinstance(champ, serializers.DateTimeField):
+        return convertisseur_date(champ)
+    return champ.to_representation
+
+
+def convertisseur_date(champ):
+    """DateTimeField.to_representation avec le fuseau résolu une seule fois"""
+    format_sortie = getattr(champ, 'format', api_settings.DATETIME_FORMAT)
+    fuseau = champ.timezone if hasattr(champ, 'timezone') else champ.default_timezone()
+    if format_sortie is None or format_sortie.lower() != ISO_8601 or fuseau is None:
+        return champ.to_representation
+
+    def convertir(valeur):
+        if valeur.tzinfo is None:
+            return champ.to_representation(valeur)
+        texte = valeur.astimezone(fuseau).isoformat()
+        return texte[:-6] + 'Z' if texte.endswith('+00:00') else texte
+    return convertir
+
+
+def serialisation_rapide_active(request):
+    return (
+        getattr(settings, 'DATASETS_SERIALISATION_RAPIDE', True)
+        and getattr(request, 'accepted_renderer', None) is not None
+        and request.accepted_renderer.format == 'json'
+    )
+
+
+class SerialisationRapide:
+    """Sérialise un queryset de datasets sous la forme exacte de `serializer`"""
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.champs = []        # (nom, colonne, conversion)
+        self.objets = []        # (nom, colonne de présence, [(nom, colonne, conversion)])
+        self.listes = []        # (nom, modèle, clé étrangère, [(nom, colonne, conversion)])
+        self.methodes = []      # (nom, méthode du serializer)
+        self.flottants = False
+        self.plan = []          # ordre de sortie : (genre, nom)
+
+        modele = serializer.Meta.model
+        for nom, champ in serializer.fields.items():
+            if isinstance(champ, serializers.ListSerializer):
+                relation = modele._meta.get_field(champ.source)
+                self.listes.append((
+                    nom, relation.related_model, relation.field.name,
+                    self.colonnes(champ.child),
+                ))
+                self.plan.append(('liste', nom))
+            elif isinstance(champ, serializers.BaseSerializer):
+                relation = modele._meta.get_field(champ.source)
+                prefixe = f"{champ.source}__"
+                self.objets.append((
+                    nom, f"{prefixe}{relation.related_model._meta.pk.name}",
+                    [(n, f"{prefixe}{c}", conv) for n, c, conv in self.colonnes(champ)],
+                ))
+                self.plan.append(('objet', nom))
+            elif isinstance(champ, serializers.SerializerMethodField):
+                self.methodes.append((nom, getattr(serializer, champ.method_name)))
+                self.plan.append(('methode', nom))
+            else:
+                self.flottants |= isinstance(champ, serializers.FloatField)
+                self.champs.append((nom, champ.source, convertisseur(champ)))
+                self.plan.append(('champ', nom))
+
+    def colonnes(self, serializer):
+        colonnes = []
+        for nom, champ in serializer.fields.items():
+            self.flottants |= isinstance(champ, serializers.FloatField)
+            colonnes.append((nom, champ.source, convertisseur(champ)))
+        return colonnes
+
+    def colonnes_brutes(self, queryset):
+        """Colonnes lues par .values() pour construire les lignes de queryset"""
+        annotations = [a for a in queryset.query.annotations if a not in {c for _, c, _ in self.champs}]
+        colonnes = ['pk'] + [c for _, c, _ in self.champs] + annotations
+        for _, presence, sous_colonnes in self.objets:
+            colonnes += [presence] + [c for _, c, _ in sous_colonnes]
+        if self.methodes:
+            colonnes += [f.attname for f in self.serializer.Meta.model._meta.concrete_fields]
+        return queryset.prefetch_related(None).values(*dict.fromkeys(colonnes))
+
+    def construire(self, queryset):
+        """Retourne (lignes sérialisées, valeurs brutes) dans l'ordre du queryset"""
+        brutes = list(self.colonnes_brutes(queryset))
+        enfants = {nom: self.grouper(modele, cle, sous_colonnes, [b['pk'] for b in brutes])
+                   for nom, modele, cle, sous_colonnes in self.listes}
+        return self.assembler(brutes, enfants), brutes
+
+    async def aconstruire(self, queryset):
+        """construire() par l'ORM asynchrone"""
+        brutes = [brute async for brute in self.colonnes_brutes(queryset)]
+        enfants = {}
+        for nom, modele, cle, sous_colonnes in self.listes:
+            enfants[nom] = await self.agrouper(modele, cle, sous_colonnes, [b['pk'] for b in brutes])
+        return self.assembler(brutes, enfants), brutes
+
+    def assembler(self, brutes, enfants):
+        """Lignes sérialisées à partir des valeurs brutes et des enfants groupés"""
+        champs = {nom: (colonne, conv) for nom, colonne, conv in self.champs}
+        objets = {nom: (presence, sous_colonnes) for nom, presence, sous_colonnes in self.objets}
+        methodes = dict(self.methodes)
+        lignes = []
+        for brute in brutes:
+            ligne = {}
+            for genre, nom in self.plan:
+                if genre == 'champ':
+                    colonne, conv = champs[nom]
+                    valeur = brute[colonne]
+                    ligne[nom] = None if valeur is None else conv(valeur)
+                elif genre == 'liste':
+                    ligne[nom] = enfants[nom].get(brute['pk'], [])
+                elif genre == 'objet':
+                    presence, sous_colonnes = objets[nom]
+                    if brute[presence] is None:
+                        ligne[nom] = None
+                    else:
+                        ligne[nom] = {
+                            n: None if brute[c] is None else conv(brute[c])
+                            for n, c, conv in sous_colonnes
+                        }
+                else:
+                    ligne[nom] = methodes[nom](SimpleNamespace(**brute))
+            lignes.append(ligne)
+        return lignes
+
+    def lots_enfants(self, modele, cle, sous_colonnes, ids):
+        """Requêtes .values() des enfants, TAILLE_IN ids à la fois"""
+        colonnes = list(dict.fromkeys([f"{cle}_id"] + [c for _, c, _ in sous_colonnes]))
+        for debut in range(0, len(ids), TAILLE_IN):
+            yield (
+                modele.objects
+                .filter(**{f"{cle}_id__in": ids[debut:debut + TAILLE_IN]})
+                .order_by('id')
+                .values(*colonnes)
+            )
+
+    def grouper(self, modele, cle, sous_colonnes, ids):
+        """Enfants sérialisés, groupés par dataset et triés par id"""
+        groupes = defaultdict(list)
+        for lots in self.lots_enfants(modele, cle, sous_colonnes, ids):
+            for brute in lots:
+                groupes[brute[f"{cle}_id"]].append({
+                    n: None if brute[c] is None else conv(brute[c])
+                    for n, c, conv in sous_colonnes
+                })
+        return groupes
+
+    async def agrouper(self, modele, cle, sous_colonnes, ids):
+        """grouper() par l'ORM asynchrone"""
+        groupes = defaultdict(list)
+        for lots in self.lots_enfants(modele, cle, sous_colonnes, ids):
+            async for brute in lots:
+                groupes[brute[f"{cle}_id"]].append({
+                    n: None if brute[c] is None else conv(brute[c])
+                    for n, c, conv in sous_colonnes
+                })
+        return groupes
+
+    def rendre(self, donnees):
+        """JSON identique à rest_framework.renderers.JSONRenderer (réponse compacte)"""
+        compact, unicode = api_settings.COMPACT_JSON, api_settings.UNICODE_JSON
+        if orjson is not None and compact and unicode and not self.flottants:
+            contenu = orjson.dumps(donnees)
+            return contenu.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        contenu = json.dumps(
+            donnees, cls=JSONEncoder, ensure_ascii=not unicode,
+            allow_nan=not api_settings.STRICT_JSON,
+            separators=(',', ':') if compact else (', ', ': '),
+        )
+        return contenu.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+    def reponse(self, donnees):
+        return HttpResponse(self.rendre(donnees), content_type='application/json')
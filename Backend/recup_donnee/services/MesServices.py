@@ -1,22 +1,70 @@
+import hashlib
+import json
+import os
+import time
 import requests
+from collections import defaultdict
 from datetime import datetime
+from urllib.parse import urlencode
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
 from django.utils.timezone import make_aware
 from ..models import *
+from ..termes import termes_uniques
+from ..catalogue import catalogue_modifie
+from ..classification import classer, lier_tags
+from ..statistiques import statistiques_perimees, suivre_statistiques
+from ..signals import harvest_termine
+
+URL_API_BOREALIS = "https://borealisdata.ca/api/search"
+
+# Limite imposée par l'API de recherche Dataverse
+PER_PAGE_MAX = 1000
+
+# Listes de l'API -> (relation sur Dataset, modèle de terme)
+RELATIONS_TERMES = {
+    'keywords': ('keyword_terms', Keyword),
+    'subjects': ('subject_terms', Subject),
+    'authors': ('author_terms', Author),
+}
+
+# Champs réécrits quand l'empreinte d'un dataset change
+CHAMPS_MIS_A_JOUR = [
+    'identifier_of_dataverse', 'name_of_dataverse', 'url', 'description',
+    'keywords', 'subjects', 'authors', 'global_id', 'content_hash', 'source', 'removed_at',
+]
+
+
+class ErreurMoissonnage(Exception):
+    """Levée quand une page de l'API ne peut pas être récupérée"""
+
 
 class ImportateurDatasets:
     """Service pour importer les données"""
     
-    def __init__(self):
-        self.url_api = "https://borealisdata.ca/api/search"
+    def __init__(self, taille_lot=200, per_page=PER_PAGE_MAX, url_api=URL_API_BOREALIS, session=None, parametres=None):
+        self.url_api = url_api
+        self.taille_lot = taille_lot
+        self.per_page = min(per_page, PER_PAGE_MAX)
+        # Toute session compatible requests (pool de connexions, rejeu...)
+        self.session = session or requests
+        # Paramètres de recherche supplémentaires (ex: subtree, fq)
+        self.parametres = parametres or {}
     
-    def appeler_api(self, recherche="fleuve-saint-laurent"):
-        """Appelle l'API et retourne les données brutes"""
+    def appeler_api(self, recherche="fleuve-saint-laurent", start=0, per_page=None):
+        """Appelle l'API et retourne les données brutes d'une page"""
         try:
-            print(f"Appel de l'API pour: {recherche}")
+            print(f"Appel de l'API pour: {recherche} (start={start})")
             
-            response = requests.get(
+            response = self.session.get(
                 self.url_api,
-                params={'q': recherche, 'type': 'dataset', 'per_page': 300},
+                params={
+                    **self.parametres,
+                    'q': recherche,
+                    'type': 'dataset',
+                    'start': start,
+                    'per_page': per_page or self.per_page,
+                },
                 timeout=30
             )
             
@@ -31,6 +79,67 @@ class ImportateurDatasets:
         except Exception as e:
             print(f" Erreur: {e}")
             return None
+
+    def parcourir_pages(self, recherche="fleuve-saint-laurent", per_page=None, fichier_reprise=None):
+        """Parcourt toutes les pages de la recherche et les produit une à une"""
+        per_page = min(per_page or self.per_page, PER_PAGE_MAX)
+        start = self.lire_reprise(fichier_reprise, recherche)
+        if start:
+            print(f"Reprise de la moisson à partir de l'item {start}")
+
+        while True:
+            donnees = self.appeler_api(recherche, start=start, per_page=per_page)
+            if donnees is None:
+                raise ErreurMoissonnage(f"Page start={start} indisponible pour '{recherche}'")
+
+            items = donnees['data']['items']
+            total = donnees['data'].get('total_count', 0)
+            # Seule la page courante reste en mémoire
+            del donnees
+            if not items:
+                break
+
+            yield items
+
+            # Le consommateur a terminé la page : on peut la marquer comme faite
+            start += len(items)
+            self.ecrire_reprise(fichier_reprise, recherche, start)
+            if start >= total:
+                break
+
+        self.effacer_reprise(fichier_reprise)
+
+    def iterer_items(self, recherche="fleuve-saint-laurent", per_page=None, fichier_reprise=None):
+        """Produit les items de toutes les pages, un par un"""
+        for page in self.parcourir_pages(recherche, per_page, fichier_reprise):
+            yield from page
+
+    def lire_reprise(self, fichier_reprise, recherche):
+        """Retourne la position de reprise enregistrée pour cette recherche"""
+        if not fichier_reprise or not os.path.exists(fichier_reprise):
+            return 0
+        try:
+            with open(fichier_reprise, encoding='utf-8') as f:
+                etat = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if etat.get('url_api') != self.url_api or etat.get('recherche') != recherche:
+            return 0
+        return int(etat.get('start', 0))
+
+    def ecrire_reprise(self, fichier_reprise, recherche, start):
+        """Enregistre la position de la prochaine page à récupérer"""
+        if not fichier_reprise:
+            return
+        temporaire = f"{fichier_reprise}.tmp"
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            json.dump({'url_api': self.url_api, 'recherche': recherche, 'start': start}, f)
+        os.replace(temporaire, fichier_reprise)
+
+    def effacer_reprise(self, fichier_reprise):
+        """Supprime le point de reprise une fois la moisson terminée"""
+        if fichier_reprise and os.path.exists(fichier_reprise):
+            os.remove(fichier_reprise)
     
     def convertir_date(self, date_str):
         """Convertit une date string en datetime"""
@@ -49,20 +158,96 @@ class ImportateurDatasets:
             return ""
         return ', '.join([str(item) for item in liste_donnees])
     
-    def importer_donnees(self, recherche="fleuve-saint-laurent"):
-        resultat_api = self.appeler_api(recherche)
-        if not resultat_api:
-            return []
+    def preparer_item(self, item):
+        """Transforme un item brut de l'API en champs prêts à écrire"""
+        prepare = {
+            'dataset': {
+                'identifier_of_dataverse': item.get('identifier_of_dataverse', ''),
+                'global_id': item.get('global_id') or '',
+                'name_of_dataverse': item.get('name_of_dataverse', 'Sans titre'),
+                'url': item.get('url', ''),
+                'description': item.get('description', ''),
+                'keywords': self.liste_vers_texte(item.get('keywords', [])),
+                'subjects': self.liste_vers_texte(item.get('subjects', [])),
+                'authors': self.liste_vers_texte(item.get('authors', [])),
+            },
+            'contacts': [
+                {
+                    'name': contact_data.get('name', ''),
+                    'affiliation': contact_data.get('affiliation', ''),
+                }
+                for contact_data in item.get('contacts', [])
+            ],
+            'publications': [
+                {
+                    'citation': pub_data.get('citation', ''),
+                    'url': pub_data.get('url', ''),
+                }
+                for pub_data in item.get('publications', [])
+            ],
+            'dates': {
+                'created_at': self.convertir_date(item.get('createdAt')),
+                'updated_at': self.convertir_date(item.get('updatedAt')),
+                'published_at': self.convertir_date(item.get('published_at')),
+            },
+            'termes': {cle: termes_uniques(item.get(cle, [])) for cle in RELATIONS_TERMES},
+        }
+        prepare['tags'] = classer(prepare['dataset'])
+        prepare['dataset']['content_hash'] = self.calculer_empreinte(prepare, item)
+        return prepare
         
-        items = resultat_api['data']['items']
-        print(f"Import de {len(items)} datasets...")
+    def calculer_empreinte(self, prepare, item):
+        """Calcule l'empreinte SHA-256 de l'enregistrement normalisé"""
+        # Les dates brutes sont utilisées car convertir_date remplace une
+        # date absente par l'heure courante, ce qui changerait l'empreinte.
+        # Les termes aussi : le texte joint par des virgules ne distingue pas
+        # ["Doe, John"] de ["Doe", "John"].
+        normalise = {
+            'dataset': prepare['dataset'],
+            'contacts': prepare['contacts'],
+            'publications': prepare['publications'],
+            'dates': [item.get('createdAt'), item.get('updatedAt'), item.get('published_at')],
+            'termes': prepare['termes'],
+        }
+        contenu = json.dumps(normalise, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+    def cle_dataset(self, global_id, url):
+        """Clé stable d'un dataset : son DOI, ou à défaut son URL"""
+        return global_id or url
+
+    def importer_donnees(self, recherche="fleuve-saint-laurent", fichier_reprise=None):
+        print(f"Import des datasets pour : {recherche}")
 
         datasets_importes = []
-        for i, item in enumerate(items, 1):
-            try:
-                print(f"\n--- Dataset {i}/{len(items)} ---")
-                print(f"{item.get('name_of_dataverse', 'Sans titre')[:60]}...")
+        complete = True
+        try:
+            # Agrégats marqués périmés une fois pour tout l'import, reconstruits à la fin
+            with statistiques_perimees():
+                for i, item in enumerate(self.iterer_items(recherche, fichier_reprise=fichier_reprise), 1):
+                    datasets_importes.append(self.importer_item(i, item))
+        except ErreurMoissonnage as e:
+            print(f"Moisson interrompue : {e}")
+            complete = False
+        datasets_importes = [dataset for dataset in datasets_importes if dataset]
+
+        print(f"\nIMPORTATION TERMINÉE!")
+        print(f"Datasets: {Dataset.objects.count()}")
+        print(f"Contacts: {Contact.objects.count()}")
+        print(f"Publications: {Publication.objects.count()}")
+        print(f"Infos dates: {DateInfo.objects.count()}")
+
+        if complete:
+            harvest_termine.send(sender=self.__class__, source='', rapport={'datasets': len(datasets_importes)})
+        return datasets_importes
+
+    def importer_item(self, i, item):
+        """Importe un item ligne par ligne (mode historique)"""
+        try:
+            print(f"\n--- Dataset {i} ---")
+            print(f"{item.get('name_of_dataverse', 'Sans titre')[:60]}...")
 
+            with transaction.atomic():
                 dataset = Dataset.objects.create(
                     identifier_of_dataverse=item.get('identifier_of_dataverse', ''),
                     name_of_dataverse=item.get('name_of_dataverse', 'Sans titre'),
@@ -94,17 +279,371 @@ class ImportateurDatasets:
                     dataset=dataset
                 )
 
-                datasets_importes.append(dataset)
-                print(f"Dataset importé : {dataset.name_of_dataverse}")
+                prepare = self.preparer_item(item)
+                self._lier_termes([dataset], [prepare])
+                lier_tags([(dataset.pk, prepare['tags'])])
+
+            print(f"Dataset importé : {dataset.name_of_dataverse}")
+            return dataset
+
+        except Exception as e:
+            print(f"Erreur : {e}")
+            return None
+
+    def decouper_en_lots(self, items, taille_lot):
+        """Regroupe un itérable d'items en listes de taille_lot éléments"""
+        lot = []
+        for item in items:
+            lot.append(item)
+            if len(lot) >= taille_lot:
+                yield lot
+                lot = []
+        if lot:
+            yield lot
+
+    def importer_donnees_en_masse(self, recherche="fleuve-saint-laurent", taille_lot=None, fichier_reprise=None):
+        """Importe toutes les pages de la recherche par lots (bulk_create, une transaction par lot)"""
+        pages = self.parcourir_pages(recherche, fichier_reprise=fichier_reprise)
+        return self.importer_pages_en_masse(pages, taille_lot)
+
+    def importer_items_en_masse(self, items, taille_lot=None):
+        """Écrit une liste d'items bruts par lots et retourne un rapport de performance"""
+        return self.importer_pages_en_masse([items], taille_lot)
+
+    def importer_pages_en_masse(self, pages, taille_lot=None):
+        """Écrit un flux de pages d'items par lots et retourne un rapport de performance"""
+        taille_lot = taille_lot or self.taille_lot
+        rapport = {'lots': [], 'datasets': 0, 'lignes': 0, 'erreurs': 0, 'duree': 0.0, 'complete': True}
+        debut = time.perf_counter()
+
+        try:
+            # Un lot ne chevauche jamais deux pages : une page n'est marquée
+            # comme faite qu'une fois tous ses lots écrits.
+            for page in pages:
+                for lot in self.decouper_en_lots(page, taille_lot):
+                    stats = self.ecrire_lot(lot)
+                    stats['numero'] = len(rapport['lots']) + 1
+                    rapport['lots'].append(stats)
+                    rapport['datasets'] += stats['datasets']
+                    rapport['lignes'] += stats['lignes']
+                    rapport['erreurs'] += stats['erreurs']
+                    print(
+                        f"Lot {stats['numero']} : {stats['datasets']} datasets, {stats['lignes']} lignes "
+                        f"en {stats['duree']:.3f}s ({stats['lignes_par_seconde']:.0f} lignes/s)"
+                    )
+        except ErreurMoissonnage as e:
+            print(f"Moisson interrompue : {e}")
+            rapport['complete'] = False
+
+        rapport['duree'] = time.perf_counter() - debut
+        rapport['lignes_par_seconde'] = rapport['lignes'] / rapport['duree'] if rapport['duree'] else 0.0
+
+        print(f"\nIMPORTATION EN MASSE TERMINÉE!")
+        print(
+            f"{rapport['datasets']} datasets, {rapport['lignes']} lignes, {len(rapport['lots'])} lots "
+            f"en {rapport['duree']:.2f}s ({rapport['lignes_par_seconde']:.0f} lignes/s)"
+        )
+        if rapport['erreurs']:
+            print(f"Items ignorés : {rapport['erreurs']}")
+        if rapport['complete']:
+            harvest_termine.send(sender=self.__class__, source='', rapport=rapport)
+        return rapport
+
+    def source_recherche(self, recherche):
+        """Identifie la source d'une moisson (URL de l'API et requête)"""
+        return f"{self.url_api}?{urlencode(sorted({**self.parametres, 'q': recherche}.items()))}"
 
+    def moissonner_incremental(self, recherche="fleuve-saint-laurent", taille_lot=None, fichier_reprise=None):
+        """Synchronise la base avec la source : insère, met à jour, ignore ou retire"""
+        source = self.source_recherche(recherche)
+        # Après une reprise, les pages déjà traitées ne sont pas revues :
+        # on ne peut donc pas en déduire les datasets disparus.
+        reprise = self.lire_reprise(fichier_reprise, recherche)
+        pages = self.parcourir_pages(recherche, fichier_reprise=fichier_reprise)
+        return self.synchroniser_pages(pages, source, taille_lot, retirer_disparus=not reprise)
+
+    def synchroniser_pages(self, pages, source, taille_lot=None, retirer_disparus=True):
+        """Synchronise un flux de pages d'une source et retourne les compteurs"""
+        rapport = self.nouveau_rapport(source)
+        vus = set()
+
+        try:
+            for page in pages:
+                self.synchroniser_page(page, source, vus, rapport, taille_lot)
+        except ErreurMoissonnage as e:
+            print(f"Moisson interrompue : {e}")
+            rapport['complete'] = False
+
+        return self.terminer_synchronisation(source, vus, rapport, retirer_disparus)
+
+    def nouveau_rapport(self, source):
+        """Compteurs d'une synchronisation"""
+        return {
+            'source': source, 'inseres': 0, 'mis_a_jour': 0, 'inchanges': 0,
+            'retires': 0, 'doublons': 0, 'erreurs': 0, 'duree': 0.0, 'complete': True,
+            'debut': time.perf_counter(),
+        }
+
+    def synchroniser_page(self, page, source, vus, rapport, taille_lot=None):
+        """Synchronise une page d'items, lot par lot"""
+        for lot in self.decouper_en_lots(page, taille_lot or self.taille_lot):
+            self.synchroniser_lot(lot, source, vus, rapport)
+
+    def terminer_synchronisation(self, source, vus, rapport, retirer_disparus=True):
+        """Retire les datasets disparus si la moisson est complète et affiche le bilan"""
+        if rapport['complete'] and retirer_disparus:
+            rapport['retires'] = self.retirer_disparus(source, vus)
+
+        rapport['duree'] = time.perf_counter() - rapport.pop('debut')
+        print(f"\nMOISSON INCRÉMENTALE TERMINÉE : {source}")
+        print(
+            f"Insérés: {rapport['inseres']}, mis à jour: {rapport['mis_a_jour']}, "
+            f"inchangés: {rapport['inchanges']}, retirés: {rapport['retires']} "
+            f"en {rapport['duree']:.2f}s"
+        )
+        if rapport['doublons']:
+            print(f"Doublons supprimés : {rapport['doublons']}")
+        if rapport['erreurs']:
+            print(f"Items ignorés : {rapport['erreurs']}")
+        if rapport['complete']:
+            harvest_termine.send(sender=self.__class__, source=source, rapport=rapport)
+        return rapport
+
+    def synchroniser_lot(self, items, source, vus, rapport):
+        """Compare un lot aux datasets existants par empreinte et n'écrit que les différences"""
+        prepares = {}
+        for item in items:
+            try:
+                prepare = self.preparer_item(item)
             except Exception as e:
-                print(f"Erreur : {e}")
+                print(f"Item ignoré : {e}")
+                rapport['erreurs'] += 1
+                continue
+            cle = self.cle_dataset(prepare['dataset']['global_id'], prepare['dataset']['url'])
+            if not cle:
+                rapport['erreurs'] += 1
                 continue
+            prepares[cle] = prepare
+        vus.update(prepares)
+        if not prepares:
+            return
 
-        print(f"\nIMPORTATION TERMINÉE!")
-        print(f"Datasets: {Dataset.objects.count()}")
-        print(f"Contacts: {Contact.objects.count()}")
-        print(f"Publications: {Publication.objects.count()}")
-        print(f"Infos dates: {DateInfo.objects.count()}")
+        with transaction.atomic():
+            existants = self._datasets_existants(prepares)
 
-        return datasets_importes
+            a_inserer, a_mettre_a_jour, doublons, a_rattacher = [], [], [], []
+            for cle, prepare in prepares.items():
+                lignes = existants.get(cle)
+                if not lignes:
+                    a_inserer.append(prepare)
+                    continue
+                principal, *autres = lignes
+                doublons.extend(ligne['id'] for ligne in autres)
+                if principal['content_hash'] == prepare['dataset']['content_hash'] and principal['removed_at'] is None:
+                    rapport['inchanges'] += 1
+                    # Ligne d'une autre source ou de l'import en masse (source vide) :
+                    # sans cela, retirer_disparus ne la retirerait jamais
+                    if principal['source'] != source:
+                        a_rattacher.append(principal['id'])
+                    continue
+                a_mettre_a_jour.append((principal['id'], prepare))
+
+            if a_rattacher:
+                # Champ de suivi interne, absent des réponses : pas de nouvelle version du catalogue
+                Dataset.objects.filter(id__in=a_rattacher).update(source=source)
+
+            if doublons:
+                with suivre_statistiques(doublons):
+                    self._supprimer_enfants(doublons)
+                    Dataset.objects.filter(id__in=doublons)._raw_delete(Dataset.objects.db)
+                    catalogue_modifie()
+            if a_mettre_a_jour:
+                self._mettre_a_jour_prepares(a_mettre_a_jour, source)
+            if a_inserer:
+                self._inserer_prepares(a_inserer, source)
+
+        rapport['inseres'] += len(a_inserer)
+        rapport['mis_a_jour'] += len(a_mettre_a_jour)
+        rapport['doublons'] += len(doublons)
+
+    def _datasets_existants(self, prepares):
+        """Retrouve les lignes existantes de chaque clé, la plus ancienne en premier"""
+        global_ids = [p['dataset']['global_id'] for p in prepares.values() if p['dataset']['global_id']]
+        urls = [p['dataset']['url'] for p in prepares.values() if p['dataset']['url']]
+        champs = ('id', 'global_id', 'url', 'content_hash', 'removed_at', 'source')
+
+        existants = defaultdict(list)
+        lignes = list(Dataset.objects.filter(global_id__in=global_ids).values(*champs))
+        # Les lignes importées avant l'ajout du DOI sont retrouvées par URL
+        lignes += list(Dataset.objects.filter(global_id='', url__in=urls).values(*champs))
+        cles_par_url = {p['dataset']['url']: cle for cle, p in prepares.items()}
+        for ligne in sorted(lignes, key=lambda ligne: ligne['id']):
+            cle = ligne['global_id'] if ligne['global_id'] else cles_par_url.get(ligne['url'])
+            if cle in prepares:
+                existants[cle].append(ligne)
+        return existants
+
+    def _mettre_a_jour_prepares(self, a_mettre_a_jour, source):
+        """Réécrit sur place les datasets modifiés et remplace leurs enfants"""
+        ids = [pk for pk, _ in a_mettre_a_jour]
+        with suivre_statistiques(ids):
+            datasets = []
+            for pk, prepare in a_mettre_a_jour:
+                dataset = Dataset(pk=pk, source=source, removed_at=None, **prepare['dataset'])
+                datasets.append(dataset)
+            Dataset.objects.bulk_update(datasets, CHAMPS_MIS_A_JOUR)
+            catalogue_modifie()
+
+            self._supprimer_enfants(ids)
+            self._inserer_enfants(datasets, [prepare for _, prepare in a_mettre_a_jour])
+
+    def _supprimer_enfants(self, ids):
+        """Supprime en SQL direct les enfants et liaisons des datasets `ids`
+
+        Sans charger les lignes ni émettre post_delete (qui désactiverait la
+        suppression rapide de Django) : l'appelant signale la modification
+        par catalogue_modifie() et mesure les agrégats par suivre_statistiques.
+        """
+        modeles = [Contact, Publication, DateInfo, Dataset.tags.through]
+        modeles += [getattr(Dataset, relation).through for relation, _ in RELATIONS_TERMES.values()]
+        for Modele in modeles:
+            Modele.objects.filter(dataset_id__in=ids)._raw_delete(Modele.objects.db)
+
+    def retirer_disparus(self, source, vus):
+        """Marque comme retirés les datasets de la source absents de la moisson"""
+        actifs = Dataset.objects.actifs().filter(source=source).values_list('id', 'global_id', 'url')
+        disparus = [pk for pk, global_id, url in actifs if self.cle_dataset(global_id, url) not in vus]
+        maintenant = timezone.now()
+        for debut in range(0, len(disparus), 1000):
+            with suivre_statistiques(disparus[debut:debut + 1000]) as lot:
+                Dataset.objects.filter(id__in=lot).update(removed_at=maintenant)
+        if disparus:
+            catalogue_modifie()
+        return len(disparus)
+
+    def ecrire_lot(self, items):
+        """Écrit un lot d'items dans une seule transaction avec bulk_create"""
+        debut = time.perf_counter()
+        prepares = []
+        erreurs = 0
+        for item in items:
+            try:
+                prepares.append(self.preparer_item(item))
+            except Exception as e:
+                print(f"Item ignoré : {e}")
+                erreurs += 1
+
+        try:
+            lignes = self._inserer_prepares(prepares)
+        except Exception as e:
+            # Un seul item invalide fait échouer tout le lot : on rejoue
+            # le lot item par item pour ne perdre que les items fautifs.
+            print(f"Erreur sur le lot ({e}), reprise item par item")
+            lignes = 0
+            ecrits = []
+            for prepare in prepares:
+                try:
+                    lignes += self._inserer_prepares([prepare])
+                    ecrits.append(prepare)
+                except Exception as e:
+                    print(f"Erreur : {e}")
+                    erreurs += 1
+            prepares = ecrits
+
+        duree = time.perf_counter() - debut
+        return {
+            'datasets': len(prepares),
+            'lignes': lignes,
+            'erreurs': erreurs,
+            'duree': duree,
+            'lignes_par_seconde': lignes / duree if duree else 0.0,
+        }
+
+    def _inserer_prepares(self, prepares, source=''):
+        """Insère des items préparés dans une transaction et retourne le nombre de lignes"""
+        if not prepares:
+            return 0
+        with suivre_statistiques([]) as ids:
+            datasets = self._inserer_datasets(
+                [Dataset(source=source, **prepare['dataset']) for prepare in prepares]
+            )
+            ids.extend(dataset.pk for dataset in datasets)
+            lignes_enfants = self._inserer_enfants(datasets, prepares)
+            # bulk_create n'émet pas de signaux
+            catalogue_modifie()
+
+        return len(datasets) + lignes_enfants
+
+    def _inserer_enfants(self, datasets, prepares):
+        """Insère les contacts, publications et dates des datasets donnés"""
+        contacts = [
+            Contact(dataset_id=dataset.pk, **contact)
+            for dataset, prepare in zip(datasets, prepares)
+            for contact in prepare['contacts']
+        ]
+        publications = [
+            Publication(dataset_id=dataset.pk, **publication)
+            for dataset, prepare in zip(datasets, prepares)
+            for publication in prepare['publications']
+        ]
+        dates = [
+            DateInfo(dataset_id=dataset.pk, **prepare['dates'])
+            for dataset, prepare in zip(datasets, prepares)
+        ]
+        Contact.objects.bulk_create(contacts)
+        Publication.objects.bulk_create(publications)
+        DateInfo.objects.bulk_create(dates)
+        liens = self._lier_termes(datasets, prepares)
+        liens += lier_tags([(dataset.pk, prepare['tags']) for dataset, prepare in zip(datasets, prepares)])
+
+        return len(contacts) + len(publications) + len(dates) + liens
+
+    def _lier_termes(self, datasets, prepares):
+        """Crée les termes manquants et relie les datasets à leurs mots-clés, sujets et auteurs"""
+        liens_crees = 0
+        for cle, (relation, Terme) in RELATIONS_TERMES.items():
+            libelles = {}
+            for prepare in prepares:
+                for normalise, libelle in prepare['termes'][cle].items():
+                    libelles.setdefault(normalise, libelle)
+            if not libelles:
+                continue
+
+            ids = dict(Terme.objects.filter(normalized__in=libelles).values_list('normalized', 'id'))
+            manquants = [Terme(name=libelles[n], normalized=n) for n in libelles if n not in ids]
+            if manquants:
+                # ignore_conflicts : un autre processus peut créer le même terme
+                Terme.objects.bulk_create(manquants, ignore_conflicts=True)
+                ids.update(
+                    Terme.objects.filter(normalized__in=[t.normalized for t in manquants])
+                    .values_list('normalized', 'id')
+                )
+
+            Lien = getattr(Dataset, relation).through
+            colonne = f"{Terme._meta.model_name}_id"
+            liens = [
+                Lien(dataset_id=dataset.pk, **{colonne: ids[normalise]})
+                for dataset, prepare in zip(datasets, prepares)
+                for normalise in prepare['termes'][cle]
+            ]
+            Lien.objects.bulk_create(liens, ignore_conflicts=True)
+            liens_crees += len(liens)
+        return liens_crees
+
+    def _inserer_datasets(self, datasets):
+        """Insère les datasets et renseigne leurs clés primaires
+
+        bulk_create ne renvoie les clés qu'avec INSERT ... RETURNING
+        (PostgreSQL, SQLite, MariaDB). Ailleurs (MySQL), rien ne distingue
+        les lignes du lot de celles d'un autre processus ni deux items de
+        même global_id : chaque dataset est inséré seul pour lire sa clé.
+        """
+        if connections[Dataset.objects.db].features.can_return_rows_from_bulk_insert:
+            datasets = Dataset.objects.bulk_create(datasets)
+        else:
+            for dataset in datasets:
+                dataset.save(force_insert=True)
+        sans_cle = sum(1 for dataset in datasets if dataset.pk is None)
+        if sans_cle:
+            raise DatabaseError(f"{sans_cle} dataset(s) insérés sans clé primaire sur {len(datasets)}")
+        return datasets
@@ -0,0 +1,156 @@
+import gzip
+import itertools
+import json
+
+import requests
+
+# Chaque ligne d'un enregistrement est une page de l'API de recherche :
+# {"q": ..., "start": ..., "total_count": ..., "items": [...]}
+# Le fichier est compressé en gzip et lu en flux, page par page.
+
+
+def lire_pages(fichier):
+    """Produit les pages d'un enregistrement, une à une"""
+    with gzip.open(fichier, 'rt', encoding='utf-8') as f:
+        for ligne in f:
+            if ligne.strip():
+                yield json.loads(ligne)
+
+
+def ecrire_page(flux, page):
+    flux.write(json.dumps(page, ensure_ascii=False))
+    flux.write('\n')
+
+
+class ReponseEnregistree:
+    """Réponse minimale compatible requests servie depuis un enregistrement"""
+
+    def __init__(self, donnees, status_code=200):
+        self.donnees = donnees
+        self.status_code = status_code
+
+    def json(self):
+        return self.donnees
+
+
+class SessionEnregistreuse:
+    """Enveloppe une session HTTP et copie chaque page reçue dans un fichier JSONL compressé"""
+
+    def __init__(self, fichier, session=None):
+        self.session = session or requests
+        self.flux = gzip.open(fichier, 'wt', encoding='utf-8')
+
+    def get(self, url, params=None, **kwargs):
+        response = self.session.get(url, params=params, **kwargs)
+        if response.status_code == 200:
+            data = response.json()['data']
+            ecrire_page(self.flux, {
+                'q': (params or {}).get('q'),
+                'start': data.get('start', (params or {}).get('start', 0)),
+                'total_count': data.get('total_count', 0),
+                'items': data['items'],
+            })
+        return response
+
+    def fermer(self):
+        self.flux.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+class SessionRejeu:
+    """Sert les pages de l'API depuis un enregistrement, sans réseau
+
+    Les items sont relus en flux : les pages demandées dans l'ordre
+    (le cas de parcourir_pages) ne demandent qu'un seul passage sur le
+    fichier, quelle que soit sa taille.
+    """
+
+    def __init__(self, fichier):
+        self.fichier = fichier
+        self.total = None
+        self.items = None
+        self.position = 0
+
+    def rembobiner(self):
+        pages = lire_pages(self.fichier)
+        premiere = next(pages, None)
+        if premiere is None:
+            self.total = 0
+            self.items = iter(())
+        else:
+            self.total = premiere.get('total_count') or 0
+            self.items = itertools.chain(
+                premiere['items'],
+                (item for page in pages for item in page['items']),
+            )
+        self.position = 0
+
+    def get(self, url, params=None, **kwargs):
+        params = params or {}
+        start = int(params.get('start', 0))
+        per_page = int(params.get('per_page', 10))
+        if self.items is None or start < self.position:
+            self.rembobiner()
+        # Saute les items déjà servis ou ignorés
+        for _ in itertools.islice(self.items, start - self.position):
+            self.position += 1
+        items = list(itertools.islice(self.items, per_page))
+        self.position += len(items)
+        return ReponseEnregistree({
+            'status': 'OK',
+            'data': {
+                'q': params.get('q'),
+                'start': start,
+                'total_count': self.total,
+                'count_in_response': len(items),
+                'items': items,
+            },
+        })
+
+
+def gonfler_enregistrement(source, destination, taille, per_page=1000):
+    """Écrit un enregistrement de `taille` items en dupliquant ceux de `source`
+
+    Chaque copie reçoit un DOI et une URL distincts pour être traitée
+    comme un nouveau dataset. Le fichier source est relu à chaque cycle,
+    la mémoire reste donc bornée à une page.
+    """
+    ecrits = 0
+    copie = 0
+    page = []
+    with gzip.open(destination, 'wt', encoding='utf-8') as flux:
+        while ecrits < taille:
+            lus = 0
+            for page_source in lire_pages(source):
+                for item in page_source['items']:
+                    if ecrits >= taille:
+                        break
+                    page.append(dupliquer_item(item, copie))
+                    ecrits += 1
+                    lus += 1
+                    if len(page) == per_page:
+                        ecrire_page(flux, {'q': page_source.get('q'), 'start': ecrits - len(page), 'total_count': taille, 'items': page})
+                        page = []
+            if not lus:
+                raise ValueError(f"Enregistrement vide : {source}")
+            copie += 1
+        if page:
+            ecrire_page(flux, {'q': None, 'start': ecrits - len(page), 'total_count': taille, 'items': page})
+    return ecrits
+
+
+def dupliquer_item(item, copie):
+    if copie == 0:
+        return item
+    item = dict(item)
+    suffixe = f"-x{copie}"
+    if item.get('global_id'):
+        item['global_id'] = f"{item['global_id']}{suffixe}"
+    if item.get('url'):
+        item['url'] = f"{item['url']}{suffixe}"
+    return item
@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..models import HarvestConfig
+from .MesServices import ImportateurDatasets, PER_PAGE_MAX
+
+
+def lire_configuration(config):
+    """Retourne (url_api, recherche, parametres) d'une HarvestConfig"""
+    morceaux = urlsplit(config.source_url)
+    chemin = morceaux.path if morceaux.path not in ('', '/') else '/api/search'
+    url_api = urlunsplit((morceaux.scheme, morceaux.netloc, chemin, '', ''))
+
+    parametres = dict(parse_qsl(morceaux.query))
+    filtres = (config.filters or '').strip()
+    if '=' in filtres:
+        # Filtres au format query string : "q=fleuve&subtree=ogsl"
+        parametres.update(parse_qsl(filtres))
+    elif filtres:
+        parametres['q'] = filtres
+
+    recherche = parametres.pop('q', '*')
+    # Ces paramètres sont gérés par la pagination de l'importateur
+    for cle in ('type', 'start', 'per_page'):
+        parametres.pop(cle, None)
+    return url_api, recherche, parametres
+
+
+class SessionLimitee:
+    """Session HTTP d'un hôte : connexions persistantes et nombre de requêtes simultanées borné"""
+
+    def __init__(self, session, limite):
+        self.session = session
+        self.semaphore = threading.BoundedSemaphore(limite)
+
+    def get(self, url, **kwargs):
+        with self.semaphore:
+            return self.session.get(url, **kwargs)
+
+
+class PoolSessions:
+    """Une session requests par hôte, avec keep-alive et reprise sur erreur"""
+
+    def __init__(self, limite_par_hote=2, tentatives=3, facteur_attente=0.5):
+        self.limite_par_hote = limite_par_hote
+        self.tentatives = tentatives
+        self.facteur_attente = facteur_attente
+        self.sessions = {}
+        self.verrou = threading.Lock()
+
+    def session_pour(self, url):
+        hote = urlsplit(url).netloc
+        with self.verrou:
+            if hote not in self.sessions:
+                self.sessions[hote] = SessionLimitee(self.creer_session(), self.limite_par_hote)
+            return self.sessions[hote]
+
+    def creer_session(self):
+        reprise = Retry(
+            total=self.tentatives,
+            backoff_factor=self.facteur_attente,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+            respect_retry_after_header=True,
+        )
+        adaptateur = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.limite_par_hote,
+            max_retries=reprise,
+        )
+        session = requests.Session()
+        session.mount('https://', adaptateur)
+        session.mount('http://', adaptateur)
+        return session
+
+    def fermer(self):
+        for session in self.sessions.values():
+            session.session.close()
+        self.sessions.clear()
+
+
+class MoissonneurConcurrent:
+    """Moissonne toutes les sources actives en parallèle avec un seul écrivain"""
+
+    def __init__(self, max_workers=None, limite_par_hote=2, taille_file=8, taille_lot=200, per_page=PER_PAGE_MAX):
+        # None : une source par thread, au plus MOISSONNAGE_WORKERS_MAX
+        self.max_workers = max_workers
+        self.taille_file = taille_file
+        self.taille_lot = taille_lot
+        self.per_page = per_page
+        self.pool = PoolSessions(limite_par_hote=limite_par_hote)
+        self.arret = threading.Event()
+
+    def creer_importateur(self, config):
+        url_api, recherche, parametres = lire_configuration(config)
+        importateur = ImportateurDatasets(
+            taille_lot=self.taille_lot,
+            per_page=self.per_page,
+            url_api=url_api,
+            session=self.pool.session_pour(url_api),
+            parametres=parametres,
+        )
+        return importateur, recherche
+
+    def nombre_workers(self, configs):
+        """Threads de récolte : toutes les sources à la fois, dans la limite réglée"""
+        limite = self.max_workers or settings.MOISSONNAGE_WORKERS_MAX
+        return max(1, min(len(configs), limite))
+
+    def moissonner(self, configs=None):
+        """Moissonne les configurations données (par défaut toutes les actives)"""
+        if configs is None:
+            configs = HarvestConfig.objects.filter(active=True)
+        configs = list(configs)
+        if not configs:
+            print("Aucune source de moissonnage active.")
+            return []
+
+        debut = time.perf_counter()
+        # File bornée : les récolteurs attendent si l'écrivain prend du retard
+        file = queue.Queue(maxsize=self.taille_file)
+        sources = {}
+        for config in configs:
+            importateur, recherche = self.creer_importateur(config)
+            source = importateur.source_recherche(recherche)
+            sources[config.pk] = {
+                'config': config,
+                'importateur': importateur,
+                'recherche': recherche,
+                'source': source,
+                'vus': set(),
+                'rapport': importateur.nouveau_rapport(source),
+            }
+
+        self.arret.clear()
+        rapports = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.nombre_workers(configs)) as executeur:
+                for etat in sources.values():
+                    executeur.submit(self.recolter, etat['config'].pk, etat['importateur'], etat['recherche'], file)
+                try:
+                    rapports = self.ecrire(sources, file)
+                finally:
+                    # Débloque les récolteurs si l'écrivain s'est arrêté en erreur
+                    self.arret.set()
+        finally:
+            self.pool.fermer()
+
+        duree = time.perf_counter() - debut
+        print(f"\nMOISSONNAGE CONCURRENT TERMINÉ : {len(configs)} sources en {duree:.2f}s")
+        return rapports
+
+    def recolter(self, config_id, importateur, recherche, file):
+        """Récupère les pages d'une source (thread de travail, sans accès à la base)"""
+        try:
+            for page in importateur.parcourir_pages(recherche):
+                if not self.deposer(file, ('page', config_id, page)):
+                    return
+            self.deposer(file, ('fin', config_id, None))
+        except Exception as e:
+            self.deposer(file, ('erreur', config_id, e))
+
+    def deposer(self, file, message):
+        while not self.arret.is_set():
+            try:
+                file.put(message, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def ecrire(self, sources, file):
+        """Seul écrivain : applique les pages reçues à la base, source par source"""
+        rapports = []
+        restantes = len(sources)
+        while restantes:
+            nature, config_id, contenu = file.get()
+            etat = sources[config_id]
+            importateur = etat['importateur']
+
+            if nature == 'page':
+                importateur.synchroniser_page(contenu, etat['source'], etat['vus'], etat['rapport'])
+                continue
+
+            if nature == 'erreur':
+                print(f"Moisson interrompue pour {etat['source']} : {contenu}")
+                etat['rapport']['complete'] = False
+            rapport = importateur.terminer_synchronisation(etat['source'], etat['vus'], etat['rapport'])
+            rapport['config_id'] = config_id
+            rapports.append(rapport)
+            restantes -= 1
+        return rapports
@@ -0,0 +1,194 @@
+import os
+import re
+import socket
+import threading
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import HarvestConfig, HarvestRun
+from .moissonnage import MoissonneurConcurrent
+
+FREQUENCES_NOMMEES = {
+    'horaire': timedelta(hours=1),
+    'hourly': timedelta(hours=1),
+    'quotidienne': timedelta(days=1),
+    'quotidien': timedelta(days=1),
+    'journaliere': timedelta(days=1),
+    'journalière': timedelta(days=1),
+    'daily': timedelta(days=1),
+    'hebdomadaire': timedelta(weeks=1),
+    'weekly': timedelta(weeks=1),
+    'mensuelle': timedelta(days=30),
+    'mensuel': timedelta(days=30),
+    'monthly': timedelta(days=30),
+}
+
+UNITES = {
+    'm': timedelta(minutes=1), 'min': timedelta(minutes=1), 'minute': timedelta(minutes=1),
+    'h': timedelta(hours=1), 'heure': timedelta(hours=1), 'hour': timedelta(hours=1),
+    'j': timedelta(days=1), 'jour': timedelta(days=1), 'd': timedelta(days=1), 'day': timedelta(days=1),
+    'w': timedelta(weeks=1), 'semaine': timedelta(weeks=1), 'week': timedelta(weeks=1),
+}
+
+FORMAT_INTERVALLE = re.compile(r'^(?:toutes\s+les\s+|every\s+)?(\d+)\s*([a-zé]+?)s?$')
+
+
+def parser_frequence(frequence):
+    """Convertit HarvestConfig.frequency en intervalle (None si illisible)
+
+    Accepte les noms usuels ("quotidienne", "hebdomadaire", "daily"...)
+    et les intervalles ("30m", "6h", "2j", "toutes les 12 heures").
+    """
+    texte = (frequence or '').strip().lower()
+    if texte in FREQUENCES_NOMMEES:
+        return FREQUENCES_NOMMEES[texte]
+    correspondance = FORMAT_INTERVALLE.match(texte)
+    if not correspondance:
+        return None
+    nombre, unite = correspondance.groups()
+    if unite not in UNITES or int(nombre) == 0:
+        return None
+    return int(nombre) * UNITES[unite]
+
+
+def identifiant_processus():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def configs_dues(maintenant=None):
+    """Configurations actives dont la prochaine exécution est échue"""
+    maintenant = maintenant or timezone.now()
+    dues = []
+    for config in HarvestConfig.objects.filter(active=True):
+        intervalle = parser_frequence(config.frequency)
+        if intervalle is None:
+            print(f"Fréquence illisible ignorée : '{config.frequency}' ({config.source_url})")
+            continue
+        if config.last_run_at is None or config.last_run_at + intervalle <= maintenant:
+            dues.append(config)
+    return dues
+
+
+def acquerir_verrou(config, proprietaire, duree, intervalle=None):
+    """Prend le verrou d'une source par une mise à jour conditionnelle atomique
+
+    Avec un intervalle, la source doit encore être échue au moment de la
+    mise à jour : un processus qui l'a lue échue avant qu'un autre ne la
+    moissonne et ne libère son verrou ne la relance pas.
+    """
+    maintenant = timezone.now()
+    conditions = Q(locked_until__isnull=True) | Q(locked_until__lt=maintenant) | Q(locked_by=proprietaire)
+    if intervalle is not None:
+        conditions &= Q(last_run_at__isnull=True) | Q(last_run_at__lte=maintenant - intervalle)
+    acquis = (
+        HarvestConfig.objects
+        .filter(pk=config.pk)
+        .filter(conditions)
+        .update(locked_by=proprietaire, locked_until=maintenant + duree)
+    )
+    return acquis == 1
+
+
+def prolonger_verrous(configs, proprietaire, duree):
+    HarvestConfig.objects.filter(pk__in=[c.pk for c in configs], locked_by=proprietaire).update(
+        locked_until=timezone.now() + duree
+    )
+
+
+def liberer_verrou(config, proprietaire, derniere_execution, reprise=None):
+    """Libère le verrou ; derniere_execution None : moisson non terminée, à reprendre
+
+    last_run_at n'est alors pas avancé, la source reste échue. Le verrou,
+    rendu sans propriétaire, court jusqu'à `reprise` : aucun processus ne
+    la relance avant.
+    """
+    if derniere_execution is None:
+        HarvestConfig.objects.filter(pk=config.pk, locked_by=proprietaire).update(
+            locked_by='', locked_until=reprise
+        )
+        return
+    HarvestConfig.objects.filter(pk=config.pk, locked_by=proprietaire).update(
+        locked_by='', locked_until=None, last_run_at=derniere_execution
+    )
+
+
+class Planificateur:
+    """Exécute les moissons échues, une source n'étant moissonnée que par un seul processus"""
+
+    def __init__(self, duree_verrou=timedelta(minutes=30), moissonneur=None, delai_reprise=timedelta(minutes=15)):
+        self.duree_verrou = duree_verrou
+        # Attente avant de relancer une source dont la moisson a échoué
+        self.delai_reprise = delai_reprise
+        self.moissonneur = moissonneur or MoissonneurConcurrent()
+        self.proprietaire = identifiant_processus()
+
+    def executer_dues(self, forcer=False):
+        """Moissonne les sources échues (ou toutes les actives si forcer) et retourne les exécutions"""
+        candidates = list(HarvestConfig.objects.filter(active=True)) if forcer else configs_dues()
+        configs = [
+            c for c in candidates
+            if acquerir_verrou(c, self.proprietaire, self.duree_verrou,
+                               None if forcer else parser_frequence(c.frequency))
+        ]
+        ignorees = len(candidates) - len(configs)
+        if ignorees:
+            print(f"{ignorees} source(s) déjà en cours de moissonnage par un autre processus")
+        if not configs:
+            return []
+        return self.executer(configs)
+
+    def executer(self, configs):
+        debut = timezone.now()
+        executions = {
+            config.pk: HarvestRun.objects.create(config=config, worker=self.proprietaire, started_at=debut)
+            for config in configs
+        }
+
+        arret = threading.Event()
+        battement = threading.Thread(target=self.entretenir_verrous, args=(configs, arret), daemon=True)
+        battement.start()
+        try:
+            rapports = self.moissonneur.moissonner(configs)
+        except Exception as e:
+            rapports = []
+            for execution in executions.values():
+                execution.status = 'echec'
+                execution.message = str(e)
+        finally:
+            arret.set()
+            battement.join()
+
+        fin = timezone.now()
+        for rapport in rapports:
+            execution = executions[rapport['config_id']]
+            execution.status = 'succes' if rapport['complete'] else 'interrompu'
+            execution.inserted = rapport['inseres']
+            execution.updated = rapport['mis_a_jour']
+            execution.unchanged = rapport['inchanges']
+            execution.removed = rapport['retires']
+            execution.errors = rapport['erreurs']
+            execution.duration = rapport['duree']
+        for config in configs:
+            execution = executions[config.pk]
+            if execution.status == 'en_cours':
+                execution.status = 'echec'
+            execution.finished_at = fin
+            if execution.duration is None:
+                execution.duration = (fin - debut).total_seconds()
+            execution.save()
+            if execution.status == 'succes':
+                liberer_verrou(config, self.proprietaire, debut)
+            else:
+                liberer_verrou(config, self.proprietaire, None, reprise=fin + self.delai_reprise)
+        return list(executions.values())
+
+    def entretenir_verrous(self, configs, arret):
+        """Prolonge les verrous tant que la moisson dure (thread dédié)"""
+        try:
+            while not arret.wait(self.duree_verrou.total_seconds() / 3):
+                prolonger_verrous(configs, self.proprietaire, self.duree_verrou)
+        finally:
+            connection.close()
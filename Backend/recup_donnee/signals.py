@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal
+
+from .catalogue import catalogue_modifie
+from .models import Contact, Dataset, DateInfo, HarvestConfig, Publication
+from .statistiques import reconstruire_si_perimees, statistiques_modifiees
+
+# Envoyé après une moisson complète (arguments : source, rapport)
+harvest_termine = Signal()
+# Envoyé après une modification du catalogue dans l'admin (sender : modèle modifié)
+catalogue_edite = Signal()
+# Envoyé à chaque tour du planificateur (moissonner) : travaux différés hors requête
+tour_planificateur = Signal()
+
+for modele in (Dataset, Contact, Publication, DateInfo, HarvestConfig):
+    post_save.connect(catalogue_modifie, sender=modele, dispatch_uid=f"catalogue_save_{modele.__name__}")
+    post_delete.connect(catalogue_modifie, sender=modele, dispatch_uid=f"catalogue_delete_{modele.__name__}")
+
+for relation in ('keyword_terms', 'subject_terms', 'author_terms', 'tags'):
+    m2m_changed.connect(
+        catalogue_modifie, sender=getattr(Dataset, relation).through, dispatch_uid=f"catalogue_{relation}"
+    )
+
+# Écritures hors importateur (admin, API) : agrégats à reconstruire
+for modele in (Dataset, Contact, Publication, DateInfo):
+    post_save.connect(statistiques_modifiees, sender=modele, dispatch_uid=f"statistiques_save_{modele.__name__}")
+    post_delete.connect(statistiques_modifiees, sender=modele, dispatch_uid=f"statistiques_delete_{modele.__name__}")
+m2m_changed.connect(
+    statistiques_modifiees, sender=Dataset.keyword_terms.through, dispatch_uid="statistiques_keyword_terms"
+)
+
+
+def statistiques_apres_ecriture(sender, **kwargs):
+    """Fin de moisson ou édition dans l'admin : agrégats périmés reconstruits après le commit"""
+    def reconstruire():
+        try:
+            reconstruire_si_perimees()
+        except Exception as e:
+            print(f"Statistiques non reconstruites : {e}")
+    transaction.on_commit(reconstruire)
+
+
+harvest_termine.connect(statistiques_apres_ecriture, dispatch_uid="statistiques_apres_moisson")
+catalogue_edite.connect(statistiques_apres_ecriture, dispatch_uid="statistiques_apres_edition")
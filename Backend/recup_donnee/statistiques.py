@@ -0,0 +1,281 @@
+"""
+Statistiques du catalogue tenues à jour au fil des écritures.
+
+Les totaux, les histogrammes mensuels (publication, création,
+modification), les affiliations et les mots-clés sont stockés dans des
+tables d'agrégats (CatalogStats, MonthlyStat, AffiliationStat,
+KeywordStat) : les pages de statistiques lisent quelques lignes au lieu de
+compter les tables.
+
+L'importateur encadre chaque écriture par suivre_statistiques(ids) : la
+contribution des datasets concernés est mesurée avant et après, et la
+différence est appliquée dans la même transaction. L'import historique
+ligne par ligne passe par statistiques_perimees() et ne fait que marquer
+les agrégats une fois à la fin. Les autres écritures
+(admin, API) marquent les agrégats à reconstruire : ils le sont hors des
+requêtes de lecture, après une moisson ou une édition dans l'admin, à
+chaque tour du planificateur ou par `manage.py reconstruire_statistiques`.
+Entre-temps, les lectures servent les derniers agrégats (a_reconstruire).
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .catalogue import une_fois_apres_commit
+from .models import AffiliationStat, CatalogStats, Contact, Dataset, DateInfo, KeywordStat, MonthlyStat, Publication
+
+# Colonne de DateInfo de chaque histogramme
+COLONNES_MOIS = {
+    MonthlyStat.PUBLISHED: 'published_at',
+    MonthlyStat.CREATED: 'created_at',
+    MonthlyStat.UPDATED: 'updated_at',
+}
+TOTAUX = ('datasets', 'contacts', 'publications')
+
+# type de clé -> (modèle, champs identifiant une ligne)
+TABLES = {
+    'mois': (MonthlyStat, ('kind', 'month')),
+    'affiliation': (AffiliationStat, ('name',)),
+    'mot_cle': (KeywordStat, ('keyword_id',)),
+}
+
+LIMITE_DEFAUT = 10
+
+# Vrai pendant une écriture suivie : les signaux ne marquent rien
+_suivi = ContextVar('statistiques_suivies', default=False)
+
+
+def contributions(ids=None):
+    """Contribution des datasets actifs `ids` (tous si None) aux agrégats
+
+    Retourne un Counter indexé par ('total', nom), ('mois', type, date),
+    ('affiliation', nom) et ('mot_cle', id).
+    """
+    datasets = Dataset.objects.actifs()
+    if ids is not None:
+        if not ids:
+            return Counter()
+        datasets = datasets.filter(id__in=ids)
+    selection = datasets.values('id')
+
+    resultat = Counter({
+        ('total', 'datasets'): datasets.count(),
+        ('total', 'contacts'): Contact.objects.filter(dataset_id__in=selection).count(),
+        ('total', 'publications'): Publication.objects.filter(dataset_id__in=selection).count(),
+    })
+    for kind, colonne in COLONNES_MOIS.items():
+        lignes = (
+            DateInfo.objects.filter(dataset_id__in=selection)
+            .annotate(mois=TruncMonth(colonne))
+            .values('mois')
+            .annotate(nombre=Count('id'))
+            .order_by()
+        )
+        for ligne in lignes:
+            resultat[('mois', kind, ligne['mois'].date())] += ligne['nombre']
+    lignes = (
+        Contact.objects.filter(dataset_id__in=selection)
+        .exclude(affiliation__isnull=True).exclude(affiliation='')
+        .values('affiliation')
+        .annotate(nombre=Count('dataset_id', distinct=True))
+        .order_by()
+    )
+    for ligne in lignes:
+        resultat[('affiliation', ligne['affiliation'])] += ligne['nombre']
+    lignes = (
+        Dataset.keyword_terms.through.objects.filter(dataset_id__in=selection)
+        .values('keyword_id')
+        .annotate(nombre=Count('dataset_id'))
+        .order_by()
+    )
+    for ligne in lignes:
+        resultat[('mot_cle', ligne['keyword_id'])] += ligne['nombre']
+    return resultat
+
+
+def verrouiller():
+    """Ligne des totaux verrouillée jusqu'à la fin de la transaction
+
+    Sérialise les mises à jour des agrégats entre processus de moisson.
+    """
+    CatalogStats.objects.get_or_create(pk=1)
+    return CatalogStats.objects.select_for_update().get(pk=1)
+
+
+def appliquer_variations(variations):
+    """Ajoute des variations (Counter de contributions, négatives comprises) aux agrégats"""
+    variations = {cle: nombre for cle, nombre in variations.items() if nombre}
+    if not variations:
+        return
+    with transaction.atomic():
+        verrouiller()
+        incoherent = False
+        for type_cle, (Modele, champs) in TABLES.items():
+            par_cle = {cle[1:]: nombre for cle, nombre in variations.items() if cle[0] == type_cle}
+            if not par_cle:
+                continue
+            filtres = {f"{champ}__in": {cle[i] for cle in par_cle} for i, champ in enumerate(champs)}
+            existants = {
+                tuple(getattr(ligne, champ) for champ in champs): ligne
+                for ligne in Modele.objects.filter(**filtres)
+            }
+            a_modifier, a_supprimer, a_creer = [], [], []
+            for cle, nombre in par_cle.items():
+                ligne = existants.get(cle)
+                if ligne is None:
+                    if nombre > 0:
+                        a_creer.append(Modele(count=nombre, **dict(zip(champs, cle))))
+                    else:
+                        incoherent = True
+                    continue
+                ligne.count += nombre
+                if ligne.count > 0:
+                    a_modifier.append(ligne)
+                else:
+                    incoherent |= ligne.count < 0
+                    a_supprimer.append(ligne.pk)
+            Modele.objects.bulk_update(a_modifier, ['count'])
+            Modele.objects.filter(pk__in=a_supprimer).delete()
+            Modele.objects.bulk_create(a_creer)
+
+        CatalogStats.objects.filter(pk=1).update(
+            updated_at=timezone.now(),
+            **{nom: F(nom) + variations.get(('total', nom), 0) for nom in TOTAUX},
+            # Un compteur négatif trahit une écriture non suivie
+            **({'stale': True} if incoherent else {}),
+        )
+
+
+@contextmanager
+def suivre_statistiques(ids):
+    """Met à jour les agrégats des datasets `ids` modifiés dans le bloc
+
+    La liste peut être complétée dans le bloc (datasets insérés) :
+
+        with suivre_statistiques([]) as ids:
+            ids.extend(d.pk for d in Dataset.objects.bulk_create(...))
+    """
+    ids = list(ids)
+    with transaction.atomic():
+        avant = contributions(ids)
+        jeton = _suivi.set(True)
+        try:
+            yield ids
+        finally:
+            _suivi.reset(jeton)
+        variations = contributions(ids)
+        variations.subtract(avant)
+        appliquer_variations(variations)
+
+
+def marquer_perimees():
+    CatalogStats.objects.filter(pk=1).update(stale=True)
+
+
+@contextmanager
+def statistiques_perimees():
+    """Écritures en série sans suivi par ligne : agrégats marqués périmés une fois, à la fin
+
+    Pour l'import historique, où suivre_statistiques coûterait deux
+    contributions() et un verrou par dataset.
+    """
+    jeton = _suivi.set(True)
+    try:
+        yield
+    finally:
+        _suivi.reset(jeton)
+        marquer_perimees()
+
+
+def statistiques_modifiees(**kwargs):
+    """Receiver des écritures hors importateur : agrégats à reconstruire après le commit"""
+    if _suivi.get():
+        return
+    une_fois_apres_commit(marquer_perimees)
+
+
+def reconstruire_statistiques(si_perimees=False):
+    """Recalcule tous les agrégats depuis les tables, en une transaction
+
+    si_perimees : rien à faire si, une fois le verrou obtenu, les agrégats
+    ne sont plus périmés (reconstruits par un autre processus entre-temps).
+    """
+    with transaction.atomic():
+        etat = verrouiller()
+        if si_perimees and not etat.stale:
+            return etat
+        for Modele, _ in TABLES.values():
+            Modele.objects.all().delete()
+        total = contributions()
+        for type_cle, (Modele, champs) in TABLES.items():
+            Modele.objects.bulk_create([
+                Modele(count=nombre, **dict(zip(champs, cle[1:])))
+                for cle, nombre in total.items()
+                if cle[0] == type_cle and nombre > 0
+            ], batch_size=1000)
+        maintenant = timezone.now()
+        CatalogStats.objects.filter(pk=1).update(
+            stale=False, rebuilt_at=maintenant, updated_at=maintenant,
+            **{nom: total[('total', nom)] for nom in TOTAUX},
+        )
+    return CatalogStats.objects.get(pk=1)
+
+
+def reconstruire_si_perimees():
+    """Reconstruction hors lecture, seulement si des écritures non suivies l'exigent"""
+    if CatalogStats.objects.filter(pk=1, stale=True).exists():
+        return reconstruire_statistiques(si_perimees=True)
+    return None
+
+
+def requetes_lecture(limite):
+    """Requêtes des histogrammes, des affiliations et des mots-clés les plus fréquents"""
+    return (
+        MonthlyStat.objects.order_by('kind', 'month').values_list('kind', 'month', 'count'),
+        AffiliationStat.objects.order_by('-count', 'name').values_list('name', 'count')[:limite],
+        KeywordStat.objects.order_by('-count', 'keyword__name').values_list('keyword__name', 'count')[:limite],
+    )
+
+
+def mettre_en_forme(etat, mois_lignes, affiliations, mots_cles):
+    mois = {kind: [] for kind in COLONNES_MOIS}
+    for kind, month, nombre in mois_lignes:
+        mois[kind].append({'mois': month.strftime('%Y-%m'), 'nombre': nombre})
+    return {
+        'totaux': {nom: getattr(etat, nom) for nom in TOTAUX},
+        'mois': mois,
+        'affiliations': [{'nom': nom, 'nombre': nombre} for nom, nombre in affiliations],
+        'mots_cles': [{'nom': nom, 'nombre': nombre} for nom, nombre in mots_cles],
+        'mis_a_jour_le': etat.updated_at,
+        'reconstruit_le': etat.rebuilt_at,
+        'a_reconstruire': etat.stale,
+    }
+
+
+def lire_statistiques(limite=LIMITE_DEFAUT):
+    """Statistiques lues dans les agrégats, périmés ou non
+
+    Seuls des agrégats jamais construits le sont ici ; les lecteurs
+    simultanés attendent le verrou puis lisent le résultat.
+    """
+    etat = CatalogStats.objects.filter(pk=1).first()
+    if etat is None or etat.rebuilt_at is None:
+        etat = reconstruire_statistiques(si_perimees=True)
+    return mettre_en_forme(etat, *(list(requete) for requete in requetes_lecture(limite)))
+
+
+async def alire_statistiques(limite=LIMITE_DEFAUT):
+    """lire_statistiques() par l'ORM asynchrone ; la reconstruction reste synchrone"""
+    etat = await CatalogStats.objects.filter(pk=1).afirst()
+    if etat is None or etat.rebuilt_at is None:
+        etat = await sync_to_async(reconstruire_statistiques)(si_perimees=True)
+    lignes = []
+    for requete in requetes_lecture(limite):
+        lignes.append([ligne async for ligne in requete])
+    return mettre_en_forme(etat, *lignes)
@@ -0,0 +1,20 @@
+import unicodedata
+
+LONGUEUR_TERME = 255
+
+
+def normaliser_terme(terme):
+    """Forme de comparaison d'un terme : sans accents, en minuscules, espaces réduits"""
+    decompose = unicodedata.normalize('NFKD', str(terme))
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(sans_accents.casefold().split())[:LONGUEUR_TERME]
+
+
+def termes_uniques(termes):
+    """Dédoublonne une liste de termes bruts par forme normalisée, dans l'ordre"""
+    uniques = {}
+    for terme in termes or []:
+        normalise = normaliser_terme(terme)
+        if normalise and normalise not in uniques:
+            uniques[normalise] = str(terme).strip()[:LONGUEUR_TERME]
+    return uniques
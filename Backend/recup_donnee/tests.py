@@ -0,0 +1,561 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Author, Contact, Dataset, DateInfo, HarvestConfig, HarvestRun, Keyword, Publication, Subject
+from .services.MesServices import ImportateurDatasets
+from .services.enregistrement import SessionRejeu, gonfler_enregistrement, lire_pages
+from .services.moissonnage import MoissonneurConcurrent, PoolSessions, SessionLimitee, lire_configuration
+from .services.planification import (
+    Planificateur, acquerir_verrou, configs_dues, liberer_verrou, parser_frequence, prolonger_verrous,
+)
+
+
+def item(i, **champs):
+    """Item de l'API de recherche Borealis, tel que renvoyé dans data.items"""
+    return {
+        'global_id': f"doi:10.5683/SP3/F{i:04d}",
+        'url': f"https://doi.org/10.5683/SP3/F{i:04d}",
+        'name_of_dataverse': f"Jeu {i}",
+        'identifier_of_dataverse': 'ogsl',
+        'description': f"Relevés {i} du fleuve",
+        'keywords': ['Océan', f"Mot {i % 3}"],
+        'subjects': ['Earth and Environmental Sciences'],
+        'authors': [f"Auteur {i % 2}", 'Doe, John'],
+        'contacts': [{'name': f"Contact {i}", 'affiliation': 'UQAR'}] * (1 + i % 2),
+        'publications': [{'citation': f"Citation {i}", 'url': 'https://doi.org/x'}] * (i % 2),
+        'published_at': f"20{10 + i:02d}-03-01T00:00:00Z",
+        'createdAt': '2009-01-01T00:00:00Z',
+        'updatedAt': '2009-02-01T00:00:00Z',
+        **champs,
+    }
+
+
+class ReponseFactice:
+    def __init__(self, status_code, donnees=None):
+        self.status_code = status_code
+        self.donnees = donnees
+
+    def json(self):
+        return self.donnees
+
+
+class SessionFactice:
+    """Session compatible requests servant `items` page par page (start, per_page)
+
+    Les positions de `pannes` répondent 503 ; total_count peut être faussé.
+    """
+
+    def __init__(self, items, pannes=(), total=None):
+        self.items = items
+        self.pannes = set(pannes)
+        self.total = len(items) if total is None else total
+        self.appels = []
+
+    def get(self, url, params=None, timeout=None):
+        start, per_page = params['start'], params['per_page']
+        self.appels.append((params['q'], start))
+        if start in self.pannes:
+            return ReponseFactice(503)
+        return ReponseFactice(200, {'data': {
+            'items': self.items[start:start + per_page], 'total_count': self.total,
+        }})
+
+
+def sans_returning():
+    """Simule une base dont bulk_create ne renvoie pas les clés (MySQL)"""
+    return mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                             new_callable=mock.PropertyMock, return_value=False)
+
+
+class ImportEnMasseTests(TestCase):
+    """ecrire_lot : datasets, enfants et termes écrits par bulk_create, lot par lot"""
+
+    def setUp(self):
+        self.importateur = ImportateurDatasets(taille_lot=2)
+
+    def verifier_import(self, items):
+        for donnees in items:
+            dataset = Dataset.objects.get(global_id=donnees['global_id'])
+            self.assertEqual(dataset.name_of_dataverse, donnees['name_of_dataverse'])
+            self.assertEqual(dataset.authors, ', '.join(donnees['authors']))
+            self.assertEqual(
+                sorted(dataset.contacts.values_list('name', 'affiliation')),
+                sorted((c['name'], c['affiliation']) for c in donnees['contacts']),
+            )
+            self.assertEqual(
+                list(dataset.publications.values_list('citation', flat=True)),
+                [p['citation'] for p in donnees['publications']],
+            )
+            self.assertEqual(dataset.date_info.published_at.year, int(donnees['published_at'][:4]))
+            self.assertEqual(sorted(dataset.author_terms.values_list('name', flat=True)),
+                             sorted(donnees['authors']))
+            self.assertEqual(sorted(dataset.keyword_terms.values_list('name', flat=True)),
+                             sorted(donnees['keywords']))
+
+    def test_lots_et_lignes(self):
+        items = [item(i) for i in range(5)]
+        rapport = self.importateur.importer_items_en_masse(items)
+        self.assertEqual([lot['datasets'] for lot in rapport['lots']], [2, 2, 1])
+        self.assertEqual(rapport['erreurs'], 0)
+        self.assertEqual(Dataset.objects.count(), 5)
+        self.assertEqual(Contact.objects.count(), 7)
+        self.assertEqual(Publication.objects.count(), 2)
+        self.assertEqual(DateInfo.objects.count(), 5)
+        # Termes partagés créés une seule fois
+        self.assertEqual(Keyword.objects.count(), 4)
+        self.assertEqual(Subject.objects.count(), 1)
+        self.assertEqual(Author.objects.count(), 3)
+        self.assertEqual(rapport['lignes'], 5 + 7 + 2 + 5 + sum(
+            len(d['keywords']) + len(d['subjects']) + len(d['authors']) for d in items
+        ) + Dataset.tags.through.objects.count())
+        self.verifier_import(items)
+
+    def test_sans_returning(self):
+        """Base sans INSERT ... RETURNING (MySQL) : chaque dataset garde ses propres enfants"""
+        items = [item(1), item(2, global_id=''), item(3, global_id='')]
+        with sans_returning():
+            rapport = self.importateur.importer_items_en_masse(items, taille_lot=3)
+        self.assertEqual(rapport['erreurs'], 0)
+        for donnees in items:
+            dataset = Dataset.objects.get(url=donnees['url'])
+            self.assertEqual(dataset.name_of_dataverse, donnees['name_of_dataverse'])
+            self.assertEqual(list(dataset.contacts.values_list('name', flat=True)),
+                             [c['name'] for c in donnees['contacts']])
+
+    def test_cle_manquante(self):
+        with sans_returning(), mock.patch.object(Dataset, 'save'):
+            rapport = self.importateur.ecrire_lot([item(1), item(2)])
+        self.assertEqual((rapport['datasets'], rapport['erreurs']), (0, 2))
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_item_invalide_rejoue_seul(self):
+        items = [item(1), item(2, contacts=[{'name': None}]), item(3)]
+        rapport = self.importateur.importer_items_en_masse(items, taille_lot=3)
+        self.assertEqual((rapport['datasets'], rapport['erreurs']), (2, 1))
+        self.assertEqual(sorted(Dataset.objects.values_list('name_of_dataverse', flat=True)), ['Jeu 1', 'Jeu 3'])
+        self.verifier_import([items[0], items[2]])
+
+
+class ParcoursPagesTests(TestCase):
+    """parcourir_pages : toutes les pages, arrêt, point de reprise"""
+
+    def setUp(self):
+        self.items = [item(i) for i in range(5)]
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.reprise = os.path.join(dossier.name, 'reprise.json')
+
+    def importateur(self, session):
+        return ImportateurDatasets(per_page=2, session=session)
+
+    def test_plusieurs_pages(self):
+        session = SessionFactice(self.items)
+        pages = list(self.importateur(session).parcourir_pages('fleuve', fichier_reprise=self.reprise))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([start for _, start in session.appels], [0, 2, 4])
+        self.assertFalse(os.path.exists(self.reprise))
+
+    def test_arret_sur_page_vide(self):
+        # total_count surestimé : la première page vide termine le parcours
+        session = SessionFactice(self.items, total=50)
+        pages = list(self.importateur(session).parcourir_pages('fleuve'))
+        self.assertEqual(sum(len(page) for page in pages), 5)
+        self.assertEqual([start for _, start in session.appels], [0, 2, 4, 5])
+
+    def test_interruption_puis_reprise(self):
+        rapport = self.importateur(SessionFactice(self.items, pannes={4})).importer_donnees_en_masse(
+            'fleuve', fichier_reprise=self.reprise)
+        self.assertFalse(rapport['complete'])
+        self.assertEqual(Dataset.objects.count(), 4)
+        with open(self.reprise, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['start'], 4)
+
+        session = SessionFactice(self.items)
+        rapport = self.importateur(session).importer_donnees_en_masse('fleuve', fichier_reprise=self.reprise)
+        self.assertTrue(rapport['complete'])
+        self.assertEqual(session.appels, [('fleuve', 4)])
+        self.assertEqual(sorted(Dataset.objects.values_list('global_id', flat=True)),
+                         [donnees['global_id'] for donnees in self.items])
+        self.assertFalse(os.path.exists(self.reprise))
+
+    def test_reprise_d_une_autre_recherche_ignoree(self):
+        importateur = self.importateur(SessionFactice(self.items))
+        importateur.ecrire_reprise(self.reprise, 'autre', 4)
+        self.assertEqual(importateur.lire_reprise(self.reprise, 'fleuve'), 0)
+        self.assertEqual(importateur.lire_reprise(self.reprise, 'autre'), 4)
+        with open(self.reprise, 'w', encoding='utf-8') as f:
+            f.write('{illisible')
+        self.assertEqual(importateur.lire_reprise(self.reprise, 'autre'), 0)
+
+
+class MoissonIncrementaleTests(TestCase):
+    """synchroniser_lot : insertion, mise à jour par empreinte, lignes inchangées et retraits"""
+
+    def setUp(self):
+        self.importateur = ImportateurDatasets(per_page=2)
+        self.items = [item(i) for i in range(5)]
+
+    def synchroniser(self, items):
+        return self.importateur.synchroniser_pages([items], 'source')
+
+    def compteurs(self, rapport):
+        return {cle: rapport[cle] for cle in ('inseres', 'mis_a_jour', 'inchanges', 'retires')}
+
+    def test_meme_charge_deux_fois(self):
+        self.assertEqual(self.compteurs(self.synchroniser(self.items)),
+                         {'inseres': 5, 'mis_a_jour': 0, 'inchanges': 0, 'retires': 0})
+        ids = sorted(Dataset.objects.values_list('id', flat=True))
+        self.assertEqual(self.compteurs(self.synchroniser(self.items)),
+                         {'inseres': 0, 'mis_a_jour': 0, 'inchanges': 5, 'retires': 0})
+        self.assertEqual(sorted(Dataset.objects.values_list('id', flat=True)), ids)
+        self.assertEqual(Contact.objects.count(), 7)
+
+    def test_mise_a_jour_sur_place(self):
+        self.synchroniser(self.items)
+        dataset = Dataset.objects.get(global_id=self.items[1]['global_id'])
+        self.items[1] = item(1, name_of_dataverse='Jeu 1 corrigé', contacts=[{'name': 'Nouveau'}])
+        self.assertEqual(self.compteurs(self.synchroniser(self.items)),
+                         {'inseres': 0, 'mis_a_jour': 1, 'inchanges': 4, 'retires': 0})
+        dataset.refresh_from_db()
+        self.assertEqual(dataset.name_of_dataverse, 'Jeu 1 corrigé')
+        self.assertEqual(list(dataset.contacts.values_list('name', flat=True)), ['Nouveau'])
+        self.assertEqual(DateInfo.objects.filter(dataset=dataset).count(), 1)
+
+    def test_disparu_retire_puis_restaure(self):
+        self.synchroniser(self.items)
+        self.assertEqual(self.synchroniser(self.items[1:])['retires'], 1)
+        retire = Dataset.objects.get(global_id=self.items[0]['global_id'])
+        self.assertIsNotNone(retire.removed_at)
+        self.assertNotIn(retire, Dataset.objects.actifs())
+        # De retour dans la source : réactivé par une mise à jour
+        self.assertEqual(self.synchroniser(self.items)['mis_a_jour'], 1)
+        retire.refresh_from_db()
+        self.assertIsNone(retire.removed_at)
+
+    def test_moisson_interrompue_ne_retire_rien(self):
+        self.importateur.synchroniser_pages([self.items], self.importateur.source_recherche('fleuve'))
+        restants = self.items[:2] + self.items[3:]
+        self.importateur.session = SessionFactice(restants, pannes={2})
+        rapport = self.importateur.moissonner_incremental('fleuve')
+        self.assertFalse(rapport['complete'])
+        self.assertEqual(rapport['retires'], 0)
+        self.assertFalse(Dataset.objects.filter(removed_at__isnull=False).exists())
+
+        self.importateur.session = SessionFactice(restants)
+        self.assertEqual(self.importateur.moissonner_incremental('fleuve')['retires'], 1)
+
+
+class LireConfigurationTests(TestCase):
+
+    def lire(self, source_url, filters=None):
+        return lire_configuration(HarvestConfig(source_url=source_url, frequency='1h', filters=filters))
+
+    def test_url_et_filtres(self):
+        self.assertEqual(self.lire('https://borealisdata.ca'), ('https://borealisdata.ca/api/search', '*', {}))
+        self.assertEqual(
+            self.lire('https://borealisdata.ca/api/search?q=fleuve&subtree=ogsl&per_page=10&start=5&type=file'),
+            ('https://borealisdata.ca/api/search', 'fleuve', {'subtree': 'ogsl'}),
+        )
+        self.assertEqual(self.lire('https://h.test/', 'estuaire'), ('https://h.test/api/search', 'estuaire', {}))
+        self.assertEqual(self.lire('https://h.test/api/search?q=a', 'q=b&fq=x'),
+                         ('https://h.test/api/search', 'b', {'fq': 'x'}))
+
+
+class PoolSessionsTests(TestCase):
+
+    def test_une_session_par_hote(self):
+        pool = PoolSessions()
+        self.addCleanup(pool.fermer)
+        premiere = pool.session_pour('https://a.test/api/search')
+        self.assertIs(pool.session_pour('https://a.test/autre'), premiere)
+        self.assertIsNot(pool.session_pour('https://b.test/api/search'), premiere)
+
+    def test_reprise_sur_erreur(self):
+        pool = PoolSessions(limite_par_hote=3, tentatives=5, facteur_attente=0.1)
+        self.addCleanup(pool.fermer)
+        adaptateur = pool.session_pour('https://a.test/').session.get_adapter('https://a.test/')
+        self.assertEqual(adaptateur.max_retries.total, 5)
+        self.assertEqual(adaptateur.max_retries.backoff_factor, 0.1)
+        self.assertIn(503, adaptateur.max_retries.status_forcelist)
+        self.assertEqual(adaptateur._pool_maxsize, 3)
+
+    def test_requetes_simultanees_bornees(self):
+        en_cours, maximum, verrou = [0], [0], threading.Lock()
+
+        class Lente:
+            def get(self, url, **kwargs):
+                with verrou:
+                    en_cours[0] += 1
+                    maximum[0] = max(maximum[0], en_cours[0])
+                time.sleep(0.05)
+                with verrou:
+                    en_cours[0] -= 1
+
+        session = SessionLimitee(Lente(), 2)
+        fils = [threading.Thread(target=session.get, args=('https://a.test/',)) for _ in range(6)]
+        for fil in fils:
+            fil.start()
+        for fil in fils:
+            fil.join()
+        self.assertEqual(maximum[0], 2)
+
+
+class MoissonneurConcurrentTests(TestCase):
+    """Sources récoltées en parallèle, écrites par un seul écrivain"""
+
+    def creer_configs(self, nombre):
+        # Source Borealis créée par les migrations
+        HarvestConfig.objects.all().delete()
+        return [
+            HarvestConfig.objects.create(source_url=f"https://h{n}.test/api/search?q=fleuve", frequency='1h')
+            for n in range(nombre)
+        ]
+
+    def moissonner(self, moissonneur, sessions):
+        with mock.patch.object(moissonneur.pool, 'session_pour', side_effect=lambda url: sessions[url]):
+            return moissonneur.moissonner(HarvestConfig.objects.order_by('id'))
+
+    def test_toutes_les_sources_en_meme_temps(self):
+        configs = self.creer_configs(6)
+        # Chaque source attend les autres sur sa première page : sans
+        # récolte simultanée de toutes les sources, la barrière expire
+        barriere = threading.Barrier(len(configs), timeout=5)
+
+        class Synchronisee(SessionFactice):
+            def get(self, url, params=None, timeout=None):
+                if params['start'] == 0:
+                    barriere.wait()
+                return super().get(url, params, timeout)
+
+        sessions = {
+            f"https://h{n}.test/api/search": Synchronisee([item(10 * n + i) for i in range(3)])
+            for n in range(len(configs))
+        }
+        moissonneur = MoissonneurConcurrent(per_page=2)
+        self.assertEqual(moissonneur.nombre_workers(configs), 6)
+        rapports = self.moissonner(moissonneur, sessions)
+        self.assertEqual(sorted(r['config_id'] for r in rapports), [c.pk for c in configs])
+        self.assertTrue(all(r['complete'] and r['inseres'] == 3 for r in rapports))
+        self.assertEqual(Dataset.objects.count(), 18)
+
+    @override_settings(MOISSONNAGE_WORKERS_MAX=4)
+    def test_nombre_de_workers(self):
+        configs = self.creer_configs(10)
+        self.assertEqual(MoissonneurConcurrent().nombre_workers(configs), 4)
+        self.assertEqual(MoissonneurConcurrent().nombre_workers(configs[:3]), 3)
+        self.assertEqual(MoissonneurConcurrent(max_workers=2).nombre_workers(configs), 2)
+
+    def test_source_en_erreur(self):
+        self.creer_configs(2)
+        sessions = {
+            'https://h0.test/api/search': SessionFactice([item(i) for i in range(3)]),
+            'https://h1.test/api/search': SessionFactice([item(10 + i) for i in range(3)], pannes={2}),
+        }
+        rapports = {r['source']: r for r in self.moissonner(MoissonneurConcurrent(per_page=2), sessions)}
+        complets = sorted((r['complete'], r['inseres']) for r in rapports.values())
+        self.assertEqual(complets, [(False, 2), (True, 3)])
+
+
+class ParserFrequenceTests(TestCase):
+
+    def test_frequences(self):
+        for texte, attendu in (
+            ('quotidienne', timedelta(days=1)),
+            (' Hebdomadaire ', timedelta(weeks=1)),
+            ('hourly', timedelta(hours=1)),
+            ('30m', timedelta(minutes=30)),
+            ('6h', timedelta(hours=6)),
+            ('2 jours', timedelta(days=2)),
+            ('toutes les 12 heures', timedelta(hours=12)),
+            ('every 3 days', timedelta(days=3)),
+            ('0h', None),
+            ('souvent', None),
+            ('', None),
+            (None, None),
+        ):
+            with self.subTest(texte=texte):
+                self.assertEqual(parser_frequence(texte), attendu)
+
+
+class VerrouTests(TestCase):
+    """Bail de verrou par source : un seul processus à la fois, expiration, prolongation"""
+
+    HEURE = timedelta(hours=1)
+
+    def setUp(self):
+        HarvestConfig.objects.all().delete()
+        self.config = HarvestConfig.objects.create(source_url='https://h.test/', frequency='1h')
+
+    def etat(self):
+        self.config.refresh_from_db()
+        return self.config
+
+    def test_deux_processus(self):
+        self.assertTrue(acquerir_verrou(self.config, 'A', self.HEURE, self.HEURE))
+        self.assertFalse(acquerir_verrou(self.config, 'B', self.HEURE, self.HEURE))
+        self.assertFalse(acquerir_verrou(self.config, 'B', self.HEURE))
+        # Le propriétaire peut reprendre son propre verrou
+        self.assertTrue(acquerir_verrou(self.config, 'A', self.HEURE, self.HEURE))
+        self.assertEqual(self.etat().locked_by, 'A')
+
+    def test_bail_expire(self):
+        self.assertTrue(acquerir_verrou(self.config, 'A', timedelta(seconds=-1)))
+        self.assertTrue(acquerir_verrou(self.config, 'B', self.HEURE, self.HEURE))
+        self.assertEqual(self.etat().locked_by, 'B')
+        # A, qui a perdu son bail, ne le prolonge ni ne le libère
+        prolonger_verrous([self.config], 'A', timedelta(days=2))
+        liberer_verrou(self.config, 'A', timezone.now())
+        self.assertEqual(self.etat().locked_by, 'B')
+        self.assertLess(self.config.locked_until, timezone.now() + timedelta(days=1))
+        self.assertIsNone(self.config.last_run_at)
+
+    def test_prolongation(self):
+        acquerir_verrou(self.config, 'A', timedelta(seconds=1))
+        prolonger_verrous([self.config], 'A', self.HEURE)
+        self.assertGreater(self.etat().locked_until, timezone.now() + timedelta(minutes=59))
+        self.assertFalse(acquerir_verrou(self.config, 'B', self.HEURE))
+
+    def test_source_moissonnee_entre_lecture_et_verrou(self):
+        self.assertEqual(configs_dues(), [self.config])
+        acquerir_verrou(self.config, 'A', self.HEURE, self.HEURE)
+        liberer_verrou(self.config, 'A', timezone.now())
+        # B a lu la source échue avant que A ne la libère
+        self.assertFalse(acquerir_verrou(self.config, 'B', self.HEURE, self.HEURE))
+        self.assertEqual(configs_dues(), [])
+
+
+class MoissonneurFactice:
+    def __init__(self, panne=None, complete=True):
+        self.panne = panne
+        self.complete = complete
+
+    def moissonner(self, configs):
+        if self.panne:
+            raise self.panne
+        return [{
+            'config_id': config.pk, 'complete': self.complete, 'inseres': 1, 'mis_a_jour': 0,
+            'inchanges': 0, 'retires': 0, 'erreurs': 0, 'duree': 0.1,
+        } for config in configs]
+
+
+class PlanificateurTests(TestCase):
+
+    def setUp(self):
+        HarvestConfig.objects.all().delete()
+        self.config = HarvestConfig.objects.create(source_url='https://h.test/', frequency='quotidienne')
+
+    def executer(self, moissonneur):
+        planificateur = Planificateur(moissonneur=moissonneur, delai_reprise=timedelta(minutes=15))
+        return planificateur, planificateur.executer_dues()
+
+    def test_succes(self):
+        _, (execution,) = self.executer(MoissonneurFactice())
+        self.config.refresh_from_db()
+        self.assertEqual((execution.status, execution.inserted), ('succes', 1))
+        self.assertEqual(self.config.last_run_at, execution.started_at)
+        self.assertEqual((self.config.locked_by, self.config.locked_until), ('', None))
+        # Plus échue avant un jour
+        self.assertEqual(self.executer(MoissonneurFactice())[1], [])
+
+    def test_echec_reessaye_apres_le_delai(self):
+        _, (execution,) = self.executer(MoissonneurFactice(panne=RuntimeError('API indisponible')))
+        self.config.refresh_from_db()
+        self.assertEqual((execution.status, execution.message), ('echec', 'API indisponible'))
+        self.assertIsNone(self.config.last_run_at)
+        self.assertEqual(self.config.locked_by, '')
+        self.assertGreater(self.config.locked_until, timezone.now() + timedelta(minutes=14))
+        # Toujours échue, mais pas relancée avant la fin du délai
+        self.assertEqual(configs_dues(), [self.config])
+        self.assertEqual(self.executer(MoissonneurFactice())[1], [])
+        HarvestConfig.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.executer(MoissonneurFactice())[1][0].status, 'succes')
+
+    def test_interrompue(self):
+        _, (execution,) = self.executer(MoissonneurFactice(complete=False))
+        self.config.refresh_from_db()
+        self.assertEqual(execution.status, 'interrompu')
+        self.assertIsNone(self.config.last_run_at)
+        self.assertEqual(HarvestRun.objects.count(), 1)
+
+
+class EnregistrementTests(TestCase):
+    """Enregistrer les pages de l'API puis les rejouer sans réseau donne le même import"""
+
+    def setUp(self):
+        self.items = [item(i) for i in range(7)]
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.fichier = os.path.join(dossier.name, 'moisson.jsonl.gz')
+        self.dossier = dossier.name
+
+    def contenu(self):
+        return sorted(
+            (
+                d.global_id, d.name_of_dataverse, d.authors, d.content_hash, d.date_info.published_at,
+                sorted(d.contacts.values_list('name', 'affiliation')),
+                sorted(d.publications.values_list('citation', flat=True)),
+                sorted(d.author_terms.values_list('name', flat=True)),
+            )
+            for d in Dataset.objects.select_related('date_info')
+        )
+
+    def enregistrer(self):
+        session = SessionFactice(self.items)
+        with mock.patch('recup_donnee.services.enregistrement.requests', session):
+            call_command('fixtures_moissonnage', 'enregistrer', self.fichier,
+                         '--recherche', 'fleuve', '--per-page', '3', stdout=io.StringIO())
+        return session
+
+    def test_aller_retour(self):
+        self.assertEqual(len(self.enregistrer().appels), 3)
+        self.assertEqual([len(page['items']) for page in lire_pages(self.fichier)], [3, 3, 1])
+
+        ImportateurDatasets(per_page=3, session=SessionFactice(self.items)).moissonner_incremental('fleuve')
+        en_ligne = self.contenu()
+
+        for mode in ('incremental', 'masse'):
+            with self.subTest(mode=mode):
+                Dataset.objects.all().delete()
+                # Taille de page différente de l'enregistrement
+                call_command('fixtures_moissonnage', 'rejouer', self.fichier, '--recherche', 'fleuve',
+                             '--per-page', '2', '--mode', mode, stdout=io.StringIO())
+                self.assertEqual(self.contenu(), en_ligne)
+
+    def test_rejeu_dans_le_desordre(self):
+        self.enregistrer()
+        session = SessionRejeu(self.fichier)
+        pages = [session.get('', params={'start': start, 'per_page': 2}).json()['data'] for start in (4, 0, 6)]
+        self.assertEqual([[d['global_id'] for d in page['items']] for page in pages], [
+            [self.items[4]['global_id'], self.items[5]['global_id']],
+            [self.items[0]['global_id'], self.items[1]['global_id']],
+            [self.items[6]['global_id']],
+        ])
+        self.assertEqual({page['total_count'] for page in pages}, {7})
+
+    def test_gonfler(self):
+        self.enregistrer()
+        destination = os.path.join(self.dossier, 'gonfle.jsonl.gz')
+        self.assertEqual(gonfler_enregistrement(self.fichier, destination, 16, per_page=5), 16)
+        items = [d for page in lire_pages(destination) for d in page['items']]
+        self.assertEqual(len(items), 16)
+        self.assertEqual(len({d['global_id'] for d in items}), 16)
+        ImportateurDatasets(session=SessionRejeu(destination)).importer_donnees_en_masse('fleuve')
+        self.assertEqual(Dataset.objects.count(), 16)
+
+        vide = os.path.join(self.dossier, 'vide.jsonl.gz')
+        with gzip.open(vide, 'wt', encoding='utf-8'):
+            pass
+        with self.assertRaises(ValueError):
+            gonfler_enregistrement(vide, destination, 3)
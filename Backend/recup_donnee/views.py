@@ -4,14 +4,28 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import Dataset, Contact, Publication, DateInfo
 from .serializers import DatasetSerializer
+from .catalogue import conditionnel_catalogue
+from .cache_reponses import reponse_en_cache
+from .statistiques import lire_statistiques
+from .serialisation import SerialisationRapide, serialisation_rapide_active
 from django.shortcuts import render
 from collections import Counter
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditionnel_catalogue
 def lister_datasets(request):
     """Lister tous les datasets disponibles"""
-    datasets = Dataset.objects.all()
+    if serialisation_rapide_active(request):
+        def produire():
+            serialisation = SerialisationRapide(DatasetSerializer())
+            lignes, _ = serialisation.construire(Dataset.objects.actifs())
+            return serialisation.reponse(lignes)
+        return reponse_en_cache(request, produire)
+    datasets = Dataset.objects.actifs().avec_relations(
+        contacts=Contact.objects.only('id', 'name', 'affiliation', 'dataset'),
+        publications=Publication.objects.only('id', 'citation', 'url', 'dataset'),
+    )
     serializer = DatasetSerializer(datasets, many=True)
     return Response(serializer.data)
 
@@ -33,15 +47,14 @@ def importer_dataset(request):
 
 
 def stats_view(request):
-    total_datasets = Dataset.objects.count()
-    total_contacts = Contact.objects.count()
-    total_publications = Publication.objects.count()
-    
+    # Agrégats précalculés (statistiques.py) : aucun comptage des tables
+    statistiques = lire_statistiques()
+    totaux = statistiques['totaux']
 
     context = {
-        'total_datasets': total_datasets,
-        'total_contacts': total_contacts,
-        'total_publications': total_publications,
+        'total_datasets': totaux['datasets'],
+        'total_contacts': totaux['contacts'],
+        'total_publications': totaux['publications'],
+        'statistiques': statistiques,
     }
     return render(request, "admin/stats.html", context)
-    
\ No newline at end of file
@@ -6,20 +6,15 @@
 echo " Applying migrations..."
 python manage.py makemigrations --noinput
 python manage.py migrate --noinput
-echo " Importing data..."
-python - <<'PYCODE'
-import os
-import django
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gestion_donnee.settings")
-django.setup()
-from recup_donnee.services.MesServices import ImportateurDatasets
-try:
-    importateur = ImportateurDatasets()
-    resultats = importateur.importer_donnees("fleuve-saint-laurent")
-    print(" Données importées avec succès :", resultats)
-except Exception as e:
-    print(" Erreur lors de l'importation :", e)
-PYCODE
+# Le moissonnage ne se fait plus au démarrage du web :
+# il est assuré par le processus "worker" (python manage.py moissonner).
 
-echo " Starting Gunicorn..."
-gunicorn gestion_donnee.wsgi:application --bind 0.0.0.0:$PORT
+# SERVEUR=asgi pour le service des vues async (/api/async/) ; WSGI par défaut :
+# réponses en flux (export, instantanés) envoyées au fil de l'eau et sendfile.
+if [ "$SERVEUR" = "asgi" ]; then
+    echo " Starting Gunicorn (workers ASGI uvicorn)..."
+    gunicorn gestion_donnee.asgi:application -k uvicorn_worker.UvicornWorker --bind 0.0.0.0:$PORT
+else
+    echo " Starting Gunicorn..."
+    gunicorn gestion_donnee.wsgi:application --bind 0.0.0.0:$PORT
+fi
@@ -3,83 +3,36 @@ import { BarChart3, Download } from 'lucide-react';
 import { BarChart, Bar, PieChart as RechartsPieChart, Pie, Cell, LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 import jsPDF from 'jspdf';
 import html2canvas from 'html2canvas';
-import { useAppDispatch, useAppSelector } from '../../store/hooks';
-import { fetchDatasets } from '../../store/slices/datasetSlice';
+import { datasetService } from '../../services/api/datasetService';
+import { DatasetFacettes, FacetteValeur } from '../../types/dataset.types';
 import Layout from '../../components/layout/Layout';
 import { activityService } from '../../services/api/activityService';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
 import { Button } from '../../components/ui/button';
 const StatisticsPage: React.FC = () => {
-  const dispatch = useAppDispatch();
-  const { datasets, loading } = useAppSelector((state) => state.datasets);
+  const [facettes, setFacettes] = useState<DatasetFacettes | null>(null);
+  const [loading, setLoading] = useState(true);
   const [isExporting, setIsExporting] = useState(false);
 
+  // Les décomptes sont calculés par le serveur : une seule petite réponse
   useEffect(() => {
-    if (datasets.length === 0) {
-      dispatch(fetchDatasets({}));
-    }
-  }, [dispatch, datasets.length]);
+    datasetService.getFacettes()
+      .then(setFacettes)
+      .catch((error) => console.error('Erreur lors du chargement des statistiques:', error))
+      .finally(() => setLoading(false));
+  }, []);
 
   // Préparer les données pour les graphiques
-  const prepareDataByKeywords = () => {
-    const keywordCount: { [key: string]: number } = {};
-    
-    datasets.forEach(dataset => {
-      if (dataset.keywords) {
-        const keywords = dataset.keywords.split(',').map(k => k.trim());
-        keywords.forEach(keyword => {
-          if (keyword) {
-            keywordCount[keyword] = (keywordCount[keyword] || 0) + 1;
-          }
-        });
-      }
-    });
-
-    return Object.entries(keywordCount)
-      .sort((a, b) => b[1] - a[1])
-      .slice(0, 10)
-      .map(([name, value]) => ({ name, value }));
-  };
-
-  const prepareDataByMonth = () => {
-    const monthCount: { [key: string]: number } = {};
-    
-    datasets.forEach(dataset => {
-      if (dataset.date_info?.published_at) {
-        const date = new Date(dataset.date_info.published_at);
-        const month = date.toLocaleString('fr-CA', { year: 'numeric', month: 'short' });
-        monthCount[month] = (monthCount[month] || 0) + 1;
-      }
-    });
-
-    return Object.entries(monthCount)
-      .sort((a, b) => a[0].localeCompare(b[0]))
-      .map(([name, value]) => ({ name, value }));
-  };
-
-  const prepareDataBySubject = () => {
-    const subjectCount: { [key: string]: number } = {};
-    
-    datasets.forEach(dataset => {
-      if (dataset.subjects) {
-        const subjects = dataset.subjects.split(',').map(s => s.trim());
-        subjects.forEach(subject => {
-          if (subject) {
-            subjectCount[subject] = (subjectCount[subject] || 0) + 1;
-          }
-        });
-      }
-    });
-
-    return Object.entries(subjectCount)
-      .sort((a, b) => b[1] - a[1])
-      .slice(0, 8)
-      .map(([name, value]) => ({ name, value }));
-  };
+  const versGraphique = (valeurs?: FacetteValeur[]) =>
+    (valeurs || []).map(({ nom, nombre }) => ({ name: nom, value: nombre }));
 
-  const keywordsData = prepareDataByKeywords();
-  const monthData = prepareDataByMonth();
-  const subjectData = prepareDataBySubject();
+  const keywordsData = versGraphique(facettes?.mots_cles);
+  const subjectData = versGraphique(facettes?.sujets).slice(0, 8);
+  // Mois renvoyés au format AAAA-MM, dans l'ordre chronologique
+  const monthData = versGraphique(facettes?.mois).map(({ name, value }) => ({
+    name: new Date(`${name}-01T00:00:00`).toLocaleString('fr-CA', { year: 'numeric', month: 'short' }),
+    value,
+  }));
 
   const COLORS = ['#0088FE', '#00C49F', '#FFBB28', '#FF8042', '#8884D8', '#82CA9D', '#FFC658', '#FF6B9D'];
 
@@ -166,7 +119,7 @@ const StatisticsPage: React.FC = () => {
                 <CardTitle className="text-lg">Total Datasets</CardTitle>
               </CardHeader>
               <CardContent>
-                <p className="text-4xl font-bold text-primary">{datasets.length}</p>
+                <p className="text-4xl font-bold text-primary">{facettes?.total ?? 0}</p>
               </CardContent>
             </Card>
             <Card>
@@ -4,9 +4,12 @@ import axios from 'axios';
 
 // ✅ VITE utilise import.meta.env (pas process.env)
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000';
+// Vues async (/api/async/) : service ASGI distinct en production, même serveur en local
+const API_ASYNC_URL = import.meta.env.VITE_API_ASYNC_URL || API_BASE_URL;
 
 // Debug : afficher l'URL utilisée
 console.log('🔧 [API Config] Base URL:', API_BASE_URL);
+console.log('🔧 [API Config] Async URL:', API_ASYNC_URL);
 console.log('🔧 [API Config] Mode:', import.meta.env.MODE);
 
 // Vérifier que l'URL est correcte en production
@@ -21,13 +24,16 @@ export const API_ENDPOINTS = {
     login: '/api/users/login/',
     register: '/api/users/inscription/',
   },
-  // Datasets (REST API)
+  // Datasets (REST API) : lectures servies par les vues async (ASGI)
   datasets: {
-    list: '/api/donnees/datasets/',
-    detail: (id: number) => `/api/donnees/datasets/${id}/`,
+    list: `${API_ASYNC_URL}/api/async/datasets/`,
+    detail: (id: number) => `${API_ASYNC_URL}/api/async/datasets/${id}/`,
+    facettes: `${API_ASYNC_URL}/api/async/datasets/facettes/`,
+    // Pas de version async
+    lot: '/api/donnees/datasets/lot/',
   },
-  // GraphQL
-  graphql: '/api/graphql/',
+  // GraphQL (même schéma et requêtes persistées que /api/graphql/)
+  graphql: `${API_ASYNC_URL}/api/async/graphql/`,
   // Stats
   stats: '/api/datasets/admin/recup_donnee/dataset/stats/',
 };
@@ -1,5 +1,5 @@
 import apiClient, { API_ENDPOINTS } from './apiConfig';
-import { Dataset, DatasetFilters } from '../../types/dataset.types';
+import { Dataset, DatasetFacettes, DatasetFilters } from '../../types/dataset.types';
 
 export const datasetService = {
   // Récupérer tous les datasets avec filtres optionnels
@@ -19,6 +19,15 @@ export const datasetService = {
     return response.data;
   },
 
+  // Récupérer plusieurs datasets en une requête, dans l'ordre des ids
+  getByIds: async (ids: number[]): Promise<Dataset[]> => {
+    const response = await apiClient.get<Dataset[]>(
+      API_ENDPOINTS.datasets.lot,
+      { params: { ids: ids.join(',') } }
+    );
+    return response.data;
+  },
+
   // Rechercher des datasets
   search: async (searchTerm: string): Promise<Dataset[]> => {
     const response = await apiClient.get<Dataset[]>(
@@ -27,4 +36,13 @@ export const datasetService = {
     );
     return response.data;
   },
+
+  // Décomptes par mot-clé, sujet, mois... calculés par le serveur
+  getFacettes: async (filters?: DatasetFilters, limite = 10): Promise<DatasetFacettes> => {
+    const response = await apiClient.get<DatasetFacettes>(
+      API_ENDPOINTS.datasets.facettes,
+      { params: { ...filters, limite } }
+    );
+    return response.data;
+  },
 };
@@ -1,134 +1,162 @@
+import axios from 'axios';
 import apiClient, { API_ENDPOINTS } from './apiConfig';
 import { Dataset, HarvestConfig } from '../../types/dataset.types';
 
 interface GraphQLResponse<T> {
   data: T;
-  errors?: Array<{ message: string }>;
+  errors?: Array<{ message: string; extensions?: { code?: string } }>;
 }
 
+// Empreintes sha256 des documents déjà calculées (requêtes persistées)
+const empreintes = new Map<string, string | null>();
+
+// crypto.subtle n'existe qu'en contexte sécurisé (https ou localhost) :
+// sans lui, le texte de la requête est envoyé à chaque appel
+const empreinte = async (query: string): Promise<string | null> => {
+  if (!empreintes.has(query)) {
+    let valeur: string | null = null;
+    if (globalThis.crypto?.subtle) {
+      const octets = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(query));
+      valeur = Array.from(new Uint8Array(octets), (o) => o.toString(16).padStart(2, '0')).join('');
+    }
+    empreintes.set(query, valeur);
+  }
+  return empreintes.get(query) ?? null;
+};
+
+const envoyer = async <T>(corps: object): Promise<GraphQLResponse<T>> => {
+  try {
+    const response = await apiClient.post<GraphQLResponse<T>>(API_ENDPOINTS.graphql, corps);
+    return response.data;
+  } catch (erreur) {
+    // Erreurs GraphQL renvoyées avec un statut 400 (dont PersistedQueryNotFound)
+    if (axios.isAxiosError<GraphQLResponse<T>>(erreur) && erreur.response?.data?.errors) {
+      return erreur.response.data;
+    }
+    throw erreur;
+  }
+};
+
+// Requête persistée : l'empreinte seule d'abord, le texte complet si le
+// serveur ne la connaît pas encore
+const executer = async <T>(query: string, variables?: Record<string, unknown>): Promise<T> => {
+  const sha256Hash = await empreinte(query);
+  let reponse: GraphQLResponse<T>;
+  if (sha256Hash) {
+    const extensions = { persistedQuery: { version: 1, sha256Hash } };
+    reponse = await envoyer<T>({ extensions, variables });
+    if (reponse.errors?.some((e) => e.message === 'PersistedQueryNotFound')) {
+      reponse = await envoyer<T>({ query, extensions, variables });
+    }
+  } else {
+    reponse = await envoyer<T>({ query, variables });
+  }
+
+  if (reponse.errors) {
+    throw new Error(reponse.errors[0].message);
+  }
+  return reponse.data;
+};
+
+// Champs d'un dataset demandés par toutes les requêtes
+const FRAGMENT_DATASET = `
+  fragment ChampsDataset on DatasetType {
+    id
+    nameOfDataverse
+    identifierOfDataverse
+    url
+    description
+    keywords
+    subjects
+    authors
+    contacts {
+      id
+      name
+      affiliation
+    }
+    publications {
+      id
+      citation
+      url
+    }
+    dateInfo {
+      createdAt
+      updatedAt
+      publishedAt
+    }
+  }
+`;
+
+// Transformer les données GraphQL pour correspondre au format REST
+const versDataset = (dataset: any): Dataset => ({
+  id: dataset.id,
+  name_of_dataverse: dataset.nameOfDataverse,
+  identifier_of_dataverse: dataset.identifierOfDataverse,
+  url: dataset.url,
+  description: dataset.description,
+  keywords: dataset.keywords,
+  subjects: dataset.subjects,
+  authors: dataset.authors,
+  contacts: dataset.contacts || [],
+  publications: dataset.publications || [],
+  date_info: dataset.dateInfo ? {
+    created_at: dataset.dateInfo.createdAt,
+    updated_at: dataset.dateInfo.updatedAt,
+    published_at: dataset.dateInfo.publishedAt,
+  } : null,
+});
+
 export const graphqlService = {
   // Query pour récupérer tous les datasets
   getAllDatasets: async (): Promise<Dataset[]> => {
     const query = `
       query {
         allDatasets {
-          id
-          nameOfDataverse
-          identifierOfDataverse
-          url
-          description
-          keywords
-          subjects
-          authors
-          contacts {
-            id
-            name
-            affiliation
-          }
-          publications {
-            id
-            citation
-            url
-          }
-          dateInfo {
-            createdAt
-            updatedAt
-            publishedAt
-          }
+          ...ChampsDataset
         }
       }
+      ${FRAGMENT_DATASET}
     `;
 
-    const response = await apiClient.post<GraphQLResponse<{ allDatasets: any[] }>>(
-      API_ENDPOINTS.graphql,
-      { query }
-    );
+    const data = await executer<{ allDatasets: any[] }>(query);
 
-    if (response.data.errors) {
-      throw new Error(response.data.errors[0].message);
-    }
-
-    // Transformer les données GraphQL pour correspondre au format REST
-    return response.data.data.allDatasets.map((dataset: any) => ({
-      id: dataset.id,
-      name_of_dataverse: dataset.nameOfDataverse,
-      identifier_of_dataverse: dataset.identifierOfDataverse,
-      url: dataset.url,
-      description: dataset.description,
-      keywords: dataset.keywords,
-      subjects: dataset.subjects,
-      authors: dataset.authors,
-      contacts: dataset.contacts || [],
-      publications: dataset.publications || [],
-      date_info: dataset.dateInfo ? {
-        created_at: dataset.dateInfo.createdAt,
-        updated_at: dataset.dateInfo.updatedAt,
-        published_at: dataset.dateInfo.publishedAt,
-      } : null,
-    }));
+    return data.allDatasets.map(versDataset);
   },
 
   // Query pour récupérer un dataset par ID
+  // Texte de requête constant : l'id passe par les variables
   getDatasetById: async (id: number): Promise<Dataset | null> => {
     const query = `
-      query {
-        datasetById(id: ${id}) {
-          id
-          nameOfDataverse
-          identifierOfDataverse
-          url
-          description
-          keywords
-          subjects
-          authors
-          contacts {
-            id
-            name
-            affiliation
-          }
-          publications {
-            id
-            citation
-            url
-          }
-          dateInfo {
-            createdAt
-            updatedAt
-            publishedAt
-          }
+      query DatasetById($id: Int!) {
+        datasetById(id: $id) {
+          ...ChampsDataset
         }
       }
+      ${FRAGMENT_DATASET}
     `;
 
-    const response = await apiClient.post<GraphQLResponse<{ datasetById: any }>>(
-      API_ENDPOINTS.graphql,
-      { query }
-    );
+    const data = await executer<{ datasetById: any }>(query, { id });
 
-    if (response.data.errors) {
-      throw new Error(response.data.errors[0].message);
-    }
-
-    const dataset = response.data.data.datasetById;
+    const dataset = data.datasetById;
     if (!dataset) return null;
 
-    return {
-      id: dataset.id,
-      name_of_dataverse: dataset.nameOfDataverse,
-      identifier_of_dataverse: dataset.identifierOfDataverse,
-      url: dataset.url,
-      description: dataset.description,
-      keywords: dataset.keywords,
-      subjects: dataset.subjects,
-      authors: dataset.authors,
-      contacts: dataset.contacts || [],
-      publications: dataset.publications || [],
-      date_info: dataset.dateInfo ? {
-        created_at: dataset.dateInfo.createdAt,
-        updated_at: dataset.dateInfo.updatedAt,
-        published_at: dataset.dateInfo.publishedAt,
-      } : null,
-    };
+    return versDataset(dataset);
+  },
+
+  // Query pour récupérer plusieurs datasets en un seul appel, dans l'ordre des ids
+  getDatasetsByIds: async (ids: number[]): Promise<Dataset[]> => {
+    const query = `
+      query DatasetsByIds($ids: [Int!]!) {
+        datasetsByIds(ids: $ids) {
+          ...ChampsDataset
+        }
+      }
+      ${FRAGMENT_DATASET}
+    `;
+
+    const data = await executer<{ datasetsByIds: any[] }>(query, { ids });
+
+    return data.datasetsByIds.map(versDataset);
   },
 
   // Query pour récupérer les configurations de moissonnage
@@ -145,16 +173,9 @@ export const graphqlService = {
       }
     `;
 
-    const response = await apiClient.post<GraphQLResponse<{ allHarvests: any[] }>>(
-      API_ENDPOINTS.graphql,
-      { query }
-    );
-
-    if (response.data.errors) {
-      throw new Error(response.data.errors[0].message);
-    }
+    const data = await executer<{ allHarvests: any[] }>(query);
 
-    return response.data.data.allHarvests.map((harvest: any) => ({
+    return data.allHarvests.map((harvest: any) => ({
       id: harvest.id,
       source_url: harvest.sourceUrl,
       frequency: harvest.frequency,
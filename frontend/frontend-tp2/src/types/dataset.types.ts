@@ -39,6 +39,21 @@ export interface DatasetFilters {
   search?: string;
 }
 
+// Réponse de /api/donnees/datasets/facettes/
+export interface FacetteValeur {
+  nom: string;
+  nombre: number;
+}
+
+export interface DatasetFacettes {
+  total: number;
+  mots_cles?: FacetteValeur[];
+  sujets?: FacetteValeur[];
+  auteurs?: FacetteValeur[];
+  affiliations?: FacetteValeur[];
+  mois?: FacetteValeur[];
+}
+
 export interface HarvestConfig {
   id: number;
   source_url: string;
@@ -36,6 +36,7 @@ export default defineConfig(({ mode }) => {
     // Variables d'environnement exposées
     define: {
       'import.meta.env.VITE_API_URL': JSON.stringify(env.VITE_API_URL || 'http://127.0.0.1:8000'),
+      'import.meta.env.VITE_API_ASYNC_URL': JSON.stringify(env.VITE_API_ASYNC_URL || env.VITE_API_URL || 'http://127.0.0.1:8000'),
     },
   }
 })
\ No newline at end of file